@@ -1,89 +1,243 @@
 import sys
 sys.path.append('.')
+import os
 import numpy as np
 import math
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from moudles.linear import transformer
 from moudles.matrix import Mat
+from moudles.worldmap import WORLD_PATH, open_world
+from moudles.render import BackgroundRenderer
 from moudles.spot import Spot_correction
 from pathfinding3d.core.diagonal_movement import DiagonalMovement
 from pathfinding3d.core.grid import Grid
-from pathfinding3d.finder.a_star import AStarFinder
+from pathfinding3d.finder.multires import MultiResolutionFinder
+from pathfinding3d.finder.receding import RecedingHorizonFinder
+from pathfinding25d.pyramid import CoarseToFinePlanner, ensure_height_pyramid
+
+# 长距离规划时相邻分段边界点的间距（米）
+SEGMENT_LENGTH = 70
+# 全局航线使用的2.5D高度图，以及规划时的离地余量、最大高度和金字塔层（第2层每格 4x4 米）
+HEIGHT_MAP_PATH = 'grid.npy'
+ROUTE_CLEARANCE = 5
+ROUTE_MAX_ALTITUDE = 200
+ROUTE_LEVEL = 2
+
+
+def extend_window(matrix, shift, points):
+    """
+    把窗口向外扩展（扩展部分可通行），使全局坐标下的 points 都落在窗口内
+
+    窗口在高度方向只覆盖区块数据的范围（或到 Mat 的 zz），数据范围以外是空中，
+    因此相邻两段窗口的 z_max 不同时，共用的边界点可能在其中一个窗口的顶部以上
+
+    返回:
+    (matrix, shift)，不需要扩展时原样返回
+    """
+    points = np.asarray(points, dtype=np.int64)
+    shift = np.asarray(shift, dtype=np.int64)
+    before = np.maximum(shift - points.min(axis=0), 0)
+    after = np.maximum(points.max(axis=0) - (shift + matrix.shape - 1), 0)
+    if not before.any() and not after.any():
+        return matrix, tuple(int(v) for v in shift)
+    matrix = np.pad(matrix, list(zip(before, after)), constant_values=1)
+    return matrix, tuple(int(v) for v in shift - before)
+
+
+def _refine_segment(planner, sp, ep):
+    """在子进程中细化一段路径（必须是模块级函数才能被进程池序列化）"""
+    return planner._plan_short_distance(sp, ep, visualize=False, snapped=True)
+
 
 #这是3d分块版本的寻路算法，起点不能离地太近 用于精细规划
 class LowAltitude:
-    def __init__(self, startpoint, endpoint,level=15):
+    def __init__(self, startpoint, endpoint,level=15,matrix_cache=None,world=WORLD_PATH,workers=0,
+                 headless=True,renderer=None):
         """
         初始化低空飞行规划对象
         
         参数:
         startpoint: 起始点坐标 [经度, 纬度, 高度]
         endpoint: 终点坐标 [经度, 纬度, 高度]
+        matrix_cache: 可选的拼接矩阵缓存文件（.npz），加载相同区块时直接读取；默认不写磁盘
+        world: 全局体素地图（mapinit/buildworld.py 生成的文件或 GlobalVoxelMap），
+               存在时直接截取窗口，不存在时按区块拼接
+        workers: 长距离规划时并行细化分段的进程数，0 表示不并行：有全局体素地图时
+                 用滚动窗口 A* 一次规划整条航线，否则逐段顺序规划
+        headless: 默认不做任何可视化；为 False 时输出每段的 HTML 和整条航线的画面
+        renderer: 可选的 BackgroundRenderer，可视化交给后台线程写文件，不阻塞规划
         """
         self.startpoint_gps = startpoint
         self.endpoint_gps = endpoint
         self.level=level
+        self.matrix_cache=matrix_cache
+        self.world=open_world(world)
+        self.workers=workers
+        self.headless=headless
+        self.renderer=renderer
         
         # 将GPS坐标转换为平面坐标
-        self.startpoint = transformer.gps2txt(startpoint[0], startpoint[1], startpoint[2])
-        self.endpoint = transformer.gps2txt(endpoint[0], endpoint[1], endpoint[2])
+        # 起点和终点一次批量转换，高度保持原值
+        start, end = transformer.gps2txt_batch([startpoint, endpoint])
+        self.startpoint = (int(start[0]), int(start[1]), startpoint[2])
+        self.endpoint = (int(end[0]), int(end[1]), endpoint[2])
         
         # 比较两点之间的距离
         self.distance = np.max([self.endpoint[0] - self.startpoint[0], self.endpoint[1] - self.startpoint[1]])
     
-    def _plan_long_distance(self):
+    def __getstate__(self):
+        """传给子进程时不带渲染线程（子进程中的分段不做可视化）"""
+        state = self.__dict__.copy()
+        state['renderer'] = None
+        return state
+
+    def _plan_long_distance(self, visualize=None):
         """
         处理长距离路径规划（距离 > 70)
-        这里可以添加复杂路径规划算法
+        有全局体素地图且不并行时用滚动窗口 A* 一次规划整条航线；
+        否则先在2.5D地图上规划粗略的全局航线，沿航线确定各段的终点，再逐段（或并行）细化
+        visualize: 逐段规划时是否输出每段的可视化，None 表示按 headless 决定
         """
         print("使用长距离路径规划算法")
+        if not self.workers and self.world is not None:
+            return self._plan_receding()
+
+        boundaries = self.snap_boundaries(self.segment_boundaries())
+        print(f"分段边界点: {boundaries}")
+
+        if self.workers:
+            # 边界点已经固定，各段互不依赖，总耗时约等于最慢的一段
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                segments = list(pool.map(partial(_refine_segment, self), boundaries[:-1], boundaries[1:]))
+        else:
+            segments = []
+            for k, ep in enumerate(boundaries[1:]):
+                # 从上一段实际的终点出发，保证首尾相接
+                sp = segments[-1][-1] if segments and segments[-1] else boundaries[k]
+                print("起点:",sp,"终点:",ep)
+                segments.append(self._plan_short_distance(sp, ep, visualize, snapped=True))
+                if not segments[-1]:
+                    break
+
         path = []
-        # 长距离规划可以调用短距离规划作为子部分
-        # 这里长距离分块规划 每次规划70米 返回终点作为新的起点 以及一组路径，直到抵达终点
-        startpoint = self.startpoint
-        endpoint = self.endpoint
-        
-        while 1:
-            new_endpoint = self.point_slice(startpoint, endpoint)
-            print(f"新终点: {new_endpoint}")
-            if endpoint == new_endpoint:
-                print("最后一次规划")
-                print("起点:",startpoint,"终点:",new_endpoint)
-                pathmid = self._plan_short_distance(startpoint,new_endpoint)
-                path.extend(pathmid)
-                print("规划结束")
-                return path
-            else:
-                print("使用短距离规划")
-                pathmid = self._plan_short_distance(startpoint,new_endpoint)
-                print("newstartpoint:",pathmid[70])
-                new_startpoint = pathmid[70]
-                path.extend(pathmid[:69])#不包含终点，防止重复
-                startpoint = new_startpoint
-                
-            
+        for k, segment in enumerate(segments):
+            if not segment:
+                print(f"第 {k + 1} 段规划失败: {boundaries[k]} -> {boundaries[k + 1]}")
+                return []
+            if path:
+                # 相邻两段必须共用边界点，否则拼接出的航线中间有断口
+                if tuple(path[-1]) != tuple(segment[0]):
+                    print(f"第 {k + 1} 段与上一段不相接: {path[-1]} -> {segment[0]}")
+                    return []
+                segment = segment[1:]
+            path.extend(segment)
+        print(f"规划结束，共 {len(segments)} 段")
         return path
-        
-        # 并负责组合这些路径
-        
-        
-        
 
-        ##path3 = self._plan_short_distance(self.startpoint,self.endpoint)
-        ##longplan = path1+path3
+    def snap_boundaries(self, boundaries):
+        """
+        在分发各段之前，把所有分段边界点（含起点和终点）一次性修正到最近的可通行体素（全局坐标）。
+        各段规划时原样使用这些点（snapped=True），不再在自己的窗口里重新限制和修正，
+        相邻两段的窗口范围（如 z_max）不同也会共用同一个边界点
 
-        
+        返回:
+        修正后的边界点列表
+        """
+        snapped = []
+        for point in boundaries:
+            matrix, shift = self.load_map(point, point)
+            if matrix is None:
+                snapped.append([int(c) for c in point])
+                continue
+            local = tuple(int(min(max(c - o, 0), n - 1)) for c, o, n in zip(point, shift, matrix.shape))
+            local = Spot_correction(matrix).find_nearest_free_point_bfs(local)
+            snapped.append([int(c + o) for c, o in zip(local, shift)])
+        return snapped
 
-    
-    
-    def _plan_short_distance(self,sp,ep):
+    def _plan_receding(self):
+        """
+        在全局体素地图上用滚动窗口 A* 规划整条航线。
+        窗口随搜索前沿向终点移动，搜索树（g 值和父节点）在窗口之间保留，
+        每次移动只搜索新露出的空间，不再每段重新建 Grid、从头搜索
+        """
+        print("使用滚动窗口规划")
+        origin = self.world.origin
+        points = []
+        for point in (self.startpoint, self.endpoint):
+            view, offset = self.world.window_around(point, point)
+            local = tuple(int(min(max(c - o, 0), n - 1)) for c, o, n in zip(point, offset, view.shape))
+            local = Spot_correction(view).find_nearest_free_point_bfs(local)
+            points.append(tuple(int(c + o - g) for c, o, g in zip(local, offset, origin)))
+        print("起点:",points[0],"终点:",points[1])
+
+        finder = RecedingHorizonFinder(diagonal_movement=DiagonalMovement.always, horizon=SEGMENT_LENGTH // 2)
+        path, runs = finder.find_path(points[0], points[1], self.world.volume)
+        print(f"扩展节点: {runs}，窗口: {finder.windows} 个")
+        return [tuple(int(c + g) for c, g in zip(coords, origin)) for coords in path]
+
+    def coarse_route(self):
+        """
+        在2.5D高度图（grid.npy）的金字塔粗层上规划全局航线（爬升-巡航-下降）
+
+        返回:
+        原分辨率下的航点 [(x, y, z), ...]（粗格中心，高度为该格的安全巡航高度），
+        没有高度图或规划失败时返回 None
+        """
+        if not os.path.exists(HEIGHT_MAP_PATH):
+            return None
+        pyramid = ensure_height_pyramid(HEIGHT_MAP_PATH)
+        planner = CoarseToFinePlanner(pyramid[0], pyramid, min_altitude=ROUTE_CLEARANCE,
+                                      max_altitude=ROUTE_MAX_ALTITUDE, level=ROUTE_LEVEL)
+        cells = planner.coarse_path(self.startpoint, self.endpoint)
+        if not cells:
+            return None
+        size = 1 << planner.level
+        rows, cols = pyramid[0].shape
+        return [(min(cx * size + size // 2, cols - 1), min(cy * size + size // 2, rows - 1), int(z))
+                for cx, cy, z in cells]
+
+    def segment_boundaries(self, length=SEGMENT_LENGTH):
+        """
+        确定长距离航线的分段边界点：沿粗略的全局航线每隔约 length 米取一个航点，
+        这些点在2.5D地图上可飞且彼此连通；没有全局航线时退回到起点到终点的连线上均匀取点
+
+        返回:
+        [起点, 边界点..., 终点]
+        """
+        points = [list(self.startpoint)]
+        route = self.coarse_route()
+        if route is not None:
+            travelled = 0.0
+            prev = route[0]
+            for point in route[1:-1]:
+                travelled += math.hypot(point[0] - prev[0], point[1] - prev[1])
+                prev = point
+                if travelled >= length:
+                    points.append(list(point))
+                    travelled = 0.0
+        else:
+            print("没有可用的全局航线，沿直线分段")
+            start = np.array(self.startpoint, dtype=float)
+            end = np.array(self.endpoint, dtype=float)
+            count = max(1, int(math.ceil(np.linalg.norm(end - start) / length)))
+            for k in range(1, count):
+                points.append(np.round(start + (end - start) * k / count).astype(int).tolist())
+        points.append(list(self.endpoint))
+        return points
+
+    def _plan_short_distance(self,sp,ep,visualize=None,snapped=False):
         """
         处理短距离路径规划（距离 <= 70)
+        snapped: 起终点是否已由 snap_boundaries 修正过（长距离分段），见 findpath3d
         返回直接路径
         """
         print("使用短距离路径规划算法")
-        shift=self.load_map(sp,ep)
+        matrix,shift=self.load_map(sp,ep)
+        if matrix is None:
+            return []
         print("shift",shift)
-        path3d=self.findpath3d(shift,sp,ep)
+        path3d=self.findpath3d(matrix,shift,sp,ep,visualize,snapped)
         ##print(path3d)
         
 
@@ -95,29 +249,33 @@ class LowAltitude:
 
         return (path3d)
     
-    def fullplan(self):
+    def fullplan(self, visualize=None):
         """
         生成完整的飞行路径
         根据距离选择不同的规划算法
+        visualize: 是否显示/输出可视化结果，None 表示按 headless 决定（默认不可视化）
         
         返回:
         path: 从起点到终点的路径列表
         """
         if self.distance > 74:
-            path = self._plan_long_distance()
+            path = self._plan_long_distance(visualize)
+            if not path:
+                print("长距离规划失败")
+                return []
             ##计算坐标转回gps坐标输出
             print("long",path)
             ##可视化
-            flight_plan.visualize(path)
-            path = transformer.txt2gps(np.array(path))
+            self._show_plan(path, visualize)
+            path = transformer.txt2gps_batch(path).tolist()
             return path
         else:
-            path = self._plan_short_distance(self.startpoint,self.endpoint)
+            path = self._plan_short_distance(self.startpoint,self.endpoint,visualize)
             ##可视化
-            flight_plan.visualize(path)
+            self._show_plan(path, visualize)
             #print("short",path)
             ##计算坐标转回gps坐标输出
-            path = transformer.txt2gps(np.array(path))
+            path = transformer.txt2gps_batch(path).tolist()
             return path
         
     def load_map(self,sp,ep):
@@ -126,8 +284,12 @@ class LowAltitude:
         采用象限判断法确定需要加载的四个区块
         
         返回:
-        list: 包含四个最近区块文件名的列表
+        (matrix, (x_min, y_min, z_min)): 拼接后的矩阵及其偏移量，没有可用区块时 matrix 为 None
         """
+        if self.world is not None:
+            # 全局体素地图：只需截取起终点周围的窗口（内存映射的视图），偏移量即窗口原点
+            return self.world.window_around(sp,ep)
+
         # 计算中点坐标
         mid_x = (sp[0] + ep[0]) / 2
         mid_y = (sp[1] + ep[1]) / 2
@@ -172,15 +334,23 @@ class LowAltitude:
                 filenames.append(filename)
         
         mat = Mat(filenames,self.level)
-        mat.load_and_process()
-        mat.save_matrix('my_matrix.npy')
+        # 矩阵直接在内存中交给 findpath3d，只有指定了 matrix_cache 时才读写磁盘
+        if not (self.matrix_cache and mat.load_cache(self.matrix_cache)):
+            if not mat.load_and_process():
+                return None,None
+            if self.matrix_cache:
+                mat.save_cache(self.matrix_cache)
 
-        return(mat.x_min,mat.y_min,mat.z_min)
+        return mat.matrix,(mat.x_min,mat.y_min,mat.z_min)
 
-    def findpath3d(self,shift,sp,ep):
+    def findpath3d(self,matrix,shift,sp,ep,visualize=None,snapped=False):
         """
         使用A*算法在3D网格中查找路径，处理坐标偏移
         使用类属性中的起点和终点坐标
+        visualize: 是否输出该段的 HTML（并行细化时关闭，避免多个进程写同一个文件），
+                   None 表示按 headless 决定；有 renderer 时交给后台线程
+        snapped: 起终点已是全局坐标下的可通行体素（snap_boundaries 的结果），
+                 不在本窗口内限制和修正；超出窗口时把窗口扩展到包含它们
         
         返回:
         list: 路径坐标列表 (还原偏移后的坐标)
@@ -190,10 +360,10 @@ class LowAltitude:
         endpoint = ep
 
         
-        # 加载矩阵和偏移量
-        matrix = np.load('my_matrix.npy')
-        
-        # 获取偏移量（假设这些值已存储在类属性中）
+        if snapped:
+            matrix, shift = extend_window(matrix, shift, (sp, ep))
+
+        # 获取偏移量（load_map 返回的矩阵偏移）
         x_min = int(shift[0])
         y_min = int(shift[1])
         z_min = int(shift[2])
@@ -211,8 +381,10 @@ class LowAltitude:
             endpoint[2] - z_min
         )
         
-        # 创建网格对象
-        grid = Grid(matrix=matrix)
+        # 分段边界点的高度可能超出窗口，限制在矩阵范围内
+        start_shifted = tuple(int(min(max(c, 0), n - 1)) for c, n in zip(start_shifted, matrix.shape))
+        end_shifted = tuple(int(min(max(c, 0), n - 1)) for c, n in zip(end_shifted, matrix.shape))
+
         print("origin",start_shifted)
         print("origin",end_shifted)
         # 使用Spot_correction类修正起点和终点
@@ -223,26 +395,16 @@ class LowAltitude:
         print("new",start_shifted)
         print("new",end_shifted)
         
-        # 设置起点和终点（使用偏移后的坐标）
-        start = grid.node(start_shifted[0], start_shifted[1], start_shifted[2])
-        end = grid.node(end_shifted[0], end_shifted[1], end_shifted[2])
-        
-
-        # 创建A*查找器实例（允许对角线移动）
-        finder = AStarFinder(diagonal_movement=DiagonalMovement.always)
-        #检查起点
-        print("start node:",start)
-        
-        
-
+        # 多分辨率查找器：先在最大池化后的粗层级上寻路，再逐级在走廊内细化
+        # 金字塔按区块偏移量和矩阵内容的摘要缓存，同一组区块只构建一次，地图更新后不会用到旧的金字塔
+        finder = MultiResolutionFinder(diagonal_movement=DiagonalMovement.always)
 
         # 查找路径
-        path, runs = finder.find_path(start, end, grid)
+        path, runs = finder.find_path(start_shifted, end_shifted, matrix, map_key=(x_min, y_min, z_min, matrix.shape))
         
         # 将路径转换为坐标元组列表并还原偏移
         path_coords = []
-        for p in path:
-            coords = p.identifier
+        for coords in path:
             # 还原偏移
             restored_coords = (
                 coords[0] + x_min,
@@ -251,16 +413,24 @@ class LowAltitude:
             )
             path_coords.append(restored_coords)
         
-        print("operations:", runs, "path length:", len(path_coords))
+        print("operations:", runs, "coarse level:", finder.coarse_level, "path length:", len(path_coords))
         #print("path:", path_coords)
         
         # 可视化路径（可选）
-        
+        # 只有可视化需要完整网格，寻路本身不再构建
+        if visualize is None:
+            visualize = not self.headless
+        if not visualize:
+            return path_coords
+        if self.renderer is not None:
+            self.renderer.submit_segment(matrix, path, start_shifted, end_shifted)
+            return path_coords
         try:
+            grid = Grid(matrix=matrix)
             grid.visualize(
                 path=path,
-                start=start,
-                end=end,
+                start=start_shifted,
+                end=end_shifted,
                 visualize_weight=False,
                 save_html=True,
                 save_to="path_visualization.html",
@@ -275,42 +445,17 @@ class LowAltitude:
         
         return path_coords
 
-    def point_slice(self,startpoint, endpoint, distance=100):
-        """
-        在起点到终点的连线上找到距离起点指定距离的点
-        
-        参数:
-        startpoint: 起点坐标 [x1, y1, z1]
-        endpoint: 终点坐标 [x2, y2, z2]
-        distance: 目标距离 (米), 默认为70
-        
-        返回:
-        new_endpoint: 新的端点坐标
-        """
-        # 转换为numpy数组便于计算
-        start = np.array(startpoint)
-        end = np.array(endpoint)
-        
-        # 计算方向向量
-        direction_vector = end - start
-        
-        # 计算两点间的总距离
-        total_distance = np.linalg.norm(direction_vector)
-        
-        # 如果两点重合或距离为0，无法计算
-        if total_distance == 0:
-            raise ValueError("起点和终点重合，无法确定方向")
-        if total_distance <= 100:
-            return endpoint
-        
-        # 计算单位方向向量
-        unit_vector = direction_vector / total_distance
-        
-        # 计算距离起点70米处的点
-        new_endpoint = start + unit_vector * distance
-        new_endpoint = np.round(new_endpoint).astype(int)
-        return new_endpoint.tolist()
-    
+    def _show_plan(self, path, visualize=None):
+        """整条航线的可视化：有 renderer 时后台截图，否则弹出 pyvista 窗口"""
+        if visualize is None:
+            visualize = not self.headless
+        if not visualize:
+            return
+        if self.renderer is not None:
+            self.renderer.submit_plan(path, self.startpoint, self.endpoint)
+        else:
+            self.visualize(path)
+
     def visualize(self, path=None):
         """可视化地图和路径"""
         try:
@@ -372,8 +517,9 @@ if __name__ == "__main__":
     startpoint = [117.120049, 31.835725, 45]
     endpoint = [117.120788, 31.835579, 36]
     
-    # 创建低空飞行规划对象
-    flight_plan = LowAltitude(startpoint, endpoint)
+    # 创建低空飞行规划对象，可视化文件由后台线程写到 renders/
+    renderer = BackgroundRenderer()
+    flight_plan = LowAltitude(startpoint, endpoint, headless=False, renderer=renderer)
     print(flight_plan.startpoint)
     print(flight_plan.endpoint)
     
@@ -385,4 +531,8 @@ if __name__ == "__main__":
     print("endpoint:", flight_plan.endpoint)
 
     print("path:", path)
+
+    # 等待可视化文件写完
+    renderer.close()
+    print("可视化文件:", renderer.rendered)
  
@@ -3,29 +3,45 @@ sys.path.append('.')
 import numpy as np
 from moudles.linear import transformer
 from moudles.matrix import Mat
+from moudles.worldmap import WORLD_PATH, open_world
 from moudles.spot import Spot_correction
 from pathfinding3d.core.diagonal_movement import DiagonalMovement
 from pathfinding3d.core.grid import Grid
 from pathfinding3d.finder.a_star import AStarFinder
-from pathfinding25d import AStar3D
+from pathfinding25d import AStar3D, CoarseToFinePlanner, CruisePlanner
+from pathfinding25d.envelope import ensure_envelope, load_envelope
+from pathfinding25d.pyramid import ensure_height_pyramid
+from pathfinding25d.stats import print_progress
+
+# 无人机半径（米），2.5D 规划使用按此半径水平膨胀后的高度图
+DRONE_RADIUS = 2
 
 #这是全地图版本的寻路算法，起点上方不能有遮挡，用于高空规划
 class LowAltitude:
-    def __init__(self, startpoint, endpoint,level=15):
+    def __init__(self, startpoint, endpoint,level=15,matrix_cache=None,world=WORLD_PATH,drone_radius=DRONE_RADIUS):
         """
         初始化低空飞行规划对象
         
         参数:
         startpoint: 起始点坐标 [经度, 纬度, 高度]
         endpoint: 终点坐标 [经度, 纬度, 高度]
+        matrix_cache: 可选的拼接矩阵缓存文件（.npz），加载相同区块时直接读取；默认不写磁盘
+        world: 全局体素地图（mapinit/buildworld.py 生成的文件或 GlobalVoxelMap），
+               存在时直接截取窗口，不存在时按区块拼接
+        drone_radius: 无人机半径（米），长距离规划时与建筑保持的水平距离
         """
         self.startpoint_gps = startpoint
         self.endpoint_gps = endpoint
         self.level=level
+        self.matrix_cache=matrix_cache
+        self.world=open_world(world)
+        self.drone_radius=drone_radius
         
         # 将GPS坐标转换为平面坐标
-        self.startpoint = transformer.gps2txt(startpoint[0], startpoint[1], startpoint[2])
-        self.endpoint = transformer.gps2txt(endpoint[0], endpoint[1], endpoint[2])
+        # 起点和终点一次批量转换，高度保持原值
+        start, end = transformer.gps2txt_batch([startpoint, endpoint])
+        self.startpoint = (int(start[0]), int(start[1]), startpoint[2])
+        self.endpoint = (int(end[0]), int(end[1]), endpoint[2])
         
         # 比较两点之间的距离
         self.distance = np.max([self.endpoint[0] - self.startpoint[0], self.endpoint[1] - self.startpoint[1]])
@@ -39,15 +55,16 @@ class LowAltitude:
         # 长距离规划可以调用短距离规划作为子部分
         # 这里长距离调用2.5d栅格寻路，舍弃3维寻路
        
-        height_data = np.load('grid.npy')
-        astar = AStar3D(height_data, min_altitude=10, max_altitude=200)
+        # 安全包络：按无人机半径膨胀后的高度图，离线生成并按半径缓存
+        height_data = load_envelope('grid.npy', self.drone_radius)
+        astar = AStar3D(height_data, min_altitude=10, max_altitude=200, engine="packed")
         startpoint = self.startpoint
         endpoint = self.endpoint
         print("origin:", startpoint)
         print("origin:",endpoint)
 
         # 使用Spot_correction类修正起点和终点
-        spot_corrector = Spot_correction(np.load('grid.npy'))
+        spot_corrector = Spot_correction(height_data)
         startpoint=spot_corrector.find_nearest_free_point_bfs(startpoint)
         endpoint=spot_corrector.find_nearest_free_point_bfs(endpoint)
 
@@ -57,7 +74,22 @@ class LowAltitude:
 
         print(f"起点可达: {AStar3D.can_reach(astar, startpoint)}")
         print(f"终点可达: {AStar3D.can_reach(astar, endpoint)}")
-        path1 = astar.find_path(startpoint, endpoint)
+
+        # 先用 "爬升-巡航-下降" 的二维分层规划，代价只有一次平面搜索
+        cruise = CruisePlanner(height_data, clearance=10, max_altitude=200)
+        path1 = cruise.find_path(startpoint, endpoint)
+        if not path1:
+            # 再用高度金字塔做由粗到细的2.5D A*，只在粗路径周围的走廊内搜索
+            print("巡航层规划失败，改用由粗到细的2.5D A*")
+            planner = CoarseToFinePlanner(height_data, ensure_height_pyramid(ensure_envelope('grid.npy', self.drone_radius)),
+                                          min_altitude=10, max_altitude=200,
+                                          progress_callback=print_progress)
+            path1 = planner.find_path(startpoint, endpoint)
+
+        # 把逐格的阶梯路径拉直成少量航点
+        if path1:
+            path1 = astar.smooth_path(path1)
+            print(f"拉直后的航点数: {len(path1)}")
 
         return path1
 
@@ -68,8 +100,10 @@ class LowAltitude:
         返回直接路径
         """
         print("使用短距离路径规划算法")
-        shift=self.load_map(sp,ep)
-        path3d=self.findpath3d(shift)
+        matrix,shift=self.load_map(sp,ep)
+        if matrix is None:
+            return []
+        path3d=self.findpath3d(matrix,shift)
         ##print(path3d)
         
 
@@ -92,12 +126,12 @@ class LowAltitude:
         if self.distance > 74:
             path = self._plan_long_distance()
             ##计算坐标转回gps坐标输出
-            path = transformer.txt2gps(np.array(path))
+            path = transformer.txt2gps_batch(path).tolist()
             return path
         else:
             path = self._plan_short_distance(self.startpoint,self.endpoint)
             ##计算坐标转回gps坐标输出
-            path = transformer.txt2gps(np.array(path))
+            path = transformer.txt2gps_batch(path).tolist()
             return path
         
     def load_map(self,sp,ep):
@@ -106,8 +140,12 @@ class LowAltitude:
         采用象限判断法确定需要加载的四个区块
         
         返回:
-        list: 包含四个最近区块文件名的列表
+        (matrix, (x_min, y_min, z_min)): 拼接后的矩阵及其偏移量，没有可用区块时 matrix 为 None
         """
+        if self.world is not None:
+            # 全局体素地图：只需截取起终点周围的窗口（内存映射的视图），偏移量即窗口原点
+            return self.world.window_around(sp,ep)
+
         # 计算中点坐标
         mid_x = (sp[0] + ep[0]) / 2
         mid_y = (sp[1] + ep[1]) / 2
@@ -152,12 +190,16 @@ class LowAltitude:
                 filenames.append(filename)
         
         mat = Mat(filenames,self.level)
-        mat.load_and_process()
-        mat.save_matrix('my_matrix.npy')
+        # 矩阵直接在内存中交给 findpath3d，只有指定了 matrix_cache 时才读写磁盘
+        if not (self.matrix_cache and mat.load_cache(self.matrix_cache)):
+            if not mat.load_and_process():
+                return None,None
+            if self.matrix_cache:
+                mat.save_cache(self.matrix_cache)
 
-        return(mat.x_min,mat.y_min,mat.z_min)
+        return mat.matrix,(mat.x_min,mat.y_min,mat.z_min)
 
-    def findpath3d(self,shift):
+    def findpath3d(self,matrix,shift):
         """
         使用A*算法在3D网格中查找路径，处理坐标偏移
         使用类属性中的起点和终点坐标
@@ -170,10 +212,7 @@ class LowAltitude:
         endpoint = self.endpoint
 
         
-        # 加载矩阵和偏移量
-        matrix = np.load('my_matrix.npy')
-        
-        # 获取偏移量（假设这些值已存储在类属性中）
+        # 获取偏移量（load_map 返回的矩阵偏移）
         x_min = int(shift[0])
         y_min = int(shift[1])
         z_min = int(shift[2])
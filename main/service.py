@@ -0,0 +1,325 @@
+import sys
+sys.path.append('.')
+import asyncio
+import itertools
+import json
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from main.main import LowAltitude
+
+# 本地服务监听的地址和端口（每行一个 JSON 请求/响应）
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = 8765
+# 规划进程数（搜索是 CPU 密集的，放到进程池里，事件循环只负责排队和超时）
+PLAN_WORKERS = 2
+# 等待队列的长度，队列满时新请求直接返回 busy
+MAX_QUEUE = 8
+# 默认的请求时限（秒），从提交时开始计算，包括排队时间
+DEFAULT_DEADLINE = 120
+
+
+def run_plan(startpoint, endpoint, options):
+    """
+    在工作进程中执行一次完整规划（不可视化）
+
+    参数:
+    startpoint, endpoint: [经度, 纬度, 高度]
+    options: 传给 LowAltitude 的其他参数
+
+    返回:
+    GPS 航点列表
+    """
+    planner = LowAltitude(startpoint, endpoint, **options)
+    return np.asarray(planner.fullplan(visualize=False)).tolist()
+
+
+class PlanJob:
+    """一个排队中或正在执行的规划请求"""
+
+    def __init__(self, job_id, client, startpoint, endpoint, future):
+        self.id = job_id
+        self.client = client
+        self.startpoint = startpoint
+        self.endpoint = endpoint
+        self.future = future
+
+    def finish(self, status, **fields):
+        """设置请求的结果，已有结果（被取消/超时）时忽略"""
+        if not self.future.done():
+            self.future.set_result({'id': self.id, 'status': status, **fields})
+
+
+class PlanningService:
+    """
+    异步规划服务：请求进入有界队列，由固定数量的执行协程交给进程池规划。
+
+    - 队列满时请求立即返回 busy，不会无限堆积
+    - 每个请求有时限，超时返回 timeout
+    - 同一客户端提交新请求时，它之前未完成的请求作废（返回 cancelled）
+    - 作废或超时的请求还没开始时直接取消；已在工作进程中运行的搜索无法中断，
+      只丢弃其结果，执行协程等它结束后再取下一个请求
+    - 提交失败（如工作进程崩溃后进程池损坏）时请求返回 error，自己创建的进程池会重新创建
+
+    响应为字典: {'id', 'status': ok/busy/timeout/cancelled/error, 'path' 或 'error'}
+    """
+
+    def __init__(self, workers=PLAN_WORKERS, max_queue=MAX_QUEUE, deadline=DEFAULT_DEADLINE,
+                 options=None, plan_func=run_plan, executor=None):
+        """
+        参数:
+        workers: 同时执行的规划数（进程池大小）
+        max_queue: 等待队列的长度
+        deadline: 默认时限（秒）
+        options: 传给 LowAltitude 的其他参数，如 {'workers': 4}
+        plan_func: 执行规划的函数 plan_func(startpoint, endpoint, options)，需能被子进程导入
+        executor: 可选的执行器，默认新建 ProcessPoolExecutor
+        """
+        self.workers = workers
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self.options = options or {}
+        self.plan_func = plan_func
+        self._executor = executor
+        self._own_executor = executor is None
+        self._queue = None
+        self._runners = []
+        self._pending = {}  # 客户端 -> 该客户端最新的未完成请求
+        self._ids = itertools.count(1)
+
+    async def start(self):
+        """创建队列、进程池和执行协程（需在事件循环中调用）"""
+        self._queue = asyncio.Queue(self.max_queue)
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        self._runners = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """停止服务：未完成的请求返回 cancelled，关闭自己创建的进程池"""
+        for runner in self._runners:
+            runner.cancel()
+        await asyncio.gather(*self._runners, return_exceptions=True)
+        self._runners = []
+        while self._queue is not None and not self._queue.empty():
+            self._queue.get_nowait().finish('cancelled')
+        for job in list(self._pending.values()):
+            job.finish('cancelled')
+        if self._own_executor and self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def plan(self, startpoint, endpoint, client=None, deadline=None):
+        """
+        提交一个规划请求并等待结果
+
+        参数:
+        startpoint, endpoint: [经度, 纬度, 高度]
+        client: 客户端标识，同一客户端的新请求会使旧请求作废；None 表示不作废
+        deadline: 时限（秒），默认使用服务的时限
+
+        返回:
+        响应字典
+        """
+        loop = asyncio.get_running_loop()
+        job = PlanJob(next(self._ids), client, startpoint, endpoint, loop.create_future())
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            # 新请求没有进入队列，客户端之前的请求保持有效
+            return {'id': job.id, 'status': 'busy'}
+        if client is not None:
+            self.cancel(client)
+            self._pending[client] = job
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(job.future),
+                                          self.deadline if deadline is None else deadline)
+        except asyncio.TimeoutError:
+            job.finish('timeout')
+            return job.future.result()
+        finally:
+            if self._pending.get(client) is job:
+                del self._pending[client]
+
+    def cancel(self, client):
+        """
+        作废某个客户端未完成的请求
+
+        返回:
+        bool: 是否有请求被作废
+        """
+        job = self._pending.pop(client, None)
+        if job is None or job.future.done():
+            return False
+        job.finish('cancelled')
+        return True
+
+    def stats(self):
+        """队列中的请求数和未完成的客户端数"""
+        return {
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'max_queue': self.max_queue,
+            'pending_clients': len(self._pending),
+            'workers': self.workers,
+        }
+
+    async def _run(self):
+        """
+        执行协程：从队列取请求交给进程池，请求已作废或超时则跳过。
+        每个执行协程同时只有一个搜索在进程池中，进程池内部不会堆积已过期的请求
+        """
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.future.done():
+                    continue
+                executor = self._executor
+                try:
+                    task = executor.submit(self.plan_func, job.startpoint, job.endpoint, self.options)
+                except Exception as e:
+                    job.finish('error', error=f"{type(e).__name__}: {e}")
+                    if isinstance(e, BrokenProcessPool):
+                        self._reset_executor(executor)
+                    continue
+                work = asyncio.wrap_future(task)
+                await asyncio.wait({work, job.future}, return_when=asyncio.FIRST_COMPLETED)
+                if work.done() and not work.cancelled():
+                    try:
+                        job.finish('ok', path=work.result())
+                    except BrokenProcessPool as e:
+                        job.finish('error', error=f"{type(e).__name__}: {e}")
+                        self._reset_executor(executor)
+                    except Exception as e:
+                        job.finish('error', error=f"{type(e).__name__}: {e}")
+                elif not task.cancel():
+                    # 请求作废或超时，但搜索已经在工作进程中运行、无法中断：
+                    # 丢弃结果，等它结束后再取下一个请求，同时运行的搜索不超过 workers 个
+                    await asyncio.wait({work})
+                    if not work.cancelled():
+                        work.exception()
+            finally:
+                self._queue.task_done()
+
+    def _reset_executor(self, broken):
+        """
+        工作进程崩溃后进程池不能再提交任务：自己创建的进程池换成新的，
+        外部传入的执行器只能由调用者处理。多个执行协程同时发现时只替换一次
+        """
+        if not self._own_executor or self._executor is not broken:
+            return
+        print("进程池已损坏，重新创建")
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    async def serve(self, host=SERVICE_HOST, port=SERVICE_PORT):
+        """
+        在本地套接字上提供服务，每行一个 JSON：
+        {"op": "plan", "start": [...], "end": [...], "client": "uav1", "deadline": 60}
+        {"op": "cancel", "client": "uav1"}
+        {"op": "stats"}
+        同一连接上的请求并发处理，响应带上请求中的 "ref"（如果有）
+        """
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def _handle(self, reader, writer):
+        """处理一个连接"""
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def respond(request):
+            try:
+                response = await self._dispatch(request)
+            except Exception as e:
+                response = {'status': 'error', 'error': f"{type(e).__name__}: {e}"}
+            if 'ref' in request:
+                response['ref'] = request['ref']
+            async with lock:
+                writer.write((json.dumps(response) + '\n').encode())
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError as e:
+                    request = {'op': 'invalid', 'error': str(e)}
+                task = asyncio.create_task(respond(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def _dispatch(self, request):
+        """执行一个 JSON 请求"""
+        op = request.get('op')
+        if op == 'plan':
+            return await self.plan(request['start'], request['end'],
+                                   request.get('client'), request.get('deadline'))
+        if op == 'cancel':
+            return {'status': 'ok', 'cancelled': self.cancel(request.get('client'))}
+        if op == 'stats':
+            return {'status': 'ok', **self.stats()}
+        return {'status': 'error', 'error': request.get('error', f"未知操作: {op}")}
+
+
+class LocalClient:
+    """
+    不经过网络、直接调用服务的客户端，接口与 SocketClient 相同，用于测试
+    """
+
+    def __init__(self, service, client=None):
+        self.service = service
+        self.client = client
+
+    async def plan(self, startpoint, endpoint, deadline=None):
+        return await self.service.plan(startpoint, endpoint, self.client, deadline)
+
+    async def cancel(self):
+        return {'status': 'ok', 'cancelled': self.service.cancel(self.client)}
+
+
+class SocketClient:
+    """通过本地套接字访问服务的客户端，每个请求使用一个连接"""
+
+    def __init__(self, host=SERVICE_HOST, port=SERVICE_PORT, client=None):
+        self.host = host
+        self.port = port
+        self.client = client
+
+    async def _request(self, request):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write((json.dumps(request) + '\n').encode())
+            await writer.drain()
+            return json.loads(await reader.readline())
+        finally:
+            writer.close()
+
+    async def plan(self, startpoint, endpoint, deadline=None):
+        return await self._request({'op': 'plan', 'start': list(startpoint), 'end': list(endpoint),
+                                    'client': self.client, 'deadline': deadline})
+
+    async def cancel(self):
+        return await self._request({'op': 'cancel', 'client': self.client})
+
+
+async def main():
+    service = PlanningService()
+    await service.start()
+    server = await service.serve()
+    print(f"规划服务已启动: {SERVICE_HOST}:{SERVICE_PORT}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,47 +1,143 @@
+import sys
+sys.path.append('.')
 import numpy as np
 import os
+from concurrent.futures import ProcessPoolExecutor
 
-def create_25d_grid(input_txt_path, output_dir, output_filename="grid.npy", x_max=1891, y_max=1330, z_min=-22):
+from moudles.tilestore import CHUNK_ROWS, VOXEL_SUFFIX, iter_text_points, load_voxel_tile
+
+
+def iter_columns(input_path, chunk_rows=CHUNK_ROWS):
+    """
+    Stream (x, y, z) integer points from a TXT point file or a binary voxel tile.
+
+    TXT files are read in chunks of chunk_rows lines. For voxel tiles (.vox.npz)
+    only the highest occupied voxel of every column is yielded, which is all
+    the height map needs.
+    """
+    if input_path.endswith(VOXEL_SUFFIX):
+        origin, occupancy = load_voxel_tile(input_path)
+        xs, ys = np.nonzero(occupancy.any(axis=2))
+        top = occupancy.shape[2] - 1 - np.argmax(occupancy[xs, ys, ::-1], axis=1)
+        yield np.column_stack([xs + origin[0], ys + origin[1], top + origin[2]])
+        return
+    for chunk in iter_text_points(input_path, chunk_rows):
+        yield chunk.astype(np.int64)
+
+
+def file_heights(input_path, x_max, y_max, z_min, chunk_rows=CHUNK_ROWS):
+    """
+    Reduce one input file to the max z of every (x, y) cell it touches.
+
+    Returns:
+        (x0, y0, heights, out_of_bounds, out_of_bounds_min, out_of_bounds_max):
+        heights is indexed [y, x] like the full grid and covers only the
+        bounding box of the in-bounds points of the file, starting at
+        (x0, y0); cells without points hold z_min.
+        heights is None when the file has no in-bounds points.
+    """
+    columns = np.empty((0, 3), dtype=np.int64)
+    out_of_bounds = 0
+    oob_min = oob_max = None
+    for points in iter_columns(input_path, chunk_rows):
+        inside = (points[:, 0] >= 0) & (points[:, 0] <= x_max) & (points[:, 1] >= 0) & (points[:, 1] <= y_max)
+        outside = points[~inside]
+        if len(outside):
+            out_of_bounds += len(outside)
+            lo, hi = outside.min(axis=0), outside.max(axis=0)
+            oob_min = lo if oob_min is None else np.minimum(oob_min, lo)
+            oob_max = hi if oob_max is None else np.maximum(oob_max, hi)
+        # reduce every chunk right away, only the highest point per cell is kept
+        columns = _column_max(np.concatenate([columns, points[inside]]))
+
+    if not len(columns):
+        return 0, 0, None, out_of_bounds, oob_min, oob_max
+    x0, y0 = columns[:, 0].min(), columns[:, 1].min()
+    heights = np.full((columns[:, 1].max() - y0 + 1, columns[:, 0].max() - x0 + 1), z_min, dtype=int)
+    heights[columns[:, 1] - y0, columns[:, 0] - x0] = np.maximum(columns[:, 2], z_min)
+    return int(x0), int(y0), heights, out_of_bounds, oob_min, oob_max
+
+
+def _column_max(points):
+    """Keep only the highest point of every (x, y) column (scatter-max via sort)."""
+    order = np.lexsort((points[:, 2], points[:, 1], points[:, 0]))
+    points = points[order]
+    last = np.ones(len(points), dtype=bool)
+    last[:-1] = (points[1:, 0] != points[:-1, 0]) | (points[1:, 1] != points[:-1, 1])
+    return points[last]
+
+
+def create_25d_grid(input_txt_path, output_dir, output_filename="grid.npy", x_max=1891, y_max=1330, z_min=-22,
+                    workers=None):
     """
     Create a 2.5D grid from point cloud data, taking max z for each (x, y) cell, and save as NPY.
-    
+
+    The grid is indexed grid[y, x] (shape (y_max + 1, x_max + 1)), the layout
+    pathfinding25d and moudles.mapupdate read and patch.
+
+    Input files are streamed in chunks and reduced with a vectorized
+    scatter-max; several files are reduced in parallel and merged into one
+    height map. Out-of-bounds points are skipped and reported as totals.
+
     Args:
-        input_txt_path (str): Path to input TXT file with point cloud data (x y z per line)
+        input_txt_path (str or list): Input TXT file(s) with point cloud data (x y z per line)
+            and/or binary voxel tiles (.vox.npz)
         output_dir (str): Directory to save output NPY file
         output_filename (str): Name of the output NPY file
         x_max (int): Maximum x value (inclusive)
         y_max (int): Maximum y value (inclusive)
         z_min (int): Minimum z value for initialization
+        workers (int): Number of processes for several input files (None: one per CPU, 1: no pool)
     """
+    input_paths = [input_txt_path] if isinstance(input_txt_path, str) else list(input_txt_path)
+
     # Calculate grid dimensions
     grid_width = x_max + 1  # 0 to x_max inclusive
     grid_height = y_max + 1  # 0 to y_max inclusive
 
-    # Ensure input file exists
-    if not os.path.exists(input_txt_path):
-        print(f"Input TXT file {input_txt_path} does not exist")
+    # Ensure input files exist
+    missing = [path for path in input_paths if not os.path.exists(path)]
+    for path in missing:
+        print(f"Input file {path} does not exist")
+    input_paths = [path for path in input_paths if path not in missing]
+    if not input_paths:
         return
 
     # Ensure output directory exists
     os.makedirs(output_dir, exist_ok=True)
     output_npy_path = os.path.join(output_dir, output_filename)
 
-    # Read point cloud data (assuming integers)
+    # Initialize grid with z_min (for cells with no points)
+    grid = np.full((grid_height, grid_width), z_min, dtype=int)
+
+    args = [(path, x_max, y_max, z_min) for path in input_paths]
+    if workers == 1 or len(input_paths) == 1:
+        results = (file_heights(*a) for a in args)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(file_heights, *zip(*args))
+
+    # Merge the per-file height maps with max z for each (x, y)
+    out_of_bounds = 0
     try:
-        points = np.loadtxt(input_txt_path, delimiter=' ', dtype=int)
+        for path, result in zip(input_paths, results):
+            x0, y0, heights, skipped, lo, hi = result
+            if heights is not None:
+                region = grid[y0:y0 + heights.shape[0], x0:x0 + heights.shape[1]]
+                np.maximum(region, heights, out=region)
+            if skipped:
+                out_of_bounds += skipped
+                print(f"{os.path.basename(path)}: {skipped} points out of bounds, skipped "
+                      f"(x {lo[0]}..{hi[0]}, y {lo[1]}..{hi[1]})")
     except Exception as e:
-        print(f"Failed to read TXT file {input_txt_path}: {e}")
+        print(f"Failed to read input file: {e}")
         return
-
-    # Initialize grid with z_min (for cells with no points)
-    grid = np.full((grid_width, grid_height), z_min, dtype=int)
-
-    # Update grid with max z for each (x, y)
-    for x, y, z in points:
-        if 0 <= x <= x_max and 0 <= y <= y_max:
-            grid[x, y] = max(grid[x, y], z)
-        else:
-            print(f"Point ({x}, {y}, {z}) out of bounds, skipped")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    if out_of_bounds:
+        print(f"{out_of_bounds} points out of bounds in total, skipped")
 
     # Save grid to NPY file
     try:
@@ -54,4 +150,4 @@ def create_25d_grid(input_txt_path, output_dir, output_filename="grid.npy", x_ma
 if __name__ == "__main__":
     input_txt_path = "F:\my pathfinding\Data_txt\outputlinear.txt"
     output_dir = "F:\my pathfinding"
-    create_25d_grid(input_txt_path, output_dir)
\ No newline at end of file
+    create_25d_grid(input_txt_path, output_dir)
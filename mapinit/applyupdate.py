@@ -0,0 +1,36 @@
+import sys
+sys.path.append('.')
+import os
+
+from moudles.mapupdate import MapUpdater
+from moudles.tilestore import load_text_voxels
+
+# 把新扫描到的障碍点（或需要清除的区域）增量合并进区块地图，
+# 只重新计算受影响区块范围内的 grid.npy、安全包络和全局体素地图，不需要重新跑 2_5map.py / buildworld。
+
+# 区块文件夹
+base_path = "F:/my pathfinding/Data_txt"
+
+# 新的障碍点文件（每行 x y z，txt 坐标），没有时设为 None
+scan_path = "F:/my pathfinding/Data_txt/new_obstacles.txt"
+
+# 需要清除的区域 [(lower, upper), ...]，含两端，txt 坐标
+clear_boxes = []
+
+# 需要维护的安全包络半径（与 LowAltitude 的无人机半径相同）
+envelope_radii = (2,)
+
+
+if __name__ == "__main__":
+    updater = MapUpdater(base_path, envelope_radii=envelope_radii)
+
+    if scan_path and os.path.exists(scan_path):
+        changed = updater.add_obstacles(load_text_voxels(scan_path))
+        print(f"新增障碍: {len(changed)} 个区块")
+    for lower, upper in clear_boxes:
+        changed = updater.clear_region(lower, upper)
+        print(f"清除区域 {lower} - {upper}: {len(changed)} 个区块")
+
+    # 派生数据只对脏区块重新计算；也可以留到规划前再调用 refresh
+    for name, tiles in updater.refresh().items():
+        print(f"{name}: 重新计算 {len(tiles)} 个区块")
@@ -0,0 +1,19 @@
+import sys
+sys.path.append('.')
+import time
+
+from moudles.worldmap import WORLD_PATH, build_world
+
+# 区块所在文件夹（文本区块会先转换为二进制体素区块）
+input_txt_dir = "F:/my pathfinding/Data_txt"
+
+# 输出的全局体素地图（同名 .json 保存原点和尺寸）
+output_path = WORLD_PATH
+
+# 占据体至少延伸到的高度，与 LowAltitude 的 level 含义相同
+top = 120
+
+start_time = time.time()
+world = build_world(input_txt_dir, output_path, top=top)
+print(f"全局体素地图已保存到 {output_path}，原点 {world.origin.tolist()}，尺寸 {world.shape}，"
+      f"用时 {time.time() - start_time:.1f}s")
@@ -1,6 +1,13 @@
+import sys
+sys.path.append('.')
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import pymeshlab as ml
 import numpy as np
-import os
+
+from moudles.tilestore import file_sha1, load_manifest, retire_text, save_manifest, save_voxel_tile, voxel_path
 
 # 指定输入OBJ文件夹路径
 input_obj_dir = "H:/3dpointcloud/Data_obj19"
@@ -8,55 +15,110 @@ input_obj_dir = "H:/3dpointcloud/Data_obj19"
 # 指定输出文件夹
 output_dir = "H:/3dpointcloud/Data_txt"
 
-# 确保输出文件夹存在
-os.makedirs(output_dir, exist_ok=True)
-
-# 获取输入文件夹中的所有OBJ文件
-obj_files = [f for f in os.listdir(input_obj_dir) if f.endswith('.obj')]
-
-if not obj_files:
-    print(f"在文件夹 {input_obj_dir} 中未找到OBJ文件")
-    exit(1)
-
-print(f"找到 {len(obj_files)} 个OBJ文件，开始转换...")
-
-# 处理每个OBJ文件
-for obj_file in obj_files:
-    # 构建完整的输入文件路径
-    input_obj_path = os.path.join(input_obj_dir, obj_file)
-    
-    # 生成输出TXT文件名（与输入文件同名，仅扩展名不同）
-    output_filename = os.path.splitext(obj_file)[0] + '.txt'
-    output_txt_path = os.path.join(output_dir, output_filename)
-    
-    print(f"正在处理: {obj_file}")
-    
+# 并行转换的进程数
+workers = os.cpu_count() or 1
+
+# 除二进制体素区块（.vox.npz，Mat 和 buildworld 直接读取）外是否还输出文本区块（较慢，只在仍需要文本的工具中打开）
+write_text = False
+
+# 只输出二进制时，以前的文本区块已经过期：默认改名为 .stale 保留，为 True 时删除
+remove_text = False
+
+# 记录每个OBJ文件的 sha1 和输出文件，内容没变的区块下次直接跳过
+manifest_path = os.path.join(output_dir, "obj2txt_manifest.json")
+
+
+def sample_obj(input_obj_path):
+    """
+    对OBJ网格做Poisson Disk Sampling，返回取整并偏移后的点 (n, 3)
+    """
     # 创建MeshSet并加载OBJ文件
     ms = ml.MeshSet()
-    try:
-        ms.load_new_mesh(input_obj_path)
-        
-        # 应用Poisson Disk Sampling过滤器，设置半径为边界框对角线的1%
-        p = ml.PercentageValue(1)
-        ms.generate_sampling_poisson_disk(radius=p)
-        
-        # 获取当前网格（采样后的点云）
-        m = ms.current_mesh()
-        
-        # 提取顶点坐标作为numpy数组
-        points = m.vertex_matrix()
-        
-        # 对点坐标进行四舍五入并偏移
-        points = np.round(points).astype(int)
-        points[:, 0] -= -786  # Shift x coordinates
-        points[:, 1] -= -743  # Shift y coordinates
-        
-        # 保存为TXT文件，每行x y z以空格分隔
-        np.savetxt(output_txt_path, points, delimiter=' ', fmt='%d')
-        print(f"已保存: {output_filename}")
-        
-    except Exception as e:
-        print(f"处理文件 {obj_file} 时出错: {e}")
-        continue  # 继续处理下一个文件
-
-print("批量转换完成！")
\ No newline at end of file
+    ms.load_new_mesh(input_obj_path)
+
+    # 应用Poisson Disk Sampling过滤器，设置半径为边界框对角线的1%
+    p = ml.PercentageValue(1)
+    ms.generate_sampling_poisson_disk(radius=p)
+
+    # 提取采样后点云的顶点坐标
+    points = ms.current_mesh().vertex_matrix()
+
+    # 对点坐标进行四舍五入并偏移
+    points = np.round(points).astype(int)
+    points[:, 0] -= -786  # Shift x coordinates
+    points[:, 1] -= -743  # Shift y coordinates
+    return points
+
+
+def convert_obj(input_obj_path, output_dir, known_sha1=None, write_text=False, remove_text=False):
+    """
+    转换一个OBJ文件（在工作进程中运行）
+
+    参数:
+    input_obj_path: OBJ文件
+    output_dir: 输出文件夹
+    known_sha1: 清单中记录的 sha1，与当前文件相同且输出都在时跳过
+    write_text: 是否同时输出文本区块
+    remove_text: 只输出二进制时是否删除以前的（已过期的）文本区块，否则改名为 .stale
+
+    返回:
+    (状态 'skipped'/'converted', 清单条目)
+    """
+    obj_file = os.path.basename(input_obj_path)
+    txt_path = os.path.join(output_dir, os.path.splitext(obj_file)[0] + '.txt')
+    outputs = [voxel_path(txt_path)] + ([txt_path] if write_text else [])
+    sha1 = file_sha1(input_obj_path)
+    entry = {'sha1': sha1, 'outputs': [os.path.basename(f) for f in outputs]}
+    if sha1 == known_sha1 and all(os.path.exists(f) for f in outputs):
+        return 'skipped', entry
+
+    points = sample_obj(input_obj_path)
+    if write_text:
+        # 保存为TXT文件，每行x y z以空格分隔；二进制区块记录文本的修改时间，Mat 据此判断是否过期
+        np.savetxt(txt_path, points, delimiter=' ', fmt='%d')
+        save_voxel_tile(outputs[0], points, txt_path)
+    else:
+        # 以前的文本区块是旧网格的结果，不再作为二进制区块的来源
+        retire_text(txt_path, remove_text)
+        save_voxel_tile(outputs[0], points)
+    return 'converted', entry
+
+
+if __name__ == "__main__":
+    # 确保输出文件夹存在
+    os.makedirs(output_dir, exist_ok=True)
+
+    # 获取输入文件夹中的所有OBJ文件
+    obj_files = sorted(f for f in os.listdir(input_obj_dir) if f.endswith('.obj'))
+
+    if not obj_files:
+        print(f"在文件夹 {input_obj_dir} 中未找到OBJ文件")
+        exit(1)
+
+    print(f"找到 {len(obj_files)} 个OBJ文件，使用 {workers} 个进程开始转换...")
+
+    manifest = load_manifest(manifest_path)
+    counts = {'converted': 0, 'skipped': 0, 'failed': 0}
+    start_time = time.time()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(convert_obj, os.path.join(input_obj_dir, obj_file), output_dir,
+                        manifest.get(obj_file, {}).get('sha1'), write_text, remove_text): obj_file
+            for obj_file in obj_files
+        }
+        for future in as_completed(futures):
+            obj_file = futures[future]
+            try:
+                status, entry = future.result()
+            except Exception as e:
+                counts['failed'] += 1
+                print(f"处理文件 {obj_file} 时出错: {e}")
+                continue  # 继续处理下一个文件
+            counts[status] += 1
+            if status == 'converted':
+                manifest[obj_file] = entry
+                save_manifest(manifest_path, manifest)
+                print(f"已保存: {', '.join(entry['outputs'])}")
+
+    print(f"批量转换完成！转换 {counts['converted']} 个，跳过 {counts['skipped']} 个，"
+          f"失败 {counts['failed']} 个，用时 {time.time() - start_time:.1f}s")
@@ -0,0 +1,95 @@
+import sys
+sys.path.append('.')
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from moudles.meshvox import voxelize_obj
+from moudles.tilestore import VOXEL_SUFFIX, file_sha1, load_manifest, retire_text, save_manifest, save_occupancy_tile
+
+# 把OBJ网格的三角形直接体素化成二进制体素区块，不经过泊松采样和文本（代替 obj2txt.py + txt2vox.py）。
+# 三角形与体素做保守的相交测试，薄墙不会因为采样稀疏而出现空洞。
+# 输出与 obj2txt.py 同名的 Tile_*_L19_*.vox.npz，Mat（load_map）和 buildworld 直接读取。
+
+# 指定输入OBJ文件夹路径
+input_obj_dir = "H:/3dpointcloud/Data_obj19"
+
+# 指定输出文件夹
+output_dir = "H:/3dpointcloud/Data_txt"
+
+# 并行转换的进程数
+workers = os.cpu_count() or 1
+
+# 以前的文本区块（obj2txt.py 的输出）已被新的体素区块代替：默认改名为 .stale 保留，为 True 时删除
+remove_text = False
+
+# 记录每个OBJ文件的 sha1，内容没变的区块下次直接跳过
+manifest_path = os.path.join(output_dir, "obj2vox_manifest.json")
+
+
+def convert_obj(input_obj_path, output_dir, known_sha1=None, remove_text=False):
+    """
+    体素化一个OBJ文件（在工作进程中运行）
+
+    参数:
+    remove_text: 是否删除以前的（已过期的）文本区块，否则改名为 .stale
+
+    返回:
+    (状态 'skipped'/'converted'/'empty', 清单条目)
+    """
+    name = os.path.splitext(os.path.basename(input_obj_path))[0]
+    voxel_file = os.path.join(output_dir, name + VOXEL_SUFFIX)
+    sha1 = file_sha1(input_obj_path)
+    entry = {'sha1': sha1, 'outputs': [os.path.basename(voxel_file)]}
+    if sha1 == known_sha1 and os.path.exists(voxel_file):
+        return 'skipped', entry
+
+    result = voxelize_obj(input_obj_path)
+    if result is None:
+        return 'empty', entry
+    # 以前的文本区块是旧网格的采样结果，不再作为体素区块的来源
+    retire_text(os.path.join(output_dir, name + '.txt'), remove_text)
+    save_occupancy_tile(voxel_file, *result)
+    return 'converted', entry
+
+
+if __name__ == "__main__":
+    # 确保输出文件夹存在
+    os.makedirs(output_dir, exist_ok=True)
+
+    # 获取输入文件夹中的所有OBJ文件
+    obj_files = sorted(f for f in os.listdir(input_obj_dir) if f.endswith('.obj'))
+
+    if not obj_files:
+        print(f"在文件夹 {input_obj_dir} 中未找到OBJ文件")
+        exit(1)
+
+    print(f"找到 {len(obj_files)} 个OBJ文件，使用 {workers} 个进程开始体素化...")
+
+    manifest = load_manifest(manifest_path)
+    counts = {'converted': 0, 'skipped': 0, 'empty': 0, 'failed': 0}
+    start_time = time.time()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(convert_obj, os.path.join(input_obj_dir, obj_file), output_dir,
+                        manifest.get(obj_file, {}).get('sha1'), remove_text): obj_file
+            for obj_file in obj_files
+        }
+        for future in as_completed(futures):
+            obj_file = futures[future]
+            try:
+                status, entry = future.result()
+            except Exception as e:
+                counts['failed'] += 1
+                print(f"处理文件 {obj_file} 时出错: {e}")
+                continue
+            counts[status] += 1
+            if status == 'converted':
+                manifest[obj_file] = entry
+                save_manifest(manifest_path, manifest)
+                print(f"已保存: {entry['outputs'][0]}")
+            elif status == 'empty':
+                print(f"{obj_file} 中没有三角形，跳过")
+
+    print(f"体素化完成！转换 {counts['converted']} 个，跳过 {counts['skipped']} 个，"
+          f"空网格 {counts['empty']} 个，失败 {counts['failed']} 个，用时 {time.time() - start_time:.1f}s")
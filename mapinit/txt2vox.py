@@ -0,0 +1,33 @@
+import sys
+sys.path.append('.')
+import glob
+import os
+import time
+
+from moudles.tilestore import convert_tile, voxel_path
+
+# 文本区块所在文件夹（obj2txt.py 的输出），二进制区块写在同一目录下
+input_txt_dir = "F:/my pathfinding/Data_txt"
+
+# 为 True 时，除修改时间和大小外还用 sha1 判断二进制区块是否过期
+check_hash = False
+
+txt_files = sorted(glob.glob(os.path.join(input_txt_dir, "Tile_*_L19_*.txt")))
+
+if not txt_files:
+    print(f"在文件夹 {input_txt_dir} 中未找到区块文件")
+    exit(1)
+
+print(f"找到 {len(txt_files)} 个区块文件，开始转换为二进制体素区块...")
+
+converted = 0
+start_time = time.time()
+for txt_path in txt_files:
+    try:
+        if convert_tile(txt_path, check_hash):
+            converted += 1
+            print(f"已转换: {os.path.basename(voxel_path(txt_path))}")
+    except Exception as e:
+        print(f"转换 {os.path.basename(txt_path)} 时出错: {e}")
+
+print(f"转换完成: 新生成 {converted} 个，跳过 {len(txt_files) - converted} 个，用时 {time.time() - start_time:.1f}s")
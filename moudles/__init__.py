@@ -1,3 +1,3 @@
 import os
 
-__all__ = ["hello", "matrix","linear","spot"]
\ No newline at end of file
+__all__ = ["hello", "matrix","linear","spot","tilecache","tilestore","worldmap","render","meshvox","mapupdate"]
\ No newline at end of file
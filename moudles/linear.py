@@ -1,8 +1,98 @@
 import numpy as np
 from pyproj import Transformer
 
+# 测区范围（txt 坐标，米）：x_min, y_min, x_max, y_max，局部近似只在测区外扩 SURVEY_MARGIN 的范围内使用
+SURVEY_BOUNDS = (0, 0, 1800, 1300)
+SURVEY_MARGIN = 100
+# 局部近似的多项式次数和允许的最大误差（米），拟合后检查，超出时不使用近似
+APPROX_DEGREE = 2
+APPROX_TOLERANCE = 0.001
+
+
+def _poly_terms(u, v, degree):
+    """二元多项式的各项 u^i * v^j（i + j <= degree），按列排列"""
+    return np.stack([u ** i * v ** (k - i) for k in range(degree + 1) for i in range(k + 1)], axis=-1)
+
+
+class LocalApproximation:
+    """
+    测区内 txt 坐标与经纬度之间的多项式近似（两个方向分别拟合）。
+    测区只有约 1.8km x 1.3km，投影在这个范围内几乎是线性的，二次多项式的误差远小于 1 毫米，
+    转换只需要几次乘加。拟合后在比拟合点更密的检查网格上与 pyproj 比较，max_error 为最大误差（米）。
+    """
+
+    def __init__(self, exact_txt2gps, exact_gps2txt, bounds=SURVEY_BOUNDS, margin=SURVEY_MARGIN,
+                 degree=APPROX_DEGREE, samples=21):
+        """
+        参数:
+        exact_txt2gps, exact_gps2txt: 精确转换函数，f(a, b) -> (c, d)，接受数组
+        bounds: 测区范围 (x_min, y_min, x_max, y_max)
+        margin: 测区外扩的米数
+        degree: 多项式次数
+        samples: 每个方向的拟合点数
+        """
+        self.degree = degree
+        self.x_min, self.y_min = bounds[0] - margin, bounds[1] - margin
+        self.x_max, self.y_max = bounds[2] + margin, bounds[3] + margin
+
+        x, y = np.meshgrid(np.linspace(self.x_min, self.x_max, samples),
+                           np.linspace(self.y_min, self.y_max, samples))
+        x, y = x.ravel(), y.ravel()
+        lon, lat = exact_txt2gps(x, y)
+        lon, lat = np.asarray(lon), np.asarray(lat)
+
+        # 归一化到 [-1, 1] 附近，避免高次项数值过大
+        self._txt_center = np.array([(self.x_min + self.x_max) / 2, (self.y_min + self.y_max) / 2])
+        self._txt_scale = np.array([(self.x_max - self.x_min) / 2, (self.y_max - self.y_min) / 2])
+        self._gps_center = np.array([lon.mean(), lat.mean()])
+        self._gps_scale = np.array([np.ptp(lon) / 2, np.ptp(lat) / 2])
+        self.lon_min, self.lon_max = lon.min(), lon.max()
+        self.lat_min, self.lat_max = lat.min(), lat.max()
+
+        txt_terms = self._terms(x, y, self._txt_center, self._txt_scale)
+        gps_terms = self._terms(lon, lat, self._gps_center, self._gps_scale)
+        self._forward = np.linalg.lstsq(txt_terms, np.column_stack([lon, lat]), rcond=None)[0]
+        self._inverse = np.linalg.lstsq(gps_terms, np.column_stack([x, y]), rcond=None)[0]
+
+        # 在拟合点之间的检查网格上计算误差：正向误差换算回 txt 坐标（米）
+        x, y = np.meshgrid(np.linspace(self.x_min, self.x_max, 4 * samples - 3),
+                           np.linspace(self.y_min, self.y_max, 4 * samples - 3))
+        x, y = x.ravel(), y.ravel()
+        lon, lat = self.txt2gps(x, y)
+        fx, fy = exact_gps2txt(lon, lat)
+        lon, lat = exact_txt2gps(x, y)
+        ix, iy = self.gps2txt(np.asarray(lon), np.asarray(lat))
+        self.max_error = float(max(np.hypot(np.asarray(fx) - x, np.asarray(fy) - y).max(),
+                                   np.hypot(ix - x, iy - y).max()))
+
+    def _terms(self, a, b, center, scale):
+        return _poly_terms((a - center[0]) / scale[0], (b - center[1]) / scale[1], self.degree)
+
+    def contains_txt(self, x, y):
+        """txt 坐标是否在近似范围内（数组）"""
+        return (x >= self.x_min) & (x <= self.x_max) & (y >= self.y_min) & (y <= self.y_max)
+
+    def contains_gps(self, lon, lat):
+        """经纬度是否在近似范围内（数组）"""
+        return (lon >= self.lon_min) & (lon <= self.lon_max) & (lat >= self.lat_min) & (lat <= self.lat_max)
+
+    def txt2gps(self, x, y):
+        """txt 坐标 -> (lon, lat)"""
+        result = self._terms(x, y, self._txt_center, self._txt_scale) @ self._forward
+        return result[..., 0], result[..., 1]
+
+    def gps2txt(self, lon, lat):
+        """(lon, lat) -> 未取整的 txt 坐标"""
+        result = self._terms(lon, lat, self._gps_center, self._gps_scale) @ self._inverse
+        return result[..., 0], result[..., 1]
+
+
 class CoordinateTransformer:
-    def __init__(self):
+    def __init__(self, approximate=True):
+        """
+        参数:
+        approximate: 是否在测区内使用局部多项式近似（第一次转换时拟合，误差超过 APPROX_TOLERANCE 时不使用）
+        """
         # 定义坐标系转换器：EPSG:4548 -> EPSG:4326
         self.transformer_4548_to_4326 = Transformer.from_crs("EPSG:4548", "EPSG:4326", always_xy=True)
         # 定义坐标系转换器：EPSG:4326 -> EPSG:4548
@@ -11,6 +101,79 @@ class CoordinateTransformer:
         # 定义偏移量
         self.x_offset = -511150 + 786
         self.y_offset = -3522686 + 43
+
+        self.approximate = approximate
+        self._local = None
+
+    @property
+    def local(self):
+        """测区内的局部近似，第一次使用时拟合并缓存；不使用近似或误差过大时为 None"""
+        if self._local is None:
+            self._local = False
+            if self.approximate:
+                local = LocalApproximation(self._exact_txt2gps, self._exact_gps2txt)
+                if local.max_error <= APPROX_TOLERANCE:
+                    self._local = local
+                else:
+                    print(f"局部近似误差 {local.max_error:.4f}m 超过 {APPROX_TOLERANCE}m，使用 pyproj 转换")
+        return self._local or None
+
+    def _exact_txt2gps(self, x, y):
+        """pyproj 精确转换：txt 坐标 -> (lon, lat)"""
+        return self.transformer_4548_to_4326.transform(x - self.x_offset, y - self.y_offset)
+
+    def _exact_gps2txt(self, lon, lat):
+        """pyproj 精确转换：(lon, lat) -> 未取整的 txt 坐标"""
+        x_global, y_global = self.transformer_4326_to_4548.transform(lon, lat)
+        return np.asarray(x_global) + self.x_offset, np.asarray(y_global) + self.y_offset
+
+    def _convert(self, a, b, forward):
+        """
+        批量转换两个坐标分量：测区内的点用局部近似，其余的点用 pyproj
+        forward 为 True 时 txt -> gps，否则 gps -> txt（未取整）
+        """
+        a = np.asarray(a, dtype=float)
+        b = np.asarray(b, dtype=float)
+        exact = self._exact_txt2gps if forward else self._exact_gps2txt
+        local = self.local
+        if local is None:
+            c, d = exact(a, b)
+            return np.asarray(c, dtype=float), np.asarray(d, dtype=float)
+
+        inside = local.contains_txt(a, b) if forward else local.contains_gps(a, b)
+        c, d = local.txt2gps(a, b) if forward else local.gps2txt(a, b)
+        if not np.all(inside):
+            outside = ~inside
+            c[outside], d[outside] = exact(a[outside], b[outside])
+        return c, d
+
+    def txt2gps_batch(self, points):
+        """
+        批量将txt坐标转换为GPS坐标（一次向量化调用，适合整条路径）
+
+        参数:
+        points: 点列表 [[x1,y1,z1], ...]（列表或数组，可以为空）
+
+        返回:
+        (n, 3) 数组 [[lon1,lat1,alt1], ...]
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        lon, lat = self._convert(points[:, 0], points[:, 1], forward=True)
+        return np.column_stack([lon, lat, points[:, 2]])
+
+    def gps2txt_batch(self, points):
+        """
+        批量将GPS坐标转换为txt坐标
+
+        参数:
+        points: 点列表 [[lon1,lat1,alt1], ...]
+
+        返回:
+        (n, 3) 数组 [[x1,y1,z1], ...]，x、y 取整
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 3)
+        x, y = self._convert(points[:, 0], points[:, 1], forward=False)
+        return np.column_stack([np.round(x), np.round(y), points[:, 2]])
     
     def txt2gps(self, points):
         """
@@ -28,28 +191,14 @@ class CoordinateTransformer:
         # 检查输入维度
         if points.ndim == 1 and points.shape[0] == 3:
             # 单个点 [x, y, z]
-            x, y, z = points
-            is_single = True
+            lon, lat, alt = self.txt2gps_batch(points)[0]
+            return [float(lon), float(lat), points[2]]
         elif points.ndim == 2 and points.shape[1] == 3:
             # 点列表 [[x1,y1,z1], [x2,y2,z2], ...]
-            x, y, z = points[:, 0], points[:, 1], points[:, 2]
-            is_single = False
+            return self.txt2gps_batch(points).tolist()
         else:
             raise ValueError("输入必须是 [x,y,z] 或 [[x1,y1,z1], [x2,y2,z2], ...]")
         
-        # 应用偏移
-        x_shifted = x - self.x_offset
-        y_shifted = y - self.y_offset
-        
-        # 转换为WGS84
-        lon, lat = self.transformer_4548_to_4326.transform(x_shifted, y_shifted)
-        
-        # 保持输入格式返回
-        if is_single:
-            return [lon, lat, z]
-        else:
-            return np.column_stack([lon, lat, z]).tolist()
-        
     def gps2txt(self, lon, lat, alt):
         """
         将GPS坐标（EPSG:4326）转换为txt坐标
@@ -60,21 +209,13 @@ class CoordinateTransformer:
         返回:
         x, y, z: 转换后的txt坐标
         """
-        # 转换为EPSG:4548坐标
+        x, y = self._convert(lon, lat, forward=False)
         if np.isscalar(lon):
             # 处理单个值
-            x_global, y_global = self.transformer_4326_to_4548.transform(lon, lat)
-            # 应用反向偏移
-            x = int(round(x_global + self.x_offset))
-            y = int(round(y_global + self.y_offset))
-            return x, y, alt
+            return int(round(float(x))), int(round(float(y))), alt
         else:
             # 处理数组
-            x_global, y_global = self.transformer_4326_to_4548.transform(lon, lat)
-            # 应用反向偏移
-            x = np.round( x_global + self.x_offset ).astype(int)
-            y = np.round( y_global + self.y_offset ).astype(int)
-            return x, y, alt
+            return np.round(x).astype(int), np.round(y).astype(int), alt
 
 # 创建全局转换器实例
 transformer = CoordinateTransformer()
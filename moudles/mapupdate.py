@@ -0,0 +1,447 @@
+import glob
+import json
+import os
+
+import numpy as np
+
+from moudles.tilestore import (VOXEL_SUFFIX, is_fresh, load_manifest, load_text_voxels, load_voxel_tile,
+                               resolve_tile_files, save_manifest, save_occupancy_tile, text_path,
+                               voxel_path, voxelize_points)
+from moudles.worldmap import WORLD_PATH, meta_path
+from pathfinding25d.envelope import dilate_heights, ensure_envelope, envelope_path
+from pathfinding25d.pyramid import pyramid_path, refresh_height_pyramid
+from pathfinding3d.core.pyramid import clear_pyramid_cache
+
+# 区块边长（米），区块索引与 LowAltitude.load_map 相同：tile_x = x // 70 + 5，tile_y = y // 70 + 6
+TILE_SIZE = 70
+TILE_X0 = 5
+TILE_Y0 = 6
+# 高度图中没有点的格子的高度（与 mapinit/2_5map.py 的 z_min 相同）
+GRID_Z_MIN = -22
+# 区块版本和派生数据已更新到的版本，保存在区块文件夹中
+STATE_FILE = "map_versions.json"
+
+
+def tile_of(x, y):
+    """点所在的区块索引 (tile_x, tile_y)，x、y 可以是数组"""
+    return np.floor_divide(x, TILE_SIZE) + TILE_X0, np.floor_divide(y, TILE_SIZE) + TILE_Y0
+
+
+def tile_key(tx, ty):
+    """区块在文件名和版本表中的名字，如 (20, 7) -> '+020_+007'"""
+    return f"{int(tx):+04d}_{int(ty):+04d}"
+
+
+def parse_key(key):
+    """tile_key 的逆运算"""
+    tx, ty = key.split('_')
+    return int(tx), int(ty)
+
+
+def _clip_box(lower, upper, shape):
+    """把 [lower, upper]（含两端）裁到 [0, shape) 内，没有交集时返回 None"""
+    lo = np.maximum(lower, 0)
+    hi = np.minimum(upper, np.asarray(shape) - 1)
+    if np.any(lo > hi):
+        return None
+    return lo, hi
+
+
+def _up_to_date(derived, source):
+    """派生文件存在且不比源文件旧"""
+    return (os.path.exists(derived) and os.path.exists(source)
+            and os.path.getmtime(derived) >= os.path.getmtime(source))
+
+
+def column_tops(origin, occupancy):
+    """
+    占据栅格每一列最高的占据体素
+
+    返回:
+    (x, y, z) 三个一维数组，只包含有占据的列
+    """
+    xs, ys = np.nonzero(occupancy.any(axis=2))
+    top = occupancy.shape[2] - 1 - np.argmax(occupancy[xs, ys, ::-1], axis=1)
+    return xs + origin[0], ys + origin[1], top + origin[2]
+
+
+class MapUpdater:
+    """
+    增量更新区块地图：把新的障碍点合并进区块（或清除一个区域内的障碍），
+    只改动受影响的区块文件，并把这些区块的版本号加一。
+
+    派生数据（高度图 grid.npy、安全包络、它们的高度金字塔、全局体素地图，以及用 register 注册的其他数据）
+    记录自己已更新到的区块版本，refresh 时只对版本落后的区块（脏区块）重新计算，
+    在下次规划前调用即可，不必重新生成整张地图。
+    """
+
+    def __init__(self, base_path="F:/my pathfinding/Data_txt", grid_path='grid.npy', world_path=WORLD_PATH,
+                 envelope_radii=(), check_hash=False):
+        """
+        参数:
+        base_path: 区块所在文件夹
+        grid_path: 2.5D 高度图，存在时注册为派生数据 'grid'；它的高度金字塔文件存在且不比它旧时注册为 'grid_pyramid'
+                   （已经过期的金字塔留给 ensure_height_pyramid 整体重建）
+        world_path: 全局体素地图，存在时注册为派生数据 'world'
+        envelope_radii: 需要维护的安全包络半径，每个注册为 'envelope_r{半径}'（依赖 'grid'），
+                        包络的高度金字塔文件存在且不比包络旧时注册为 'envelope_r{半径}_pyramid'
+        check_hash: 判断二进制区块是否过期时是否比较 sha1
+        """
+        self.base_path = base_path
+        self.grid_path = grid_path
+        self.world_path = world_path
+        self.check_hash = check_hash
+        self.state_path = os.path.join(base_path, STATE_FILE)
+        state = load_manifest(self.state_path)
+        self.versions = state.get('versions', {})
+        self.built = state.get('artifacts', {})
+        self.artifacts = {}
+
+        if grid_path and os.path.exists(grid_path):
+            self.register('grid', self._refresh_grid)
+            if _up_to_date(pyramid_path(grid_path), grid_path):
+                self.register('grid_pyramid', lambda tiles: self._refresh_pyramid(tiles, grid_path),
+                              depends=('grid',))
+            for radius in envelope_radii:
+                name = f'envelope_r{radius}'
+                self.register(name, lambda tiles, r=radius: self._refresh_envelope(tiles, r), depends=('grid',))
+                source = envelope_path(grid_path, radius)
+                if _up_to_date(pyramid_path(source), source):
+                    self.register(f'{name}_pyramid',
+                                  lambda tiles, p=source, r=radius: self._refresh_pyramid(tiles, p, r),
+                                  depends=(name,))
+        if world_path and os.path.exists(world_path) and os.path.exists(meta_path(world_path)):
+            self.register('world', self._refresh_world)
+
+    # ---- 版本和脏区块 ----
+
+    def _save_state(self):
+        save_manifest(self.state_path, {'versions': self.versions, 'artifacts': self.built})
+
+    def register(self, name, refresh, depends=()):
+        """
+        注册派生数据
+
+        参数:
+        name: 名字
+        refresh: refresh(tiles)，tiles 为需要重新计算的区块索引列表 [(tx, ty), ...]
+        depends: 需要先更新的派生数据名
+        """
+        self.artifacts[name] = (refresh, tuple(depends))
+        self.built.setdefault(name, {})
+
+    def dirty(self, name):
+        """派生数据 name 中版本落后于区块的区块索引列表"""
+        built = self.built.get(name, {})
+        return sorted(parse_key(k) for k, v in self.versions.items() if built.get(k, 0) < v)
+
+    def refresh(self, name=None):
+        """
+        重新计算派生数据中的脏区块，name 为 None 时更新所有注册的数据（按注册顺序）
+
+        返回:
+        {名字: 重新计算的区块列表}
+        """
+        names = list(self.artifacts) if name is None else [name]
+        done = {}
+        for item in names:
+            self._refresh_one(item, done)
+        return done
+
+    def _refresh_one(self, name, done):
+        if name in done:
+            return
+        refresh, depends = self.artifacts[name]
+        for dep in depends:
+            self._refresh_one(dep, done)
+        tiles = self.dirty(name)
+        if tiles:
+            print(f"更新 {name}: {len(tiles)} 个区块")
+            refresh(tiles)
+            built = self.built[name]
+            for tx, ty in tiles:
+                key = tile_key(tx, ty)
+                built[key] = self.versions[key]
+            self._save_state()
+        done[name] = tiles
+
+    def _bump(self, tiles):
+        """区块版本加一；进程内按窗口缓存的高度金字塔一并清空"""
+        for tx, ty in tiles:
+            key = tile_key(tx, ty)
+            self.versions[key] = self.versions.get(key, 0) + 1
+        if tiles:
+            self._save_state()
+            clear_pyramid_cache()
+
+    # ---- 区块文件 ----
+
+    def tile_files(self, tx, ty):
+        """
+        区块的文件，与 Mat.load_and_process 读取的相同
+
+        返回:
+        [(二进制区块路径, 源文本文件或 None), ...]，文本区块还没有最新的二进制时，
+        二进制路径是将要生成的文件
+        """
+        x, y = tile_key(tx, ty).split('_')
+        texts = sorted(glob.glob(os.path.join(self.base_path, f"Tile_{x}_{y}_L19_*.txt")))
+        voxels = sorted(glob.glob(os.path.join(self.base_path, f"Tile_{x}_{y}_L19_*{VOXEL_SUFFIX}")))
+        files = []
+        for path in resolve_tile_files(texts, voxels, self.check_hash):
+            if path.endswith(VOXEL_SUFFIX):
+                source = text_path(path)
+                files.append((path, source if os.path.exists(source) else None))
+            else:
+                files.append((voxel_path(path), path))
+        return files
+
+    def _load_file(self, voxel_file, source):
+        """读取区块文件的占据栅格，二进制过期时从文本重新体素化；空文件返回 (None, None)"""
+        if source is None or is_fresh(voxel_file, source, self.check_hash):
+            return load_voxel_tile(voxel_file)
+        voxels = load_text_voxels(source)
+        if not len(voxels):
+            return None, None
+        return voxelize_points(voxels)
+
+    def tile_data(self, tx, ty):
+        """区块所有文件的占据栅格 [(origin, occupancy), ...]"""
+        data = []
+        for voxel_file, source in self.tile_files(tx, ty):
+            origin, occupancy = self._load_file(voxel_file, source)
+            if origin is not None:
+                data.append((origin, occupancy))
+        return data
+
+    def tile_bounds(self, tx, ty):
+        """
+        区块的范围：区块本身的水平范围与区块内所有体素的外接盒的并集
+
+        返回:
+        (lower, upper) 全局坐标，含两端
+        """
+        x0 = (tx - TILE_X0) * TILE_SIZE
+        y0 = (ty - TILE_Y0) * TILE_SIZE
+        lower = np.array([x0, y0, GRID_Z_MIN], dtype=np.int64)
+        upper = np.array([x0 + TILE_SIZE - 1, y0 + TILE_SIZE - 1, GRID_Z_MIN], dtype=np.int64)
+        for voxel_file, _ in self.tile_files(tx, ty):
+            if not os.path.exists(voxel_file):
+                continue
+            with np.load(voxel_file) as data:
+                origin = data['origin'].astype(np.int64)
+                lower = np.minimum(lower, origin)
+                upper = np.maximum(upper, origin + data['shape'].astype(np.int64) - 1)
+        return lower, upper
+
+    # ---- 更新 API ----
+
+    def out_of_bounds(self, lower, upper):
+        """
+        检查更新范围 [lower, upper]（含两端，txt 坐标）是否超出高度图或全局体素地图的范围，超出时打印警告：
+        区块文件照常更新，但超出的部分不会写进这些派生数据，需要重新生成（如更大的 x_max / y_max）
+
+        返回:
+        范围不够的派生数据名列表
+        """
+        lower = np.asarray(lower, dtype=np.int64)
+        upper = np.asarray(upper, dtype=np.int64)
+        exceeded = []
+        if 'grid' in self.artifacts:
+            rows, cols = np.load(self.grid_path, mmap_mode='r').shape
+            if lower[0] < 0 or lower[1] < 0 or upper[0] >= cols or upper[1] >= rows:
+                exceeded.append('grid')
+        if 'world' in self.artifacts:
+            with open(meta_path(self.world_path)) as f:
+                meta = json.load(f)
+            origin = np.array(meta['origin'], dtype=np.int64)
+            if np.any(lower < origin) or np.any(upper > origin + np.array(meta['shape']) - 1):
+                exceeded.append('world')
+        for name in exceeded:
+            print(f"警告: 更新范围 {lower.tolist()} - {upper.tolist()} 超出 {name} 的范围，超出的部分不会写入 {name}")
+        return exceeded
+
+    def add_obstacles(self, points):
+        """
+        把新的障碍点合并进区块：每个点取整后落到所在的区块，写进该区块的第一个文件
+        （区块还没有文件时新建 Tile_*_L19_update.vox.npz），区块的占据范围按需扩大
+
+        参数:
+        points: (n, 3) 障碍点，txt 坐标
+
+        返回:
+        版本号变化的区块索引列表
+        """
+        points = np.round(np.asarray(points, dtype=float).reshape(-1, 3)).astype(np.int64)
+        if not len(points):
+            return []
+        self.out_of_bounds(points.min(axis=0), points.max(axis=0))
+        txs, tys = tile_of(points[:, 0], points[:, 1])
+        changed = []
+        for tx, ty in sorted(set(zip(txs.tolist(), tys.tolist()))):
+            part = points[(txs == tx) & (tys == ty)]
+            files = self.tile_files(tx, ty)
+            if files:
+                voxel_file, source = files[0]
+                origin, occupancy = self._load_file(voxel_file, source)
+            else:
+                x, y = tile_key(tx, ty).split('_')
+                voxel_file, source = os.path.join(self.base_path, f"Tile_{x}_{y}_L19_update{VOXEL_SUFFIX}"), None
+                origin = occupancy = None
+
+            if origin is None:
+                origin, occupancy = voxelize_points(part)
+            else:
+                # 扩大占据范围，把原来的栅格放到新栅格中对应的位置
+                lower = np.minimum(origin, part.min(axis=0))
+                upper = np.maximum(origin + occupancy.shape - 1, part.max(axis=0))
+                if np.any(lower < origin) or np.any(upper >= origin + occupancy.shape):
+                    grown = np.zeros(upper - lower + 1, dtype=bool)
+                    start = origin - lower
+                    grown[start[0]:start[0] + occupancy.shape[0],
+                          start[1]:start[1] + occupancy.shape[1],
+                          start[2]:start[2] + occupancy.shape[2]] = occupancy
+                    origin, occupancy = lower, grown
+                shifted = part - origin
+                if occupancy[shifted[:, 0], shifted[:, 1], shifted[:, 2]].all():
+                    continue
+                occupancy[shifted[:, 0], shifted[:, 1], shifted[:, 2]] = True
+
+            # 记录源文本的修改时间，二进制区块仍被认为是最新的，Mat 会读取更新后的二进制
+            save_occupancy_tile(voxel_file, origin, occupancy, source)
+            changed.append((tx, ty))
+            print(f"已更新区块 {tile_key(tx, ty)}: 新增 {len(part)} 个障碍点")
+        self._bump(changed)
+        return changed
+
+    def clear_region(self, lower, upper):
+        """
+        清除 [lower, upper]（含两端，txt 坐标）内的所有障碍，区块的每个文件都会被清除
+
+        返回:
+        版本号变化的区块索引列表
+        """
+        lower = np.round(np.asarray(lower, dtype=float)).astype(np.int64)
+        upper = np.round(np.asarray(upper, dtype=float)).astype(np.int64)
+        self.out_of_bounds(lower, upper)
+        # 落在相邻区块范围外的点也属于该区块，多检查一圈区块
+        tx0, ty0 = tile_of(lower[0], lower[1])
+        tx1, ty1 = tile_of(upper[0], upper[1])
+        changed = []
+        for tx in range(int(tx0) - 1, int(tx1) + 2):
+            for ty in range(int(ty0) - 1, int(ty1) + 2):
+                cleared = 0
+                for voxel_file, source in self.tile_files(tx, ty):
+                    origin, occupancy = self._load_file(voxel_file, source)
+                    if origin is None:
+                        continue
+                    box = _clip_box(lower - origin, upper - origin, occupancy.shape)
+                    if box is None:
+                        continue
+                    lo, hi = box
+                    region = occupancy[lo[0]:hi[0] + 1, lo[1]:hi[1] + 1, lo[2]:hi[2] + 1]
+                    count = int(region.sum())
+                    if count:
+                        region[:] = False
+                        save_occupancy_tile(voxel_file, origin, occupancy, source)
+                        cleared += count
+                if cleared:
+                    changed.append((tx, ty))
+                    print(f"已更新区块 {tile_key(tx, ty)}: 清除 {cleared} 个体素")
+        self._bump(changed)
+        return changed
+
+    # ---- 内置派生数据 ----
+
+    def _neighbour_data(self, tx, ty):
+        """区块及其周围 8 个区块的占据栅格（相邻区块的点可能越过区块边界）"""
+        data = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                data.extend(self.tile_data(tx + dx, ty + dy))
+        return data
+
+    def _refresh_grid(self, tiles):
+        """在 grid.npy（按 [y, x] 取高度）中重新计算脏区块范围内每列的最高点"""
+        grid = np.load(self.grid_path, mmap_mode='r+')
+        for tx, ty in tiles:
+            lower, upper = self.tile_bounds(tx, ty)
+            box = _clip_box(lower[[1, 0]], upper[[1, 0]], grid.shape)
+            if box is None:
+                continue
+            (y0, x0), (y1, x1) = box
+            heights = np.full((y1 - y0 + 1, x1 - x0 + 1), GRID_Z_MIN, dtype=grid.dtype)
+            for origin, occupancy in self._neighbour_data(tx, ty):
+                xs, ys, zs = column_tops(origin, occupancy)
+                inside = (xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1)
+                np.maximum.at(heights, (ys[inside] - y0, xs[inside] - x0), zs[inside].astype(grid.dtype))
+            grid[y0:y1 + 1, x0:x1 + 1] = heights
+        grid.flush()
+        del grid
+
+    def _refresh_envelope(self, tiles, radius):
+        """
+        安全包络只在脏区块附近重新膨胀：高度图改动的范围向外 radius 格内的包络都会变，
+        这些格子又取决于周围 radius 格的高度，所以读取向外扩展 2 * radius 格的高度图
+        """
+        path = envelope_path(self.grid_path, radius)
+        if not os.path.exists(path):
+            ensure_envelope(self.grid_path, radius)
+            return
+        grid = np.load(self.grid_path, mmap_mode='r')
+        envelope = np.load(path, mmap_mode='r+')
+        for tx, ty in tiles:
+            lower, upper = self.tile_bounds(tx, ty)
+            box = _clip_box(lower[[1, 0]] - radius, upper[[1, 0]] + radius, grid.shape)
+            if box is None:
+                continue
+            (y0, x0), (y1, x1) = box
+            ys, xs = max(y0 - radius, 0), max(x0 - radius, 0)
+            ye, xe = min(y1 + radius, grid.shape[0] - 1), min(x1 + radius, grid.shape[1] - 1)
+            dilated = dilate_heights(np.asarray(grid[ys:ye + 1, xs:xe + 1]), radius)
+            envelope[y0:y1 + 1, x0:x1 + 1] = dilated[y0 - ys:y1 - ys + 1, x0 - xs:x1 - xs + 1]
+        envelope.flush()
+        del envelope
+
+    def _refresh_pyramid(self, tiles, source, radius=0):
+        """
+        在高度金字塔中只重新池化脏区块范围（包络再向外 radius 格，与 _refresh_envelope 改动的范围相同）
+        及其在各粗层上的父格，不再因为高度图变新而整体重建
+        """
+        height_map = np.load(source, mmap_mode='r')
+        boxes = []
+        for tx, ty in tiles:
+            lower, upper = self.tile_bounds(tx, ty)
+            box = _clip_box(lower[[1, 0]] - radius, upper[[1, 0]] + radius, height_map.shape)
+            if box is not None:
+                boxes.append(box)
+        refresh_height_pyramid(pyramid_path(source), height_map, boxes)
+        del height_map
+
+    def _refresh_world(self, tiles):
+        """在全局体素地图中重新写入脏区块范围内的占据（就地修改内存映射的文件）"""
+        with open(meta_path(self.world_path)) as f:
+            world_origin = np.array(json.load(f)['origin'], dtype=np.int64)
+        volume = np.load(self.world_path, mmap_mode='r+')
+        for tx, ty in tiles:
+            lower, upper = self.tile_bounds(tx, ty)
+            lower[2], upper[2] = world_origin[2], world_origin[2] + volume.shape[2] - 1
+            box = _clip_box(lower - world_origin, upper - world_origin, volume.shape)
+            if box is None:
+                continue
+            lo, hi = box
+            region = np.ones(hi - lo + 1, dtype=np.int8)
+            for origin, occupancy in self._neighbour_data(tx, ty):
+                # 区块栅格与 region 的交集
+                start = origin - world_origin - lo
+                src = _clip_box(-start, hi - lo - start, occupancy.shape)
+                if src is None:
+                    continue
+                a, b = src
+                dst = a + start
+                sub = occupancy[a[0]:b[0] + 1, a[1]:b[1] + 1, a[2]:b[2] + 1]
+                region[dst[0]:dst[0] + sub.shape[0], dst[1]:dst[1] + sub.shape[1],
+                       dst[2]:dst[2] + sub.shape[2]][sub] = 0
+            volume[lo[0]:hi[0] + 1, lo[1]:hi[1] + 1, lo[2]:hi[2] + 1] = region
+        volume.flush()
+        del volume
@@ -2,74 +2,114 @@ import numpy as np
 import glob
 import os
 
+from moudles.tilecache import tile_cache
+from moudles.tilestore import (VOXEL_SUFFIX, load_text_voxels, load_voxel_tile, pack_occupancy, resolve_tile_files,
+                               unpack_occupancy, voxelize_points)
+
 class Mat:
-    def __init__(self, coords,zz, base_path="F:/my pathfinding/Data_txt"):
+    def __init__(self, coords,zz, base_path="F:/my pathfinding/Data_txt", cache=tile_cache,
+                 check_hash=False):
         """
         初始化Mat类
         
         参数:
         coords: 坐标列表，格式如 [['+020', '+020'], ['+019', '+020'], ...]
         base_path: 数据文件的基础路径
+        cache: 区块缓存（TileCache），默认使用进程级共享缓存，None 表示每次都重新解析
+        check_hash: 判断二进制区块是否过期时，除修改时间和大小外还比较源文件的 sha1
         """
         self.coords = coords
         self.base_path = base_path
         self.zz = zz
+        self.cache = cache
+        self.check_hash = check_hash
         self.x_min = None
         self.y_min = None
         self.z_min = None
         self.matrix = None
-        self.points = None
+
+    def _read_tile(self, files):
+        """
+        解析一个区块的所有文件，返回位压缩的占据栅格 (origin, shape, bits)（见 tilestore.pack_occupancy），
+        全部失败或没有体素时返回 None。
+        .vox.npz 为 mapinit/txt2vox.py 生成的二进制体素区块，文本区块分块流式读取，
+        解析出的体素坐标体素化后立即释放
+        """
+        parts = []
+        for file_path in files:
+            try:
+                if file_path.endswith(VOXEL_SUFFIX):
+                    packed = pack_occupancy(*load_voxel_tile(file_path))
+                else:
+                    voxels = load_text_voxels(file_path)
+                    packed = pack_occupancy(*voxelize_points(voxels)) if len(voxels) else None
+                    del voxels
+                if packed is not None:
+                    parts.append(packed)
+                print(f"已加载: {os.path.basename(file_path)}")
+            except Exception as e:
+                print(f"错误加载文件 {file_path}: {e}")
+        if len(parts) <= 1:
+            return parts[0] if parts else None
+
+        # 同一区块有多个文件时合并到它们的外接盒中
+        lower = np.min([origin for origin, _, _ in parts], axis=0)
+        upper = np.max([origin + np.array(shape) - 1 for origin, shape, _ in parts], axis=0)
+        occupancy = np.zeros(upper - lower + 1, dtype=bool)
+        for packed in parts:
+            origin, part = unpack_occupancy(packed)
+            start = origin - lower
+            occupancy[start[0]:start[0] + part.shape[0], start[1]:start[1] + part.shape[1],
+                      start[2]:start[2] + part.shape[2]] |= part
+        return pack_occupancy(lower, occupancy)
         
     def load_and_process(self):
-        """加载数据并处理为矩阵"""
-        # 存储所有点的列表
-        all_points = []
+        """
+        加载数据并处理为矩阵。
+        各区块只保存位压缩的占据栅格（每个格子 1 bit，与缓存中的是同一个对象），
+        不保存体素坐标：先由每个区块的外接盒得到矩阵尺寸，再逐区块解压、写进矩阵后立即释放，
+        峰值内存约为矩阵本身加上一个区块解压后的占据栅格
+        """
+        # 存储所有区块的位压缩占据栅格
+        tiles = []
 
         for x, y in self.coords:
             # 构建文件模式，使用通配符匹配随机后缀
             pattern = f"Tile_{x}_{y}_L19_*.txt"
             search_path = os.path.join(self.base_path, pattern)
+            voxel_pattern = os.path.join(self.base_path, f"Tile_{x}_{y}_L19_*{VOXEL_SUFFIX}")
             
-            # 查找所有匹配的文件
-            matching_files = glob.glob(search_path)
+            # 查找所有匹配的文件，有最新的二进制区块时优先读取二进制
+            matching_files = resolve_tile_files(sorted(glob.glob(search_path)),
+                                                sorted(glob.glob(voxel_pattern)), self.check_hash)
             
             if not matching_files:
                 print(f"警告: 未找到匹配 {pattern} 的文件")
                 continue
             
-            # 加载所有匹配的文件
-            for file_path in matching_files:
-                try:
-                    points_data = np.loadtxt(file_path)
-                    all_points.append(points_data)
-                    print(f"已加载: {os.path.basename(file_path)}")
-                except Exception as e:
-                    print(f"错误加载文件 {file_path}: {e}")
-
-        # 将所有点数据合并为一个数组
-        if all_points:
-            self.points = np.vstack(all_points)
-            print(f"总共加载了 {len(all_points)} 个文件，共 {self.points.shape[0]} 个点")
+            # 相邻两段规划的区块大多相同，已解析过的区块直接从缓存读取
+            if self.cache is not None:
+                packed = self.cache.get_tile(search_path, matching_files, self._read_tile)
+            else:
+                packed = self._read_tile(matching_files)
+            if packed is not None:
+                tiles.append(packed)
+
+        if tiles:
+            print(f"总共加载了 {len(tiles)} 个区块")
+            if self.cache is not None:
+                print(f"区块缓存: {self.cache.stats()}")
         else:
-            self.points = np.array([])
             print("未找到任何有效文件")
             return False
 
-        # 步骤2: 每行x,y,z取整 
-        self.points = np.round(self.points).astype(int)
-
         # 步骤3: 转换为矩阵
+        # 第一遍：由各区块的外接盒得到整体范围
         ##we take z_min as ground, which means we usually don't go underneath
-        self.x_min = np.min(self.points[:, 0])
-        self.y_min = np.min(self.points[:, 1])
-        self.z_min = np.min(self.points[:, 2])
-        x_max = np.max(self.points[:, 0])
-        y_max = np.max(self.points[:, 1])
-        z_max = np.max(self.points[:, 2])
-        
-        self.points[:, 0] -= self.x_min  # Shift x coordinates
-        self.points[:, 1] -= self.y_min  # Shift y coordinates
-        self.points[:, 2] -= self.z_min  # Shift z coordinates
+        lower = np.min([origin for origin, _, _ in tiles], axis=0)
+        upper = np.max([origin + np.array(shape) - 1 for origin, shape, _ in tiles], axis=0)
+        self.x_min, self.y_min, self.z_min = (int(v) for v in lower)
+        x_max, y_max, z_max = (int(v) for v in upper)
 
         #shift level
         if z_max<self.zz:
@@ -90,8 +130,15 @@ class Mat:
         # 初始化一个全1的3D矩阵
         self.matrix = np.ones((dx, dy, dz), dtype=np.int8)
 
-        # 将取整后的点设置为0（障碍）
-        self.matrix[self.points[:, 0], self.points[:, 1], self.points[:, 2]] = 0
+        # 第二遍：逐区块解压，把占据的格子设置为0（障碍），写完即释放，缓存中的数组不会被改动
+        for packed in tiles:
+            origin, occupancy = unpack_occupancy(packed)
+            start = origin - lower
+            region = self.matrix[start[0]:start[0] + occupancy.shape[0],
+                                 start[1]:start[1] + occupancy.shape[1],
+                                 start[2]:start[2] + occupancy.shape[2]]
+            region[occupancy] = 0
+            del occupancy, region
 
 
         
@@ -105,6 +152,48 @@ class Mat:
         else:
             print("没有矩阵数据可保存")
     
+    def save_cache(self, filename):
+        """
+        把矩阵、偏移量和区块列表一起保存为 .npz 缓存，下次加载相同区块时可直接读取。
+        先写临时文件再替换，多个进程共用同一个缓存文件时不会读到写了一半的文件。
+        """
+        if self.matrix is None:
+            print("没有矩阵数据可保存")
+            return
+        tmp = f"{filename}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            np.savez(f, matrix=self.matrix,
+                     offset=np.array([self.x_min, self.y_min, self.z_min]),
+                     coords=np.array(self.coords, dtype=str).reshape(-1, 2),
+                     zz=self.zz)
+        os.replace(tmp, filename)
+        print(f"矩阵缓存已保存到 {filename}")
+
+    def load_cache(self, filename):
+        """
+        从 save_cache 的缓存读取矩阵，区块列表和高度 zz 都相同、
+        且区块文件都没有在缓存之后被修改（如 MapUpdater 增量更新）时才使用
+
+        返回:
+        bool: 是否命中缓存
+        """
+        if not os.path.exists(filename):
+            return False
+        cache_mtime = os.path.getmtime(filename)
+        for x, y in self.coords:
+            for path in glob.glob(os.path.join(self.base_path, f"Tile_{x}_{y}_L19_*")):
+                if os.path.getmtime(path) > cache_mtime:
+                    print(f"区块 {os.path.basename(path)} 已更新，矩阵缓存失效")
+                    return False
+        with np.load(filename) as data:
+            coords = [list(c) for c in data['coords']]
+            if coords != [list(c) for c in self.coords] or int(data['zz']) != self.zz:
+                return False
+            self.matrix = data['matrix']
+            self.x_min, self.y_min, self.z_min = (int(v) for v in data['offset'])
+        print(f"从缓存读取矩阵: {filename}")
+        return True
+
     def get_matrix_info(self):
         """获取矩阵信息"""
         if self.matrix is not None:
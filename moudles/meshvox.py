@@ -0,0 +1,129 @@
+import numpy as np
+
+# 每批做相交测试的（三角形, 体素）对数上限，控制临时数组的内存
+MAX_PAIRS = 1 << 20
+# 体素半边长：体素 (i, j, k) 覆盖 [i-0.5, i+0.5] x [j-0.5, j+0.5] x [k-0.5, k+0.5]，与点取整的约定相同
+HALF = 0.5
+# 判断相交时的容差，贴着体素边界的三角形也算相交（保守）
+EPS = 1e-9
+
+
+def load_obj(path):
+    """
+    读取OBJ网格，多边形面按扇形拆成三角形
+
+    返回:
+    (vertices (n, 3) float, faces (m, 3) int)
+    """
+    vertices = []
+    faces = []
+    with open(path) as f:
+        for line in f:
+            if line.startswith('v '):
+                vertices.append(line.split()[1:4])
+            elif line.startswith('f '):
+                # 面的格式可能是 v、v/vt、v//vn 或 v/vt/vn，索引从 1 开始，负数表示从末尾数
+                ids = [int(t.split('/')[0]) for t in line.split()[1:]]
+                ids = [i - 1 if i > 0 else len(vertices) + i for i in ids]
+                for k in range(1, len(ids) - 1):
+                    faces.append((ids[0], ids[k], ids[k + 1]))
+    return np.array(vertices, dtype=float).reshape(-1, 3), np.array(faces, dtype=np.int64).reshape(-1, 3)
+
+
+def _separated(axis, v0, v1, v2, half):
+    """在分离轴 axis 上三角形的投影是否与体素（以原点为中心）的投影不相交，逐对计算"""
+    p0 = np.einsum('ij,ij->i', axis, v0)
+    p1 = np.einsum('ij,ij->i', axis, v1)
+    p2 = np.einsum('ij,ij->i', axis, v2)
+    r = half * np.abs(axis).sum(axis=1) + EPS
+    return (np.minimum(np.minimum(p0, p1), p2) > r) | (np.maximum(np.maximum(p0, p1), p2) < -r)
+
+
+def triangle_box_overlap(triangles, centers, half=HALF):
+    """
+    三角形与体素是否相交（分离轴定理，Akenine-Möller），逐对向量化计算
+
+    参数:
+    triangles: (n, 3, 3) 三角形顶点
+    centers: (n, 3) 体素中心
+    half: 体素半边长
+
+    返回:
+    (n,) bool
+    """
+    v0 = triangles[:, 0] - centers
+    v1 = triangles[:, 1] - centers
+    v2 = triangles[:, 2] - centers
+    edges = (v1 - v0, v2 - v1, v0 - v2)
+
+    # 三个坐标轴：三角形包围盒与体素是否重叠
+    lo = np.minimum(np.minimum(v0, v1), v2)
+    hi = np.maximum(np.maximum(v0, v1), v2)
+    hit = np.all((lo <= half + EPS) & (hi >= -half - EPS), axis=1)
+
+    # 三角形法向：体素到三角形所在平面的距离
+    normal = np.cross(edges[0], edges[1])
+    distance = np.abs(np.einsum('ij,ij->i', normal, v0))
+    hit &= distance <= half * np.abs(normal).sum(axis=1) + EPS
+
+    # 9 条边与坐标轴的叉积
+    for edge in edges:
+        for k in range(3):
+            axis = np.zeros_like(edge)
+            # e_k x edge
+            axis[:, (k + 1) % 3] = -edge[:, (k + 2) % 3]
+            axis[:, (k + 2) % 3] = edge[:, (k + 1) % 3]
+            hit &= ~_separated(axis, v0, v1, v2, half)
+    return hit
+
+
+def voxelize_triangles(triangles, max_pairs=MAX_PAIRS):
+    """
+    把三角形直接体素化：每个三角形包围盒内的体素逐对做相交测试，分批向量化计算
+
+    参数:
+    triangles: (m, 3, 3) 三角形顶点
+    max_pairs: 每批的（三角形, 体素）对数
+
+    返回:
+    (origin, occupancy): 与 tilestore.voxelize_points 相同，origin 为 occupancy[0, 0, 0] 的坐标
+    """
+    triangles = np.asarray(triangles, dtype=float).reshape(-1, 3, 3)
+    lo = np.ceil(triangles.min(axis=1) - HALF).astype(np.int64)
+    hi = np.floor(triangles.max(axis=1) + HALF).astype(np.int64)
+    origin = lo.min(axis=0)
+    occupancy = np.zeros(hi.max(axis=0) - origin + 1, dtype=bool)
+
+    # 所有（三角形, 候选体素）对连续编号，按编号分批，一个很大的三角形也会被拆到多批里
+    sizes = hi - lo + 1
+    counts = sizes.prod(axis=1)
+    ends = np.cumsum(counts)
+    for first in range(0, int(ends[-1]), max_pairs):
+        pairs = np.arange(first, min(first + max_pairs, int(ends[-1])))
+        tri = np.searchsorted(ends, pairs, side='right')
+        k = pairs - (ends[tri] - counts[tri])
+        sy, sz = sizes[tri, 1], sizes[tri, 2]
+        cells = lo[tri] + np.column_stack([k // (sy * sz), (k // sz) % sy, k % sz])
+        hit = triangle_box_overlap(triangles[tri], cells.astype(float))
+        cells = cells[hit] - origin
+        occupancy[cells[:, 0], cells[:, 1], cells[:, 2]] = True
+    return origin, occupancy
+
+
+def voxelize_obj(path, shift=(786, 743, 0), max_pairs=MAX_PAIRS):
+    """
+    读取OBJ网格并体素化
+
+    参数:
+    path: OBJ文件
+    shift: 加到顶点坐标上的偏移（与 mapinit/obj2txt.py 的点偏移相同）
+    max_pairs: 见 voxelize_triangles
+
+    返回:
+    (origin, occupancy)，网格没有三角形时返回 None
+    """
+    vertices, faces = load_obj(path)
+    if len(faces) == 0:
+        return None
+    vertices = vertices + np.asarray(shift, dtype=float)
+    return voxelize_triangles(vertices[faces], max_pairs)
@@ -0,0 +1,137 @@
+import itertools
+import os
+import queue
+import threading
+
+import numpy as np
+
+from pathfinding3d.core.grid import Grid
+
+# 等待渲染的任务数上限，队列满时丢弃新任务而不是阻塞规划
+RENDER_QUEUE_SIZE = 16
+# 渲染结果的输出文件夹
+RENDER_DIR = "renders"
+
+
+def render_segment(matrix, path, start, end, filename):
+    """
+    一段 3D 路径的 plotly HTML（与 findpath3d 原来输出的 path_visualization.html 相同）
+
+    参数:
+    matrix: 该段使用的矩阵
+    path, start, end: 矩阵坐标下的路径、起点和终点
+    filename: 输出文件
+    """
+    grid = Grid(matrix=matrix)
+    grid.visualize(
+        path=path,
+        start=start,
+        end=end,
+        visualize_weight=False,
+        save_html=True,
+        save_to=filename,
+        always_show=False,
+    )
+
+
+def render_plan(path, start, end, height_map, filename):
+    """
+    整条航线与 2.5D 地形的 pyvista 离屏截图（与 LowAltitude.visualize 的画面相同，不需要显示器）
+
+    参数:
+    path: txt 坐标下的航线
+    start, end: 起点和终点
+    height_map: 高度图文件（grid.npy）
+    filename: 输出的 PNG 文件
+    """
+    import pyvista as pv
+
+    height_map = np.load(height_map)
+    X, Y = np.meshgrid(np.arange(height_map.shape[1]), np.arange(height_map.shape[0]))
+    plotter = pv.Plotter(off_screen=True)
+    plotter.add_mesh(pv.StructuredGrid(X, Y, height_map), cmap='terrain', show_scalar_bar=True)
+
+    # 与 LowAltitude.visualize 相同，x、y 互换后画在地形上
+    if path is not None and len(path) > 0:
+        points = np.array([(p[1], p[0], p[2]) for p in path], dtype=float)
+        plotter.add_mesh(pv.lines_from_points(points), color='red', line_width=6, label='Flight Path')
+        plotter.add_points(points, color='yellow', point_size=4, opacity=0.7)
+    plotter.add_points(np.array([[start[1], start[0], start[2]]], dtype=float), color='green', point_size=20, label='Start')
+    plotter.add_points(np.array([[end[1], end[0], end[2]]], dtype=float), color='blue', point_size=20, label='End')
+    plotter.add_legend()
+    plotter.add_title("3D Path Planning Visualization")
+    plotter.screenshot(filename)
+    plotter.close()
+
+
+class BackgroundRenderer:
+    """
+    后台渲染线程：规划只把结果放进队列，由线程写出可视化文件，不阻塞规划，也不需要显示器。
+    队列满时新任务被丢弃（dropped 计数），渲染失败只计数并打印，不影响规划。
+    """
+
+    def __init__(self, out_dir=RENDER_DIR, max_queue=RENDER_QUEUE_SIZE, height_map='grid.npy'):
+        """
+        参数:
+        out_dir: 输出文件夹
+        max_queue: 等待渲染的任务数上限
+        height_map: 整条航线截图使用的高度图
+        """
+        self.out_dir = out_dir
+        self.height_map = height_map
+        self.rendered = []  # 已写出的文件
+        self.dropped = 0
+        self.failed = 0
+        self._ids = itertools.count(1)
+        self._queue = queue.Queue(max_queue)
+        self._thread = threading.Thread(target=self._run, name="renderer", daemon=True)
+        self._thread.start()
+
+    def submit(self, func, filename, *args):
+        """
+        提交一个渲染任务 func(*args, filename)
+
+        返回:
+        输出文件路径，队列已满被丢弃时为 None
+        """
+        filename = os.path.join(self.out_dir, filename)
+        try:
+            self._queue.put_nowait((func, args, filename))
+        except queue.Full:
+            self.dropped += 1
+            return None
+        return filename
+
+    def submit_segment(self, matrix, path, start, end):
+        """提交一段路径的 HTML 渲染（参数见 render_segment）"""
+        return self.submit(render_segment, f"segment_{next(self._ids):04d}.html", matrix, path, start, end)
+
+    def submit_plan(self, path, start, end):
+        """提交整条航线的截图（参数见 render_plan）"""
+        return self.submit(render_plan, f"plan_{next(self._ids):04d}.png", path, start, end, self.height_map)
+
+    def _run(self):
+        """渲染线程：依次处理队列中的任务，收到 None 时退出"""
+        while True:
+            task = self._queue.get()
+            try:
+                if task is None:
+                    return
+                func, args, filename = task
+                os.makedirs(self.out_dir, exist_ok=True)
+                func(*args, filename)
+                self.rendered.append(filename)
+            except Exception as e:
+                self.failed += 1
+                print(f"渲染失败: {e}")
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """等待队列中的任务全部完成"""
+        self._queue.join()
+
+    def close(self):
+        """完成剩余任务后结束渲染线程"""
+        self._queue.put(None)
+        self._thread.join()
@@ -0,0 +1,81 @@
+import os
+import threading
+from collections import OrderedDict
+
+# 进程内最多缓存的区块数（load_map 每次用 4 块，相邻两段大多重叠）
+TILE_CACHE_SIZE = 16
+
+
+class TileCache:
+    """
+    进程级的区块缓存（LRU），保存每个区块解析、体素化后位压缩的占据栅格
+    （tilestore.pack_occupancy 的结果，每个格子 1 bit）。
+
+    键为区块的文件匹配模式，同时记录匹配到的文件及其修改时间，
+    文件被替换或更新后旧的缓存自动失效。缓存的数组是只读的，拼接时只读取不修改。
+    """
+
+    def __init__(self, max_tiles=TILE_CACHE_SIZE):
+        """
+        参数:
+        max_tiles: 最多缓存的区块数，超出时淘汰最久未使用的区块
+        """
+        self.max_tiles = max_tiles
+        self.hits = 0
+        self.misses = 0
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_tile(self, key, files, loader):
+        """
+        读取一个区块，命中缓存时直接返回
+
+        参数:
+        key: 区块的标识（如文件匹配模式）
+        files: 该区块匹配到的文件列表
+        loader: 未命中时调用 loader(files) 解析区块，返回 (origin, shape, bits) 或 None
+
+        返回:
+        区块的 (origin, shape, bits)，解析失败或没有体素时为 None
+        """
+        signature = tuple((f, os.path.getmtime(f)) for f in files)
+        with self._lock:
+            entry = self._tiles.get(key)
+            if entry is not None and entry[0] == signature:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        tile = loader(files)
+        if tile is None:
+            return None
+        tile[2].flags.writeable = False
+
+        with self._lock:
+            self._tiles[key] = (signature, tile)
+            self._tiles.move_to_end(key)
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+        return tile
+
+    def clear(self):
+        """清空缓存和计数"""
+        with self._lock:
+            self._tiles.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """命中/未命中次数和当前缓存的区块数"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'tiles': len(self._tiles),
+                'max_tiles': self.max_tiles,
+            }
+
+
+# 所有 Mat 默认共用的缓存
+tile_cache = TileCache()
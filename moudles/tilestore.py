@@ -0,0 +1,244 @@
+import hashlib
+import itertools
+import json
+import os
+
+import numpy as np
+
+# 二进制体素区块的后缀：Tile_+020_+020_L19_xxx.txt -> Tile_+020_+020_L19_xxx.vox.npz
+VOXEL_SUFFIX = ".vox.npz"
+# 过期的文本区块改名时加的后缀（不再匹配 Tile_*_L19_*.txt）
+STALE_SUFFIX = ".stale"
+# 流式读取文本区块时每次解析的行数
+CHUNK_ROWS = 200000
+
+
+def voxel_path(text_path):
+    """文本区块对应的二进制体素区块路径（同目录）"""
+    return os.path.splitext(text_path)[0] + VOXEL_SUFFIX
+
+
+def text_path(voxel_file):
+    """二进制体素区块对应的文本区块路径"""
+    return voxel_file[:-len(VOXEL_SUFFIX)] + ".txt"
+
+
+def file_sha1(path):
+    """文件内容的 sha1"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_text_points(path, chunk_rows=CHUNK_ROWS):
+    """
+    分块读取文本区块，每次返回最多 chunk_rows 个点 (n, 3)，整个文件不需要一次读进内存。
+    每行取前三列作为 x y z，多出的列（强度、标签等）忽略；不足三列时抛出 ValueError
+    """
+    with open(path) as f:
+        while True:
+            lines = list(itertools.islice(f, chunk_rows))
+            if not lines:
+                return
+            chunk = np.loadtxt(lines, ndmin=2)
+            if chunk.shape[1] < 3:
+                raise ValueError(f"{path}: 每行至少需要 x y z 三列，实际只有 {chunk.shape[1]} 列")
+            yield chunk[:, :3]
+
+
+def load_text_voxels(path, chunk_rows=CHUNK_ROWS):
+    """
+    流式读取文本区块，逐块取整并在块内去重，最后整体去重一次（每个点只参与两次排序）
+
+    返回:
+    占据的体素坐标 (m, 3) int32，峰值内存约为各块去重后的体素数之和
+    """
+    parts = [np.empty((0, 3), dtype=np.int32)]
+    for chunk in iter_text_points(path, chunk_rows):
+        parts.append(np.unique(np.round(chunk).astype(np.int32), axis=0))
+    if len(parts) == 2:
+        return parts[1]
+    return np.unique(np.concatenate(parts), axis=0)
+
+
+def voxelize_points(points):
+    """
+    把点云取整后转成占据栅格
+
+    返回:
+    (origin, occupancy): origin 为 (x, y, z) 最小值，occupancy[x, y, z] 为 True 表示有点
+    """
+    points = np.round(np.asarray(points).reshape(-1, 3)).astype(np.int64)
+    origin = points.min(axis=0)
+    shape = points.max(axis=0) - origin + 1
+    occupancy = np.zeros(shape, dtype=bool)
+    shifted = points - origin
+    occupancy[shifted[:, 0], shifted[:, 1], shifted[:, 2]] = True
+    return origin, occupancy
+
+
+def pack_occupancy(origin, occupancy):
+    """
+    把占据栅格裁到有占据的体素的外接盒并位压缩（每个格子 1 bit）
+
+    返回:
+    (origin, shape, bits)，没有占据的体素时返回 None
+    """
+    filled = [np.flatnonzero(occupancy.any(axis=tuple(a for a in range(3) if a != axis))) for axis in range(3)]
+    if not len(filled[0]):
+        return None
+    lower = np.array([f[0] for f in filled], dtype=np.int64)
+    upper = np.array([f[-1] for f in filled], dtype=np.int64)
+    occupancy = occupancy[lower[0]:upper[0] + 1, lower[1]:upper[1] + 1, lower[2]:upper[2] + 1]
+    return np.asarray(origin, dtype=np.int64) + lower, occupancy.shape, np.packbits(occupancy.ravel())
+
+
+def unpack_occupancy(packed):
+    """
+    pack_occupancy 的逆运算
+
+    返回:
+    (origin, occupancy)
+    """
+    origin, shape, bits = packed
+    occupancy = np.unpackbits(bits, count=int(np.prod(shape))).astype(bool).reshape(shape)
+    return origin, occupancy
+
+
+def save_voxel_tile(path, points, source=None):
+    """
+    保存二进制体素区块：位压缩的占据栅格 + 原点，以及源文本文件的修改时间、大小和 sha1
+
+    参数:
+    path: 输出路径（.vox.npz）
+    points: 区块的点 (n, 3)
+    source: 源文本文件路径，用于判断二进制区块是否过期
+    """
+    origin, occupancy = voxelize_points(points)
+    save_occupancy_tile(path, origin, occupancy, source)
+
+
+def save_occupancy_tile(path, origin, occupancy, source=None):
+    """
+    直接保存占据栅格为二进制体素区块（如网格直接体素化的结果），格式与 save_voxel_tile 相同
+
+    参数:
+    path: 输出路径（.vox.npz）
+    origin: occupancy[0, 0, 0] 对应的 (x, y, z)
+    occupancy: bool 占据栅格
+    source: 源文本文件路径，用于判断二进制区块是否过期
+    """
+    meta = {'source_mtime': 0.0, 'source_size': -1, 'source_sha1': ''}
+    if source is not None:
+        stat = os.stat(source)
+        meta = {'source_mtime': stat.st_mtime, 'source_size': stat.st_size, 'source_sha1': file_sha1(source)}
+
+    # 先写临时文件再替换，读的一方不会看到写了一半的区块
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        np.savez(f, origin=np.asarray(origin, dtype=np.int64), shape=np.array(occupancy.shape),
+                 bits=np.packbits(occupancy.ravel()), **meta)
+    os.replace(tmp, path)
+
+
+def load_voxel_tile(path):
+    """
+    读取二进制体素区块
+
+    返回:
+    (origin, occupancy)
+    """
+    with np.load(path) as data:
+        shape = tuple(int(v) for v in data['shape'])
+        count = int(np.prod(shape))
+        occupancy = np.unpackbits(data['bits'], count=count).astype(bool).reshape(shape)
+        return data['origin'].astype(np.int64), occupancy
+
+
+def load_tile_points(path):
+    """读取二进制体素区块，返回与 load_text_voxels 相同的体素坐标 (m, 3) int32"""
+    origin, occupancy = load_voxel_tile(path)
+    return (np.argwhere(occupancy) + origin).astype(np.int32)
+
+
+def is_fresh(voxel_file, source, check_hash=False):
+    """
+    二进制区块是否仍与源文本文件一致：比较修改时间和大小，check_hash 时再比较 sha1
+    """
+    if not os.path.exists(voxel_file):
+        return False
+    stat = os.stat(source)
+    with np.load(voxel_file) as data:
+        if float(data['source_mtime']) == stat.st_mtime and int(data['source_size']) == stat.st_size:
+            return not check_hash or str(data['source_sha1']) == file_sha1(source)
+        # 修改时间变了（如复制文件）但内容相同时仍然可用
+        return int(data['source_size']) == stat.st_size and str(data['source_sha1']) == file_sha1(source)
+
+
+def resolve_tile_files(text_files, voxel_files, check_hash=False):
+    """
+    为一个区块选择要读取的文件：有最新的二进制区块时用二进制，否则用文本；
+    没有对应文本文件的二进制区块（只发布了二进制）直接使用
+
+    返回:
+    文件路径列表，按文件名排序
+    """
+    chosen = []
+    for source in text_files:
+        binary = voxel_path(source)
+        chosen.append(binary if is_fresh(binary, source, check_hash) else source)
+    texts = set(text_files)
+    chosen.extend(v for v in voxel_files if text_path(v) not in texts)
+    return sorted(chosen)
+
+
+def convert_tile(source, check_hash=False):
+    """
+    把一个文本区块转换成二进制体素区块，已是最新时跳过
+
+    返回:
+    bool: 是否重新生成
+    """
+    binary = voxel_path(source)
+    if is_fresh(binary, source, check_hash):
+        return False
+    save_voxel_tile(binary, load_text_voxels(source), source)
+    return True
+
+
+def retire_text(path, remove=False):
+    """
+    二进制区块重新生成、而文本区块没有一起重写时，文本区块已经过期：
+    改名为 .stale（remove 时删除），文本工具和 Mat 都不会再读到旧的几何，二进制区块也不再以它判断是否过期
+
+    返回:
+    改名后的路径，文本区块不存在或被删除时返回 None
+    """
+    if not os.path.exists(path):
+        return None
+    if remove:
+        os.remove(path)
+        return None
+    stale = path + STALE_SUFFIX
+    os.replace(path, stale)
+    print(f"警告: {os.path.basename(path)} 没有随二进制区块更新，已改名为 {os.path.basename(stale)}")
+    return stale
+
+
+def load_manifest(path):
+    """读取转换清单（json），不存在或损坏时返回空清单"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(path, manifest):
+    """保存转换清单，先写临时文件再替换，中途中断时已完成的条目不会丢失"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
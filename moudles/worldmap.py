@@ -0,0 +1,141 @@
+import glob
+import json
+import os
+
+import numpy as np
+
+from moudles.tilestore import VOXEL_SUFFIX, convert_tile, load_voxel_tile
+from pathfinding3d.core.grid import Grid
+
+# 全局体素地图的默认文件，元数据（原点、尺寸、区块列表）保存在同名 .json 中
+WORLD_PATH = "world.npy"
+# 截取窗口时在起终点外接矩形外水平扩展的米数（约半个区块）
+WINDOW_MARGIN = 35
+
+
+def meta_path(path):
+    """全局体素地图的元数据文件路径"""
+    return os.path.splitext(path)[0] + ".json"
+
+
+def build_world(base_path, path=WORLD_PATH, top=0, check_hash=False):
+    """
+    一次性把所有区块拼成一个全局坐标系下的占据体，内存映射保存为 .npy。
+    与 Mat.matrix 相同，1 表示可通行，0 表示障碍。
+
+    参数:
+    base_path: 区块所在文件夹，文本区块会先转换成二进制体素区块（见 tilestore）
+    path: 输出文件
+    top: 占据体至少延伸到的高度（与 Mat 的 zz 相同，留出起飞/巡航空间）
+    check_hash: 判断二进制区块是否过期时是否比较 sha1
+
+    返回:
+    GlobalVoxelMap
+    """
+    for source in sorted(glob.glob(os.path.join(base_path, "Tile_*_L19_*.txt"))):
+        if convert_tile(source, check_hash):
+            print(f"已转换: {os.path.basename(source)}")
+    voxel_files = sorted(glob.glob(os.path.join(base_path, f"Tile_*_L19_*{VOXEL_SUFFIX}")))
+    if not voxel_files:
+        raise FileNotFoundError(f"在文件夹 {base_path} 中未找到区块文件")
+
+    # 第一遍只读取每个区块的原点和尺寸，确定全局范围
+    bounds = []
+    for voxel_file in voxel_files:
+        with np.load(voxel_file) as data:
+            origin = data['origin'].astype(np.int64)
+            bounds.append((origin, origin + data['shape'].astype(np.int64) - 1))
+    lower = np.min([lo for lo, _ in bounds], axis=0)
+    upper = np.max([hi for _, hi in bounds], axis=0)
+    upper[2] = max(upper[2], top)
+    shape = tuple(int(v) for v in upper - lower + 1)
+    print(f"全局原点: {lower.tolist()}，尺寸: {shape}")
+
+    # 第二遍逐个区块写入障碍，整个体积不需要一次放进内存
+    tmp = f"{path}.{os.getpid()}.tmp.npy"
+    volume = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.int8, shape=shape)
+    volume[:] = 1
+    for voxel_file in voxel_files:
+        origin, occupancy = load_voxel_tile(voxel_file)
+        start = origin - lower
+        region = volume[start[0]:start[0] + occupancy.shape[0],
+                        start[1]:start[1] + occupancy.shape[1],
+                        start[2]:start[2] + occupancy.shape[2]]
+        region[occupancy] = 0
+        print(f"已写入: {os.path.basename(voxel_file)}")
+    volume.flush()
+    del volume
+    os.replace(tmp, path)
+
+    with open(meta_path(path), 'w') as f:
+        json.dump({'origin': lower.tolist(), 'shape': list(shape),
+                   'tiles': [os.path.basename(v) for v in voxel_files]}, f, indent=2)
+    return GlobalVoxelMap(path)
+
+
+def open_world(world=WORLD_PATH):
+    """
+    打开全局体素地图：world 可以是 GlobalVoxelMap 或文件路径，文件不存在时返回 None
+    """
+    if isinstance(world, GlobalVoxelMap):
+        return world
+    if world and os.path.exists(world) and os.path.exists(meta_path(world)):
+        return GlobalVoxelMap(world)
+    return None
+
+
+class GlobalVoxelMap:
+    """
+    内存映射的全局占据体，按全局坐标截取窗口。
+    窗口是文件上的视图，只有实际访问的部分才会被读进内存。
+    """
+
+    def __init__(self, path=WORLD_PATH):
+        """
+        参数:
+        path: build_world 生成的 .npy 文件
+        """
+        with open(meta_path(path)) as f:
+            meta = json.load(f)
+        self.path = path
+        self.origin = np.array(meta['origin'], dtype=np.int64)
+        self.volume = np.load(path, mmap_mode='r')
+        self.shape = self.volume.shape
+
+    def __reduce__(self):
+        """传给子进程时只传文件路径，由子进程重新内存映射，不复制整个占据体"""
+        return (GlobalVoxelMap, (self.path,))
+
+    def window(self, lower, upper):
+        """
+        截取全局坐标 [lower, upper]（含两端）内的轴对齐窗口，超出地图的部分被裁掉
+
+        返回:
+        (view, offset): 占据体的视图和视图原点的全局坐标，
+                        全局坐标 = 视图下标 + offset
+        """
+        lo = np.clip(np.asarray(lower, dtype=np.int64) - self.origin, 0, np.array(self.shape) - 1)
+        hi = np.clip(np.asarray(upper, dtype=np.int64) - self.origin, 0, np.array(self.shape) - 1)
+        view = self.volume[lo[0]:hi[0] + 1, lo[1]:hi[1] + 1, lo[2]:hi[2] + 1]
+        return view, tuple(int(v) for v in lo + self.origin)
+
+    def window_around(self, sp, ep, margin=WINDOW_MARGIN):
+        """
+        起点和终点外接矩形向外扩展 margin 米的窗口，高度方向取整个地图
+
+        返回:
+        与 window 相同
+        """
+        lower = [min(sp[0], ep[0]) - margin, min(sp[1], ep[1]) - margin, self.origin[2]]
+        upper = [max(sp[0], ep[0]) + margin, max(sp[1], ep[1]) + margin, self.origin[2] + self.shape[2] - 1]
+        return self.window(lower, upper)
+
+    def grid(self, lower, upper, **kwargs):
+        """
+        截取窗口并构建 pathfinding3d 的 Grid，kwargs 传给 Grid
+
+        返回:
+        (grid, offset)
+        """
+        view, offset = self.window(lower, upper)
+        return Grid(matrix=view, **kwargs), offset
@@ -3,5 +3,9 @@ import os
 # Re-export commonly used classes from submodules so users can import
 # directly from the package: `from pathfinding25d import AStar3D`
 from .finder import AStar3D
+from .cruise import CruisePlanner
+from .pyramid import CoarseToFinePlanner
+from .stats import SearchStats
 
-__all__ = ["finder", "AStar3D"]
\ No newline at end of file
+__all__ = ["finder", "cruise", "pyramid", "visibility", "envelope", "stats",
+           "AStar3D", "CruisePlanner", "CoarseToFinePlanner", "SearchStats"]
\ No newline at end of file
@@ -0,0 +1,233 @@
+import heapq
+import math
+
+import numpy as np
+
+from .stats import PROGRESS_INTERVAL, SearchStats, check_progress_interval
+
+# 8个水平方向及其长度
+PLANE_DIRECTIONS = [(dx, dy, math.sqrt(dx * dx + dy * dy))
+                    for dx in (-1, 0, 1)
+                    for dy in (-1, 0, 1)
+                    if not (dx == 0 and dy == 0)]
+
+
+def min_safe_altitude(height_map, clearance):
+    """
+    最低安全高度图：地面高度 + 离地余量，向上取整到整数栅格
+
+    参数:
+    height_map: 高度图，按 height_map[y, x] 取地面高度
+    clearance: 离地余量（与 AStar3D 的 min_altitude 含义相同）
+
+    返回:
+    与 height_map 同形状的整数数组
+    """
+    return np.ceil(np.asarray(height_map) + clearance).astype(np.int64)
+
+
+class CruisePlanner:
+    """
+    "爬升 - 巡航 - 下降" 式的分层规划器。
+
+    每个 (x, y) 列的飞行高度取 max(最低安全高度, 巡航高度)，只在二维平面上做 A*，
+    边代价 = 水平距离 + 爬升惩罚 * 上升高度 + 下降惩罚 * 下降高度。
+    搜索完成后再把二维路径抬升成三维航点：起点先垂直爬升到巡航层，
+    遇到更高的楼先爬升再前进、越过后先前进再下降，终点垂直下降。
+    长距离航线上代价只相当于一次二维搜索，结果接近 AStar3D 的最优解。
+    """
+
+    def __init__(self, height_map, clearance=10, max_altitude=200,
+                 climb_penalty=2.0, descent_penalty=0.5, cruise_altitude=None, cell_size=1,
+                 progress_callback=None, progress_interval=PROGRESS_INTERVAL):
+        """
+        参数:
+        height_map: 高度图，按 height_map[y, x] 取地面高度（如 grid.npy）
+        clearance: 离地余量
+        max_altitude: 最大飞行高度，安全高度超过它的列不可通行
+        climb_penalty: 每上升 1 米的额外代价
+        descent_penalty: 每下降 1 米的额外代价
+        cruise_altitude: 巡航高度，None 表示取起点和终点中较高的高度
+        cell_size: 一个格子的水平边长（米），在粗分辨率的高度图上规划时使用
+        progress_callback: 可选的进度回调 callback(stats)，与 AStar3D 相同
+        progress_interval: 回调间隔（扩展的节点数），0 或 None 表示不回调
+        """
+        self.rows, self.cols = np.asarray(height_map).shape
+        self.clearance = clearance
+        self.max_altitude = max_altitude
+        self.climb_penalty = climb_penalty
+        self.descent_penalty = descent_penalty
+        self.cruise_altitude = cruise_altitude
+        self.cell_size = cell_size
+        self.safe_altitude = min_safe_altitude(height_map, clearance)
+        # 按 x 优先展平（下标 x * rows + y）
+        self._safe_flat = self.safe_altitude.T.ravel().tolist()
+        self.progress_callback = progress_callback
+        self.progress_interval = check_progress_interval(progress_interval)
+        # 最近一次搜索的统计信息，仅供查看；并发搜索时请给每次搜索传入自己的 SearchStats
+        self.last_stats = None
+
+    @property
+    def nodes_explored(self):
+        """最近一次搜索压入开放队列的节点数"""
+        return self.last_stats.pushes if self.last_stats is not None else 0
+
+    def layer_altitude(self, start, end):
+        """本次规划使用的巡航高度"""
+        if self.cruise_altitude is not None:
+            return int(self.cruise_altitude)
+        return int(max(start[2], end[2]))
+
+    def find_path_2d(self, start, end, cruise, stats=None):
+        """
+        平面 A*。
+
+        参数:
+        stats: 可选的 SearchStats，搜索过程中写入统计信息；为 None 时新建一个（见 last_stats）
+
+        返回:
+        [(x, y, 飞行高度), ...]，找不到时返回 []
+        """
+        rows, cols = self.rows, self.cols
+        safe = self._safe_flat
+        max_alt = self.max_altitude
+        climb, descent = self.climb_penalty, self.descent_penalty
+
+        sx, sy = int(start[0]), int(start[1])
+        gx, gy = int(end[0]), int(end[1])
+        start_c = sx * rows + sy
+        goal_c = gx * rows + gy
+
+        def altitude(c):
+            a = safe[c]
+            return a if a > cruise else cruise
+
+        if stats is None:
+            stats = SearchStats()
+        self.last_stats = stats
+        if altitude(start_c) > max_alt or altitude(goal_c) > max_alt:
+            stats.finish(False)
+            return []
+
+        cell = self.cell_size
+        moves = [(dx, dy, dx * rows + dy, length * cell) for dx, dy, length in PLANE_DIRECTIONS]
+        open_set = [(0.0, start_c)]
+        g_score = {start_c: 0.0}
+        parent = {start_c: -1}
+        closed = set()
+        interval = self.progress_interval
+        report = self.progress_callback if interval else None
+        # 计数放在局部变量里，回调和结束时再写回 stats
+        expansions = pushes = 0
+        f_current = 0.0
+
+        while open_set:
+            f_current, current = heapq.heappop(open_set)
+            expansions += 1
+            if report is not None and expansions % interval == 0:
+                stats.expansions, stats.pushes = expansions, pushes
+                stats.open_size, stats.best_f = len(open_set), f_current
+                report(stats)
+            if current == goal_c:
+                break
+            if current in closed:
+                continue
+            closed.add(current)
+
+            x, y = divmod(current, rows)
+            a_current = altitude(current)
+            g_current = g_score[current]
+
+            for dx, dy, dc, length in moves:
+                nx = x + dx
+                ny = y + dy
+                if nx < 0 or nx >= cols or ny < 0 or ny >= rows:
+                    continue
+                neighbor = current + dc
+                if neighbor in closed:
+                    continue
+                a_next = altitude(neighbor)
+                if a_next > max_alt:
+                    continue
+
+                if a_next > a_current:
+                    cost = length + climb * (a_next - a_current)
+                else:
+                    cost = length + descent * (a_current - a_next)
+                tentative_g = g_current + cost
+
+                old_g = g_score.get(neighbor)
+                if old_g is None or tentative_g < old_g:
+                    g_score[neighbor] = tentative_g
+                    parent[neighbor] = current
+                    # 八方向距离，爬升/下降惩罚非负，启发函数可采纳
+                    hx = abs(nx - gx)
+                    hy = abs(ny - gy)
+                    h = (max(hx, hy) + 0.414 * min(hx, hy)) * cell
+                    heapq.heappush(open_set, (tentative_g + h, neighbor))
+                    pushes += 1
+        else:
+            stats.expansions, stats.pushes = expansions, pushes
+            stats.open_size, stats.best_f = 0, f_current
+            stats.finish(False)
+            return []  # 无路径
+
+        stats.expansions, stats.pushes = expansions, pushes
+        stats.open_size, stats.best_f = len(open_set), f_current
+        stats.finish(True)
+
+        cells = []
+        current = goal_c
+        while current != -1:
+            x, y = divmod(current, rows)
+            cells.append((x, y, altitude(current)))
+            current = parent[current]
+        cells.reverse()
+        return cells
+
+    def lift(self, cells, start, end):
+        """
+        把二维路径抬升成逐格的三维航点列表 [(x, y, z), ...]
+        """
+        sx, sy, sz = int(start[0]), int(start[1]), int(start[2])
+        path = [(sx, sy, sz)]
+
+        def vertical(x, y, z_from, z_to):
+            step = 1 if z_to > z_from else -1
+            for z in range(z_from + step, z_to + step, step):
+                path.append((x, y, z))
+
+        # 起点爬升（或下降）到巡航层
+        x, y, z = cells[0]
+        vertical(x, y, sz, z)
+
+        for nx, ny, nz in cells[1:]:
+            if nz > z:
+                # 先爬升再前进
+                vertical(x, y, z, nz)
+                path.append((nx, ny, nz))
+            elif nz < z:
+                # 先前进再下降
+                path.append((nx, ny, z))
+                vertical(nx, ny, z, nz)
+            else:
+                path.append((nx, ny, nz))
+            x, y, z = nx, ny, nz
+
+        # 终点下降
+        vertical(x, y, z, int(end[2]))
+        return path
+
+    def find_path(self, start, end, stats=None):
+        """
+        参数:
+        start, end: (x, y, z)
+        stats: 可选的 SearchStats，与 find_path_2d 相同
+
+        返回:
+        与 AStar3D.find_path 相同格式的路径 [(x, y, z), ...]，找不到时返回 []
+        """
+        cells = self.find_path_2d(start, end, self.layer_altitude(start, end), stats)
+        if not cells:
+            return []
+        return self.lift(cells, start, end)
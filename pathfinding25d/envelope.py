@@ -0,0 +1,95 @@
+import os
+
+import numpy as np
+
+# 安全包络文件名后缀：grid.npy -> grid_envelope_r3.npy
+ENVELOPE_SUFFIX = "_envelope_r"
+
+# 进程内缓存：(文件绝对路径, 半径) -> (grid.npy 的修改时间, 包络高度图)
+_envelope_cache = {}
+
+
+def sliding_max(values, radius, axis):
+    """
+    沿一个轴的滑动窗口最大值，窗口为 [i - radius, i + radius]，地图外不参与比较。
+
+    用倍增法实现：先求长度 1、2、4... 的窗口最大值，再用两个有重叠的窗口拼出长度 2r+1，
+    只需要 O(log r) 次整个数组的 np.maximum。
+    """
+    if radius <= 0:
+        return values
+    values = np.moveaxis(values, axis, 0)
+    n = values.shape[0]
+    length = 2 * radius + 1
+
+    # 两端用最低高度填充
+    pad = [(radius, radius)] + [(0, 0)] * (values.ndim - 1)
+    current = np.pad(values, pad, constant_values=values.min())
+    span = 1
+    while span * 2 <= length:
+        current = np.maximum(current[:-span], current[span:])
+        span *= 2
+    # current[i] 是 [i, i + span) 的最大值，两个窗口覆盖 [i, i + length)
+    result = np.maximum(current[:n], current[length - span:length - span + n])
+    return np.moveaxis(result, 0, axis)
+
+
+def dilate_heights(height_map, radius):
+    """
+    水平膨胀高度图：每列取周围 (2r+1) x (2r+1) 方形窗口内的最高地面高度。
+    用膨胀后的高度图规划时，航点离任何更高的地面在水平方向上至少相隔 radius 格，
+    校验仍然只需读取一列的高度。
+
+    参数:
+    height_map: 高度图，按 height_map[y, x] 取地面高度
+    radius: 无人机半径（格），0 时返回原高度图
+
+    返回:
+    与 height_map 同形状的数组
+    """
+    height_map = np.asarray(height_map)
+    return sliding_max(sliding_max(height_map, radius, 0), radius, 1)
+
+
+def envelope_path(grid_path, radius):
+    """与高度图放在同一目录下的安全包络文件路径"""
+    root, ext = os.path.splitext(grid_path)
+    return f"{root}{ENVELOPE_SUFFIX}{radius}{ext or '.npy'}"
+
+
+def ensure_envelope(grid_path, radius):
+    """
+    离线生成 grid.npy 的安全包络文件；不存在或比 grid.npy 旧时重新生成
+
+    返回:
+    包络文件路径（radius 为 0 时就是 grid_path 本身）
+    """
+    if radius <= 0:
+        return grid_path
+    path = envelope_path(grid_path, radius)
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(grid_path):
+        print(f"生成安全包络: {path}")
+        # 先写临时文件再替换，以内存映射读取的一方不会看到写了一半的文件
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            np.save(f, dilate_heights(np.load(grid_path), radius))
+        os.replace(tmp, path)
+    return path
+
+
+def load_envelope(grid_path, radius):
+    """
+    读取给定无人机半径的安全包络高度图，同一进程内按半径缓存
+
+    返回:
+    膨胀后的高度图（radius 为 0 时为原高度图）
+    """
+    key = (os.path.abspath(grid_path), radius)
+    mtime = os.path.getmtime(grid_path)
+    cached = _envelope_cache.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    height_map = np.load(ensure_envelope(grid_path, radius))
+    _envelope_cache[key] = (mtime, height_map)
+    return height_map
@@ -1,32 +1,159 @@
 import math
 import heapq
+import os
+
+import numpy as np
+
+from .envelope import dilate_heights, load_envelope
+from .stats import PROGRESS_INTERVAL, SearchStats, check_progress_interval
+from .visibility import LOOKAHEAD, segments_visible, smooth_path
+
+# 26个移动方向，顺序与 get_neighbors 的循环顺序一致（保证相同代价时选出的路径也相同）
+DIRECTIONS = [(dx, dy, dz)
+              for dx in (-1, 0, 1)
+              for dy in (-1, 0, 1)
+              for dz in (-1, 0, 1)
+              if not (dx == 0 and dy == 0 and dz == 0)]
+
+# 按移动的轴数索引的代价：直线、平面对角线、空间对角线
+STEP_COSTS = (0.0, 1.0, 1.414, 1.732)
+
+# 水平方向（含原地），用于每列的邻居掩码，第 k 位表示第 k 个水平方向的邻居列可用
+COLUMN_DIRECTIONS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+COLUMN_BITS = {d: 1 << k for k, d in enumerate(COLUMN_DIRECTIONS)}
+
+ENGINES = ("tuple", "packed")
+
 
 class AStar3D:
-    nodes_explored = 0
-    def __init__(self, height_map, min_altitude=5, max_altitude=100):
+    def __init__(self, height_map, min_altitude=5, max_altitude=100, engine="tuple", ceiling=None,
+                 drone_radius=0, progress_callback=None, progress_interval=PROGRESS_INTERVAL):
+        """
+        参数:
+        height_map: 高度图，按 height_map[y, x] 取地面高度；也可以是高度图文件（如 'grid.npy'），
+                    此时高度图和安全包络都通过 envelope.load_envelope 读取，同一进程内的规划器共用缓存
+        min_altitude: 离地最小高度
+        max_altitude: 最大飞行高度
+        engine: find_path 使用的搜索实现
+            "tuple": 以 (x, y, z) 元组为键的原始实现
+            "packed": 状态压缩为单个整数，g/parent 使用整数键的字典，
+                      邻居代价按方向预先计算，返回的路径与 "tuple" 相同
+        ceiling: 可选，与 height_map 同形状的每列最高可飞高度（再受 max_altitude 限制），
+                 用于把搜索限制在某个走廊内
+        drone_radius: 无人机半径（格），大于 0 时用水平膨胀后的高度图（安全包络）计算最低高度，
+                      避免路径贴着楼角斜穿；height_map 为文件时包络按半径缓存，
+                      为数组时每个实例重新膨胀一次（已经传入包络高度图时保持 0）
+        progress_callback: 可选的进度回调 callback(stats)，每扩展 progress_interval 个节点调用一次，
+                           stats 为本次搜索的 SearchStats（如 stats.print_progress）
+        progress_interval: 回调间隔（扩展的节点数），0 或 None 表示不回调
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"未知的搜索引擎: {engine}，可选: {ENGINES}")
+        if isinstance(height_map, (str, os.PathLike)):
+            self._envelope = load_envelope(height_map, drone_radius)
+            height_map = load_envelope(height_map, 0)
+        else:
+            self._envelope = None
         self.height_map = height_map
         self.min_altitude = min_altitude
         self.max_altitude = max_altitude
+        self.engine = engine
+        self.ceiling = ceiling
+        self.drone_radius = drone_radius
+        self.progress_callback = progress_callback
+        self.progress_interval = check_progress_interval(progress_interval)
+        # 最近一次搜索的统计信息，仅供查看；并发搜索时请给每次搜索传入自己的 SearchStats
+        self.last_stats = None
         self.rows, self.cols = height_map.shape
-        
+        self._prepare_columns()
+
+    def _prepare_columns(self):
+        """
+        预先计算每个 (x, y) 列的可飞高度区间 [z_lo, z_hi] 以及邻居掩码，全部用 NumPy 批量完成。
+
+        z_lo, z_hi: 每列允许的最低/最高高度，z_lo > z_hi 的列不可飞
+        column_mask: 每列 9 位的掩码，标记哪些水平相邻列（含自身）在地图内且可飞
+        clear_z, clear_top: 高度在 [clear_z, clear_top] 内时 26 个邻居全部有效，
+                 即 3x3 邻域内最高的 z_lo 再加 1（下降一格也要合法）到最低的 z_hi 再减 1；
+                 贴着地图边界的列永远不满足
+        搜索时只需查这些预先计算的表，不再逐个邻居读取高度图做比较。
+        """
+        rows, cols = self.rows, self.cols
+        envelope = self._envelope
+        if envelope is None:
+            envelope = dilate_heights(self.height_map, self.drone_radius)
+        self.z_lo = envelope + self.min_altitude
+        if self.ceiling is None:
+            self.z_hi = np.full((rows, cols), self.max_altitude, dtype=self.z_lo.dtype)
+        else:
+            self.z_hi = np.minimum(self.ceiling, self.max_altitude)
+
+        # 地图外的列用 max_altitude + 1 填充，表示不可飞
+        blocked = self.max_altitude + 1
+        lo_pad = np.pad(self.z_lo, 1, constant_values=blocked)
+        hi_pad = np.pad(self.z_hi, 1, constant_values=self.max_altitude)
+        open_pad = lo_pad <= hi_pad
+
+        column_mask = np.zeros((rows, cols), dtype=np.int64)
+        highest = self.z_lo.copy()
+        lowest = self.z_hi.copy()
+        for (dx, dy), bit in COLUMN_BITS.items():
+            window = (slice(1 + dy, rows + 1 + dy), slice(1 + dx, cols + 1 + dx))
+            column_mask |= np.where(open_pad[window], bit, 0)
+            highest = np.maximum(highest, lo_pad[window])
+            lowest = np.minimum(lowest, hi_pad[window])
+        self.column_mask = column_mask
+        self.clear_z = highest + 1
+        self.clear_top = lowest - 1
+
+        # 按 x 优先展平（下标 x * rows + y），供 Python 层的搜索循环直接索引
+        self._z_lo_flat = self.z_lo.T.ravel().tolist()
+        self._z_hi_flat = self.z_hi.T.ravel().tolist()
+        self._mask_flat = self.column_mask.T.ravel().tolist()
+        self._clear_flat = self.clear_z.T.ravel().tolist()
+        self._top_flat = self.clear_top.T.ravel().tolist()
+
+        # 每个方向：(dx, dy, dz, 水平掩码位, 展平下标偏移)
+        self._moves = [(dx, dy, dz, COLUMN_BITS[(dx, dy)], dx * rows + dy) for dx, dy, dz in DIRECTIONS]
+
+    @property
+    def nodes_explored(self):
+        """最近一次搜索压入开放队列的节点数"""
+        return self.last_stats.pushes if self.last_stats is not None else 0
 
+    def _begin_search(self, stats):
+        """每次搜索使用自己的统计对象，不与其他搜索共享计数"""
+        if stats is None:
+            stats = SearchStats()
+        self.last_stats = stats
+        return stats
+
+    def _report(self, stats, open_size, best_f):
+        """更新统计信息并调用进度回调"""
+        stats.open_size = open_size
+        stats.best_f = best_f
+        self.progress_callback(stats)
 
     def is_valid_position(self, x, y, z):
         if not (0 <= x < self.cols and 0 <= y < self.rows):
             return False
-        ground_height = self.height_map[y, x]
-        return ground_height + self.min_altitude <= z <= self.max_altitude
+        return self.z_lo[y, x] <= z <= self.z_hi[y, x]
 
     def get_neighbors(self, x, y, z):
+        col = x * self.rows + y
+        if self._clear_flat[col] <= z <= self._top_flat[col]:
+            # 开阔空域：26 个邻居全部有效
+            return [(x + dx, y + dy, z + dz) for dx, dy, dz in DIRECTIONS]
+
+        z_lo = self._z_lo_flat
+        z_hi = self._z_hi_flat
+        mask = self._mask_flat[col]
         neighbors = []
-        for dx in (-1, 0, 1):
-            for dy in (-1, 0, 1):
-                for dz in (-1, 0, 1):
-                    if dx == 0 and dy == 0 and dz == 0:
-                        continue
-                    nx, ny, nz = x + dx, y + dy, z + dz
-                    if self.is_valid_position(nx, ny, nz):
-                        neighbors.append((nx, ny, nz))
+        for dx, dy, dz, bit, dcol in self._moves:
+            if mask & bit:
+                nz = z + dz
+                if z_lo[col + dcol] <= nz <= z_hi[col + dcol]:
+                    neighbors.append((x + dx, y + dy, nz))
         return neighbors
 
     def calculate_cost(self, current, neighbor):
@@ -58,8 +185,21 @@ class AStar3D:
         # 对角线距离近似 - 精度好且计算快
         return a + 0.414 * b + 0.318 * c
 
-    def find_path(self, start, end):
-        
+    def find_path(self, start, end, stats=None):
+        """
+        参数:
+        start, end: (x, y, z)
+        stats: 可选的 SearchStats，搜索过程中写入统计信息；为 None 时新建一个（见 last_stats）
+
+        返回:
+        路径 [(x, y, z), ...]，找不到时返回 []
+        """
+        stats = self._begin_search(stats)
+        if self.engine == "packed":
+            return self._find_path_packed(start, end, stats)
+
+        interval = self.progress_interval
+        report = self.progress_callback if interval else None
         start_node = (start[0], start[1], start[2])
         goal_node = (end[0], end[1], end[2])
 
@@ -71,8 +211,13 @@ class AStar3D:
         
         while open_set:
             current_f, current = heapq.heappop(open_set)
+            stats.expansions += 1
+            if report is not None and stats.expansions % interval == 0:
+                self._report(stats, len(open_set), current_f)
 
             if current == goal_node:
+                stats.open_size, stats.best_f = len(open_set), current_f
+                stats.finish(True)
                 return self.reconstruct_path(parent, current)
 
             for neighbor in self.get_neighbors(*current):
@@ -83,22 +228,207 @@ class AStar3D:
                     g_score[neighbor] = tentative_g
                     f_score = tentative_g + self.heuristic(neighbor, goal_node)
                     heapq.heappush(open_set, (f_score, neighbor))
-                    self.nodes_explored += 1
-                    if self.nodes_explored % 10000 == 0:
-                        print(f"已探索节点: {self.nodes_explored}, 开放队列大小: {len(open_set)}")
-        
+                    stats.pushes += 1
 
-        
+        stats.finish(False)
         return []  # 无路径
 
-    def find_path_bidirectional(self, start, end):
+    def _find_path_packed(self, start, end, stats):
+        """
+        整数编码状态的 A*，结果与原始的元组实现一致。
+        状态 s = (x * rows + y) * nz + (z - z0)，其大小顺序与 (x, y, z) 元组的字典序相同，
+        因此堆中 f 相同时的出队顺序也与元组实现相同。
+        """
+        rows = self.rows
+        max_alt = self.max_altitude
+        floor = self._z_lo_flat
+        ceil = self._z_hi_flat
+        masks = self._mask_flat
+        clear = self._clear_flat
+        top = self._top_flat
+
+        sx, sy, sz = int(start[0]), int(start[1]), int(start[2])
+        gx, gy, gz = int(end[0]), int(end[1]), int(end[2])
+
+        # z 的编码范围（地面可能低于 0）
+        z0 = min(0, min(floor), sz, gz)
+        nz = max(max_alt, sz, gz) - z0 + 1
+        plane = rows * nz
+
+        # 按方向预先计算编码偏移和代价
+        moves = []
+        for dx, dy, dz, bit, dcol in self._moves:
+            cost = STEP_COSTS[abs(dx) + abs(dy) + abs(dz)]
+            moves.append((dx, dy, dz, dx * plane + dy * nz + dz, dcol, bit, cost))
+
+        start_s = sx * plane + sy * nz + (sz - z0)
+        goal_s = gx * plane + gy * nz + (gz - z0)
+
+        open_set = [(0, start_s)]
+        g_score = {start_s: 0}
+        parent = {start_s: -1}
+        closed = set()
+
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+        interval = self.progress_interval
+        report = self.progress_callback if interval else None
+        # 计数放在局部变量里，回调和结束时再写回 stats
+        expansions = pushes = 0
+        f_current = 0
+
+        while open_set:
+            f_current, current = heappop(open_set)
+            expansions += 1
+            if report is not None and expansions % interval == 0:
+                stats.expansions, stats.pushes = expansions, pushes
+                self._report(stats, len(open_set), f_current)
+            if current == goal_s:
+                break
+            if current in closed:
+                # 过期的堆元素
+                continue
+            closed.add(current)
+
+            x, rem = divmod(current, plane)
+            y, z = divmod(rem, nz)
+            z += z0
+            col = x * rows + y
+            g_current = g_score[current]
+
+            # 开阔空域中 26 个邻居全部有效，否则按列掩码和可飞区间筛选
+            open_air = clear[col] <= z <= top[col]
+            mask = masks[col]
+
+            for dx, dy, dz, ds, dcol, bit, cost in moves:
+                nzv = z + dz
+                if not open_air:
+                    if not mask & bit:
+                        continue
+                    if nzv < floor[col + dcol] or nzv > ceil[col + dcol]:
+                        continue
+                nx = x + dx
+                ny = y + dy
+
+                neighbor = current + ds
+                tentative_g = g_current + cost
+                old_g = g_score.get(neighbor)
+                if old_g is None or tentative_g < old_g:
+                    parent[neighbor] = current
+                    g_score[neighbor] = tentative_g
+                    closed.discard(neighbor)
+
+                    # 与 heuristic 相同的对角线距离
+                    hx = nx - gx if nx > gx else gx - nx
+                    hy = ny - gy if ny > gy else gy - ny
+                    hz = nzv - gz if nzv > gz else gz - nzv
+                    a = max(hx, hy, hz)
+                    c = min(hx, hy, hz)
+                    b = hx + hy + hz - a - c
+                    heappush(open_set, (tentative_g + (a + 0.414 * b + 0.318 * c), neighbor))
+                    pushes += 1
+
+        stats.expansions, stats.pushes = expansions, pushes
+        stats.open_size, stats.best_f = len(open_set), f_current
+        if current != goal_s:
+            stats.finish(False)
+            return []  # 无路径
+        stats.finish(True)
+
+        path = []
+        current = goal_s
+        while current != -1:
+            x, rem = divmod(current, plane)
+            y, z = divmod(rem, nz)
+            path.append((x, y, z + z0))
+            current = parent[current]
+        path.reverse()
+        return path
+
+    def find_path_any_angle(self, start, end, stats=None):
+        """
+        Theta* 式的任意角度搜索（Lazy Theta*）。
+        扩展节点时先假设邻居能直接看到当前节点的父节点，把父节点记为邻居的父节点；
+        邻居出队时才检查这条线段（segments_visible），看不到时改为从已关闭的相邻格走一步。
+        每次扩展最多一次通视检查，代价用欧氏距离。
+
+        参数:
+        stats: 可选的 SearchStats，与 find_path 相同
+
+        返回:
+        少量航点组成的路径 [(x, y, z), ...]，相邻航点之间直线飞行；找不到时返回 []
+        """
+        start_node = (int(start[0]), int(start[1]), int(start[2]))
+        goal_node = (int(end[0]), int(end[1]), int(end[2]))
+
+        open_set = [(0, start_node)]
+        g_score = {start_node: 0}
+        parent = {start_node: None}
+        closed = set()
+        stats = self._begin_search(stats)
+        interval = self.progress_interval
+        report = self.progress_callback if interval else None
+
+        while open_set:
+            current_f, current = heapq.heappop(open_set)
+            if current in closed:
+                continue
+            stats.expansions += 1
+            if report is not None and stats.expansions % interval == 0:
+                self._report(stats, len(open_set), current_f)
+
+            source = parent[current]
+            if source is not None and max(abs(source[0] - current[0]), abs(source[1] - current[1]),
+                                          abs(source[2] - current[2])) > 1:
+                if not segments_visible(self.z_lo, self.z_hi, [source], [current])[0]:
+                    # 看不到父节点：从已关闭的相邻格中选代价最小的一个
+                    best = None
+                    for neighbor in self.get_neighbors(*current):
+                        if neighbor in closed:
+                            g = g_score[neighbor] + math.dist(neighbor, current)
+                            if best is None or g < best[0]:
+                                best = (g, neighbor)
+                    g_score[current], parent[current] = best
+
+            if current == goal_node:
+                stats.open_size, stats.best_f = len(open_set), current_f
+                stats.finish(True)
+                return self.reconstruct_path(parent, current)
+            closed.add(current)
+
+            source = parent[current] if parent[current] is not None else current
+            for neighbor in self.get_neighbors(*current):
+                if neighbor in closed:
+                    continue
+                tentative_g = g_score[source] + math.dist(source, neighbor)
+
+                if neighbor not in g_score or tentative_g < g_score[neighbor]:
+                    parent[neighbor] = source
+                    g_score[neighbor] = tentative_g
+                    f_score = tentative_g + self.heuristic(neighbor, goal_node)
+                    heapq.heappush(open_set, (f_score, neighbor))
+                    stats.pushes += 1
+
+        stats.finish(False)
+        return []  # 无路径
+
+    def smooth_path(self, path, lookahead=LOOKAHEAD):
+        """把 find_path 的逐格路径拉直成少量航点（见 visibility.smooth_path）"""
+        return smooth_path(self, path, lookahead)
+
+    def find_path_bidirectional(self, start, end, stats=None):
         """双向 A* 搜索。保持其他方法不变。
         返回与 find_path 相同格式的路径：[(x,y,z), ...] 或 []。
+        stats: 可选的 SearchStats，两个方向的计数合在一起
         """
         start_node = (start[0], start[1], start[2])
         goal_node = (end[0], end[1], end[2])
+        stats = self._begin_search(stats)
+        interval = self.progress_interval
+        report = self.progress_callback if interval else None
 
         if start_node == goal_node:
+            stats.finish(True)
             return [start_node]
 
         # 双向开放集（heap），g 值，父指针，已关闭集合
@@ -122,6 +452,8 @@ class AStar3D:
             # reconstruct_path(parent_b, meet) 返回的是从 goal 到 meet 的路径，需反转为 meet -> goal
             path_meet_to_goal = list(reversed(path_b_goal_to_meet))
             # 合并（去重 meet）
+            stats.open_size = len(open_f) + len(open_b)
+            stats.finish(True)
             return path_f + path_meet_to_goal[1:]
 
         # 主循环：每次扩展两个方向中 f 值较小的一侧
@@ -132,12 +464,16 @@ class AStar3D:
 
             # 选择要扩展的方向
             expand_forward = f_f <= f_b
+            stats.best_f = min(f_f, f_b)
 
             if expand_forward:
                 _, current = heapq.heappop(open_f)
                 if current in closed_f:
                     continue
                 closed_f.add(current)
+                stats.expansions += 1
+                if report is not None and stats.expansions % interval == 0:
+                    self._report(stats, len(open_f) + len(open_b), f_f)
 
                 # 如果碰到了反向已访问的节点，构建路径
                 if current in closed_b:
@@ -150,15 +486,16 @@ class AStar3D:
                         g_f[neighbor] = tentative_g
                         f_score = tentative_g + self.heuristic(neighbor, goal_node)
                         heapq.heappush(open_f, (f_score, neighbor))
-                        self.nodes_explored += 1
-                        if self.nodes_explored % 10000 == 0:
-                            print(f"已探索节点: {self.nodes_explored}, 开放队列大小: {len(open_f)}")
+                        stats.pushes += 1
 
             else:
                 _, current = heapq.heappop(open_b)
                 if current in closed_b:
                     continue
                 closed_b.add(current)
+                stats.expansions += 1
+                if report is not None and stats.expansions % interval == 0:
+                    self._report(stats, len(open_f) + len(open_b), f_b)
 
                 if current in closed_f:
                     return _reconstruct(current)
@@ -170,11 +507,10 @@ class AStar3D:
                         g_b[neighbor] = tentative_g
                         f_score = tentative_g + self.heuristic(neighbor, start_node)
                         heapq.heappush(open_b, (f_score, neighbor))
-                        self.nodes_explored += 1
-                        if self.nodes_explored % 10000 == 0:
-                            print(f"已探索节点: {self.nodes_explored}, 开放队列大小: {len(open_b)}")
+                        stats.pushes += 1
 
         # 无路径
+        stats.finish(False)
         return []
 
     def reconstruct_path(self, parent, current):
@@ -0,0 +1,236 @@
+import os
+
+import numpy as np
+
+from .cruise import CruisePlanner
+from .finder import AStar3D
+
+# 金字塔文件名后缀：grid.npy -> grid_pyramid.npy
+PYRAMID_SUFFIX = "_pyramid"
+# 最粗一层的最小边长
+MIN_LEVEL_SIZE = 16
+# 金字塔文件头的标记和每项的字节数（文件头固定为 int64）
+PYRAMID_MAGIC = 0x31525950  # b"PYR1"
+HEADER_ITEM = 8
+
+
+def max_pool_heights(height_map):
+    """2x2 最大池化：粗格的高度取 4 个子格中最高的地面高度（保守）"""
+    rows, cols = height_map.shape
+    if rows % 2 or cols % 2:
+        # 地图外的格子用最低高度填充，不会抬高粗格
+        height_map = np.pad(height_map, ((0, rows % 2), (0, cols % 2)),
+                            constant_values=height_map.min())
+    r, c = height_map.shape
+    return height_map.reshape(r // 2, 2, c // 2, 2).max(axis=(1, 3))
+
+
+def build_height_pyramid(height_map, min_size=MIN_LEVEL_SIZE):
+    """
+    构建最大高度金字塔
+
+    返回:
+    [第0层(原图), 第1层, ...]，第 k 层每格对应原图 2^k x 2^k 的区域
+    """
+    levels = [np.asarray(height_map)]
+    while min(levels[-1].shape) // 2 >= min_size:
+        levels.append(max_pool_heights(levels[-1]))
+    return levels
+
+
+def pyramid_path(grid_path):
+    """与高度图放在同一目录下的金字塔文件路径"""
+    root, ext = os.path.splitext(grid_path)
+    return root + PYRAMID_SUFFIX + (ext or ".npy")
+
+
+def save_height_pyramid(path, levels):
+    """
+    把所有层写进一个 .npy 文件，便于整体内存映射。
+    布局（一维数组）: [文件头, 第0层数据, 第1层数据, ...]，
+    文件头是 int64 的 [PYRAMID_MAGIC, 层数, rows_0, cols_0, rows_1, cols_1, ...]，按高度数据的类型原样存放
+    （不随高度数据转换类型，uint8 高度图的尺寸超过 255 也不会溢出）
+    """
+    dtype = np.result_type(*levels)
+    if HEADER_ITEM % dtype.itemsize:
+        raise ValueError(f"不支持的高度数据类型: {dtype}")
+    header = [PYRAMID_MAGIC, len(levels)]
+    for level in levels:
+        header.extend(level.shape)
+    parts = [np.asarray(header, dtype=np.int64).view(dtype)]
+    parts += [level.astype(dtype, copy=False).ravel() for level in levels]
+    # 先写临时文件再替换，以内存映射读取的一方不会看到写了一半的文件
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        np.save(f, np.concatenate(parts))
+    os.replace(tmp, path)
+
+
+def load_height_pyramid(path, mmap_mode="r"):
+    """
+    以内存映射方式读取金字塔，各层都是文件上的视图，启动时不会把数据读进内存
+
+    返回:
+    [第0层, 第1层, ...]，文件不是 save_height_pyramid 的格式（如旧版本的文件）时抛出 ValueError
+    """
+    return _split_levels(np.load(path, mmap_mode=mmap_mode), path)
+
+
+def _split_levels(data, path):
+    """把 save_height_pyramid 写出的一维数组按文件头切成各层的视图"""
+    per = HEADER_ITEM // data.dtype.itemsize
+    if HEADER_ITEM % data.dtype.itemsize or len(data) < 2 * per:
+        raise ValueError(f"不是高度金字塔文件: {path}")
+    magic, count = (int(v) for v in np.asarray(data[:2 * per]).view(np.int64))
+    if magic != PYRAMID_MAGIC:
+        raise ValueError(f"不是高度金字塔文件: {path}")
+    header = np.asarray(data[:(2 + 2 * count) * per]).view(np.int64)
+    shapes = [(int(header[2 + 2 * i]), int(header[3 + 2 * i])) for i in range(count)]
+    offset = (2 + 2 * count) * per
+    levels = []
+    for rows, cols in shapes:
+        levels.append(data[offset:offset + rows * cols].reshape(rows, cols))
+        offset += rows * cols
+    return levels
+
+
+def refresh_height_pyramid(path, height_map, boxes):
+    """
+    高度图只改动了一部分时，就地更新金字塔文件：只重新池化 boxes 覆盖的格子及其在各粗层上的父格
+
+    参数:
+    path: save_height_pyramid 写出的金字塔文件
+    height_map: 已更新的高度图（第0层），按 [y, x] 取高度
+    boxes: 改动的范围 [((y0, x0), (y1, x1)), ...]，第0层坐标，含两端
+    """
+    data = np.load(path, mmap_mode='r+')
+    levels = _split_levels(data, path)
+    for (y0, x0), (y1, x1) in boxes:
+        levels[0][y0:y1 + 1, x0:x1 + 1] = height_map[y0:y1 + 1, x0:x1 + 1]
+        for finer, level in zip(levels, levels[1:]):
+            y0, x0, y1, x1 = y0 // 2, x0 // 2, y1 // 2, x1 // 2
+            # 粗格的高度只取决于它的子格，边缘上缺少的子格不抬高粗格（与 max_pool_heights 相同）
+            level[y0:y1 + 1, x0:x1 + 1] = max_pool_heights(np.asarray(finer[2 * y0:2 * y1 + 2, 2 * x0:2 * x1 + 2]))
+    data.flush()
+    del levels, data
+    # 让 ensure_height_pyramid 认为金字塔不比高度图旧，不再整体重建
+    os.utime(path)
+
+
+def ensure_height_pyramid(grid_path, min_size=MIN_LEVEL_SIZE):
+    """
+    读取 grid.npy 旁边的金字塔文件；不存在、比 grid.npy 旧或是旧格式时重新生成
+    """
+    path = pyramid_path(grid_path)
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(grid_path):
+        try:
+            return load_height_pyramid(path)
+        except ValueError as e:
+            print(e)
+    print(f"生成高度金字塔: {path}")
+    save_height_pyramid(path, build_height_pyramid(np.load(grid_path), min_size))
+    return load_height_pyramid(path)
+
+
+class CoarseToFinePlanner:
+    """
+    先在金字塔的粗层上规划，再在原分辨率下只搜索粗路径周围的走廊。
+
+    粗层格子的高度是子格中的最大值，所以粗层上可飞的高度在细层上一定可飞。
+    走廊内找不到路径时会把走廊加宽，最后退回到整张地图的 AStar3D。
+    """
+
+    def __init__(self, height_map, pyramid=None, min_altitude=5, max_altitude=100,
+                 level=3, corridor=4, corridor_retries=2, band=6, engine="packed",
+                 progress_callback=None):
+        """
+        参数:
+        height_map: 高度图（第0层），按 height_map[y, x] 取地面高度
+        pyramid: build_height_pyramid / load_height_pyramid 的结果，None 时现场构建
+        min_altitude, max_altitude: 与 AStar3D 相同
+        level: 粗规划使用的层
+        corridor: 走廊在细层上向外扩展的格数
+        corridor_retries: 走廊加宽（每次翻倍）的次数
+        band: 走廊内允许高出粗层巡航高度的米数（走廊加宽时一起放宽）
+        engine: 细层 AStar3D 使用的搜索实现
+        progress_callback: 传给细层 AStar3D 的进度回调
+        """
+        self.height_map = height_map
+        self.pyramid = pyramid if pyramid is not None else build_height_pyramid(height_map)
+        self.min_altitude = min_altitude
+        self.max_altitude = max_altitude
+        self.level = min(level, len(self.pyramid) - 1)
+        self.corridor = corridor
+        self.corridor_retries = corridor_retries
+        self.band = band
+        self.engine = engine
+        self.progress_callback = progress_callback
+        self._coarse = None
+
+    def coarse_path(self, start, end):
+        """在粗层上做分层巡航规划，返回粗格 [(x, y, z), ...]"""
+        k = self.level
+        if self._coarse is None:
+            self._coarse = CruisePlanner(np.asarray(self.pyramid[k]), clearance=self.min_altitude,
+                                         max_altitude=self.max_altitude, cell_size=1 << k)
+        s = (int(start[0]) >> k, int(start[1]) >> k, start[2])
+        e = (int(end[0]) >> k, int(end[1]) >> k, end[2])
+        return self._coarse.find_path_2d(s, e, self._coarse.layer_altitude(s, e))
+
+    def _search_corridor(self, cells, start, end, radius):
+        """
+        只在走廊的外接矩形内搜索。
+        走廊内每列的最高高度为覆盖它的粗格巡航高度 + band，走廊以外的列不可飞，
+        这样细层的 A* 不会在高度方向上大范围展开。
+        """
+        rows, cols = self.height_map.shape
+        size = 1 << self.level
+        band = self.band + radius
+        # -1 表示不在走廊内
+        ceiling = np.full((rows, cols), -1, dtype=np.int64)
+        for cx, cy, alt in cells:
+            window = (slice(max(0, cy * size - radius), (cy + 1) * size + radius),
+                      slice(max(0, cx * size - radius), (cx + 1) * size + radius))
+            np.maximum(ceiling[window], alt + band, out=ceiling[window])
+        for x, y, z in (start, end):
+            ceiling[y, x] = max(ceiling[y, x], z + band)
+            # 起降的垂直段附近也要留出空间
+            window = (slice(max(0, y - radius), y + radius + 1), slice(max(0, x - radius), x + radius + 1))
+            np.maximum(ceiling[window], z + band, out=ceiling[window])
+
+        ys, xs = np.nonzero(ceiling >= 0)
+        y0, y1, x0, x1 = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+        window = np.asarray(self.height_map[y0:y1, x0:x1])
+        limit = ceiling[y0:y1, x0:x1]
+        # 走廊外的列：最高高度低于最低高度
+        limit = np.where(limit >= 0, limit, np.floor(window + self.min_altitude) - 1)
+
+        astar = AStar3D(window, self.min_altitude, self.max_altitude, engine=self.engine, ceiling=limit,
+                        progress_callback=self.progress_callback)
+        path = astar.find_path((start[0] - x0, start[1] - y0, start[2]),
+                               (end[0] - x0, end[1] - y0, end[2]))
+        return [(x + x0, y + y0, z) for x, y, z in path]
+
+    def find_path(self, start, end):
+        """
+        返回:
+        与 AStar3D.find_path 相同格式的路径 [(x, y, z), ...]，找不到时返回 []
+        """
+        start = tuple(int(c) for c in start)
+        end = tuple(int(c) for c in end)
+
+        cells = self.coarse_path(start, end)
+        if cells:
+            radius = self.corridor
+            for _ in range(self.corridor_retries + 1):
+                path = self._search_corridor(cells, start, end, radius)
+                if path:
+                    return path
+                radius *= 2
+            print("走廊内未找到路径，改用整张地图搜索")
+        else:
+            print("粗层规划失败，改用整张地图搜索")
+
+        astar = AStar3D(np.asarray(self.height_map), self.min_altitude, self.max_altitude, engine=self.engine,
+                        progress_callback=self.progress_callback)
+        return astar.find_path(start, end)
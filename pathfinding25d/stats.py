@@ -0,0 +1,56 @@
+import time
+
+# 默认每扩展多少个节点回调一次进度
+PROGRESS_INTERVAL = 10000
+
+
+def check_progress_interval(progress_interval):
+    """
+    检查进度回调间隔（扩展的节点数），0 或 None 表示不回调进度
+
+    返回:
+    int 间隔，负数时抛出 ValueError
+    """
+    if progress_interval is None:
+        return 0
+    if progress_interval < 0:
+        raise ValueError(f"progress_interval 不能为负数: {progress_interval}")
+    return int(progress_interval)
+
+
+class SearchStats:
+    """
+    单次搜索的统计信息。
+    每次搜索使用自己的对象（由调用方传入或搜索时新建），多个搜索并发运行时互不影响。
+    """
+
+    def __init__(self):
+        self.expansions = 0     # 出队并扩展的节点数
+        self.pushes = 0         # 压入开放队列的次数（即原来的 nodes_explored）
+        self.open_size = 0      # 开放队列当前大小
+        self.best_f = 0.0       # 最近一次出队节点的 f 值（开放队列中最小的 f）
+        self.found = False
+        self.start_time = time.perf_counter()
+        self.end_time = None
+
+    @property
+    def elapsed(self):
+        """已用时间（秒），搜索结束后固定为总用时"""
+        end = self.end_time if self.end_time is not None else time.perf_counter()
+        return end - self.start_time
+
+    def finish(self, found):
+        """标记搜索结束"""
+        self.found = found
+        self.end_time = time.perf_counter()
+
+    def __repr__(self):
+        return (f"SearchStats(expansions={self.expansions}, pushes={self.pushes}, "
+                f"open_size={self.open_size}, best_f={self.best_f:.2f}, "
+                f"elapsed={self.elapsed:.3f}s, found={self.found})")
+
+
+def print_progress(stats):
+    """打印搜索进度的回调，输出格式与原来每 10000 个节点的 print 相同，并附带 f 值和用时"""
+    print(f"已探索节点: {stats.pushes}, 开放队列大小: {stats.open_size}, "
+          f"最小f: {stats.best_f:.1f}, 用时: {stats.elapsed:.1f}s")
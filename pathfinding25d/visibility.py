@@ -0,0 +1,90 @@
+import numpy as np
+
+# 沿线段采样的间距（格），小于半格时线段穿过的每一格都在某个采样点的 4 个邻列之中
+SAMPLE_STEP = 0.45
+# 拉直路径时，每个锚点最多向后检查的航点数
+LOOKAHEAD = 256
+
+
+def segments_visible(z_lo, z_hi, starts, ends, step=SAMPLE_STEP):
+    """
+    批量检查高度场上的线段是否可飞（通视）。
+
+    所有线段按 step 的间距采样，采样点一次性拼成一个数组处理。
+    每个采样点要同时满足四周 4 个列（x、y 各取上下取整）的可飞区间，
+    因此线段经过的每一格（包括只擦过一个角的格子）都会被检查，结果偏保守。
+    格子以整数坐标为中心，即点 (x, y) 属于列 (round(x), round(y))。
+
+    参数:
+    z_lo, z_hi: 每列允许的最低/最高高度，按 [y, x] 索引（即 AStar3D.z_lo / z_hi）
+    starts, ends: 线段端点，形状 (n, 3) 的 (x, y, z)，端点需在地图内
+    step: 采样间距（格）
+
+    返回:
+    长度为 n 的布尔数组，True 表示该线段可飞
+    """
+    starts = np.asarray(starts, dtype=float).reshape(-1, 3)
+    ends = np.asarray(ends, dtype=float).reshape(-1, 3)
+    if len(starts) == 0:
+        return np.zeros(0, dtype=bool)
+    rows, cols = z_lo.shape
+
+    delta = ends - starts
+    # 每条线段的采样数（含两个端点）
+    counts = np.ceil(np.abs(delta).max(axis=1) / step).astype(np.int64) + 1
+    first = np.cumsum(counts) - counts
+    segment = np.repeat(np.arange(len(starts)), counts)
+    t = (np.arange(counts.sum()) - first[segment]) / np.maximum(counts - 1, 1)[segment]
+    points = starts[segment] + delta[segment] * t[:, None]
+
+    # 端点在地图内，线段上的点取整后也在地图内
+    x0 = np.floor(points[:, 0]).astype(np.int64)
+    x1 = np.ceil(points[:, 0]).astype(np.int64)
+    y0 = np.floor(points[:, 1]).astype(np.int64)
+    y1 = np.ceil(points[:, 1]).astype(np.int64)
+
+    lo = np.maximum(np.maximum(z_lo[y0, x0], z_lo[y0, x1]), np.maximum(z_lo[y1, x0], z_lo[y1, x1]))
+    hi = np.minimum(np.minimum(z_hi[y0, x0], z_hi[y0, x1]), np.minimum(z_hi[y1, x0], z_hi[y1, x1]))
+    # 两个采样点之间的高度介于两者之间，用这一段的最低/最高高度比较
+    z = points[:, 2]
+    z_next = np.append(z[1:], z[-1])
+    z_next[first + counts - 1] = z[first + counts - 1]
+    ok = (np.minimum(z, z_next) >= lo) & (np.maximum(z, z_next) <= hi)
+    return np.logical_and.reduceat(ok, first)
+
+
+def line_of_sight(astar, a, b):
+    """两个点之间是否可以直线飞行（单条线段的 segments_visible）"""
+    return bool(segments_visible(astar.z_lo, astar.z_hi, [a], [b])[0])
+
+
+def smooth_path(astar, path, lookahead=LOOKAHEAD):
+    """
+    拉绳法（string pulling）简化路径：从当前航点出发，
+    一次批量检查它到后面 lookahead 个航点的线段，跳到最远的可见航点。
+
+    参数:
+    astar: 规划这条路径的 AStar3D（提供可飞区间）
+    path: [(x, y, z), ...]，相邻航点必须可飞（如 find_path 的结果）
+    lookahead: 每个锚点最多向后检查的航点数
+
+    返回:
+    简化后的航点列表，相邻航点之间可以直线飞行
+    """
+    if len(path) < 3:
+        return list(path)
+    points = np.asarray(path, dtype=float)
+    last = len(path) - 1
+
+    smoothed = [path[0]]
+    i = 0
+    while i < last:
+        candidates = np.arange(i + 1, min(last, i + lookahead) + 1)
+        visible = segments_visible(astar.z_lo, astar.z_hi,
+                                   np.repeat(points[i:i + 1], len(candidates), axis=0),
+                                   points[candidates])
+        hits = np.nonzero(visible)[0]
+        # 网格上相邻的一步一定可飞，即使保守的检查没有通过
+        i = int(candidates[hits[-1]]) if len(hits) else i + 1
+        smoothed.append(path[i])
+    return smoothed
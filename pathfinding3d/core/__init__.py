@@ -1 +1 @@
-__all__ = ["diagonal_movement", "grid", "heuristic", "node", "util", "world"]
+__all__ = ["diagonal_movement", "grid", "heuristic", "node", "pyramid", "util", "world"]
@@ -0,0 +1,187 @@
+"""
+Occupancy pyramids for coarse-to-fine searches.
+
+Level 0 is the blocked-mask of the original matrix, every following level
+halves all three dimensions. A coarse cell is blocked as soon as one of its
+(up to 8) children is blocked (max-pooling), so a path through free coarse
+cells only visits free fine cells.
+"""
+import hashlib
+from collections import OrderedDict
+from typing import Hashable, List, Optional
+
+import numpy as np
+
+from .grid import MatrixType
+
+# amount of pyramids kept in the process wide cache
+PYRAMID_CACHE_SIZE = 8
+# stop halving when one of the dimensions gets smaller than this
+MIN_LEVEL_SIZE = 4
+
+_pyramid_cache: "OrderedDict[Hashable, List[np.ndarray]]" = OrderedDict()
+
+
+def blocked_mask(matrix: MatrixType, inverse: bool = False) -> np.ndarray:
+    """
+    Get the obstacles of a matrix, using the same rules as build_nodes
+
+    Parameters
+    ----------
+    matrix : MatrixType
+        3D array of values, 0 (or values < 1) mark obstacles
+    inverse : bool, optional
+        If true, all values that are not 0 mark obstacles
+
+    Returns
+    -------
+    np.ndarray
+        boolean array, True for obstacles
+    """
+    matrix = np.asarray(matrix)
+    return matrix > 0 if inverse else matrix < 1
+
+
+def max_pool(blocked: np.ndarray) -> np.ndarray:
+    """
+    Halve the resolution of a blocked-mask, a coarse cell is blocked
+    if any of its children is blocked.
+
+    Parameters
+    ----------
+    blocked : np.ndarray
+        3D boolean array
+
+    Returns
+    -------
+    np.ndarray
+        3D boolean array with half the size (rounded up)
+    """
+    # cells outside of the map don't block anything
+    pad = [(0, dim % 2) for dim in blocked.shape]
+    if any(p for _, p in pad):
+        blocked = np.pad(blocked, pad, constant_values=False)
+    w, h, d = blocked.shape
+    return blocked.reshape(w // 2, 2, h // 2, 2, d // 2, 2).any(axis=(1, 3, 5))
+
+
+def build_pyramid(blocked: np.ndarray, min_size: int = MIN_LEVEL_SIZE) -> List[np.ndarray]:
+    """
+    Build the pyramid of a blocked-mask by repeated max-pooling
+
+    Parameters
+    ----------
+    blocked : np.ndarray
+        3D boolean array, True for obstacles
+    min_size : int, optional
+        stop when one dimension of the next level would be smaller than this
+
+    Returns
+    -------
+    List[np.ndarray]
+        all levels, starting with the original mask
+    """
+    levels = [blocked]
+    while min(levels[-1].shape) // 2 >= min_size:
+        levels.append(max_pool(levels[-1]))
+    return levels
+
+
+def matrix_digest(matrix: MatrixType) -> str:
+    """
+    Cheap fingerprint of the matrix content
+
+    Parameters
+    ----------
+    matrix : MatrixType
+        3D array
+
+    Returns
+    -------
+    str
+        hex digest of shape, dtype and values
+    """
+    matrix = np.ascontiguousarray(matrix)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((matrix.shape, matrix.dtype.str)).encode())
+    digest.update(matrix.data)
+    return digest.hexdigest()
+
+
+def get_pyramid(
+    matrix: MatrixType,
+    key: Optional[Hashable] = None,
+    inverse: bool = False,
+    min_size: int = MIN_LEVEL_SIZE,
+) -> List[np.ndarray]:
+    """
+    Get the (cached) pyramid of a matrix
+
+    Parameters
+    ----------
+    matrix : MatrixType
+        3D array of values that determine what nodes are walkable
+    key : Hashable, optional
+        identifies the map (e.g. the loaded tiles). The key is always combined
+        with a digest of the obstacles, so a changed map (or another map with
+        the same key) never gets a stale pyramid.
+    inverse : bool, optional
+        If true, all values that are not 0 mark obstacles
+    min_size : int, optional
+        min. size of the coarsest level
+
+    Returns
+    -------
+    List[np.ndarray]
+        all levels, starting with the blocked-mask of the matrix
+    """
+    blocked = blocked_mask(matrix, inverse)
+    key = (key, matrix_digest(blocked), min_size)
+
+    if key in _pyramid_cache:
+        _pyramid_cache.move_to_end(key)
+        return _pyramid_cache[key]
+
+    pyramid = build_pyramid(blocked, min_size)
+    _pyramid_cache[key] = pyramid
+    while len(_pyramid_cache) > PYRAMID_CACHE_SIZE:
+        _pyramid_cache.popitem(last=False)
+    return pyramid
+
+
+def clear_pyramid_cache():
+    """
+    Drop all cached pyramids (e.g. after the map changed)
+    """
+    _pyramid_cache.clear()
+
+
+def dilate(mask: np.ndarray, radius: int) -> np.ndarray:
+    """
+    Grow a boolean mask by radius cells along every axis (box shaped)
+
+    Parameters
+    ----------
+    mask : np.ndarray
+        boolean array
+    radius : int
+        amount of cells to grow
+
+    Returns
+    -------
+    np.ndarray
+        dilated mask
+    """
+    mask = mask.copy()
+    for axis in range(mask.ndim):
+        grown = mask.copy()
+        length = mask.shape[axis]
+        for shift in range(1, min(radius, length - 1) + 1):
+            lower = [slice(None)] * mask.ndim
+            upper = [slice(None)] * mask.ndim
+            lower[axis] = slice(0, length - shift)
+            upper[axis] = slice(shift, length)
+            grown[tuple(lower)] |= mask[tuple(upper)]
+            grown[tuple(upper)] |= mask[tuple(lower)]
+        mask = grown
+    return mask
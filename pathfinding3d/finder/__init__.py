@@ -1,11 +1,15 @@
 __all__ = [
     "a_star",
+    "beam",
     "best_first",
     "bi_a_star",
     "breadth_first",
+    "dial",
     "dijkstra",
     "finder",
     "ida_star",
     "msp",
+    "multires",
+    "receding",
     "theta_star",
 ]
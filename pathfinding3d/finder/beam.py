@@ -0,0 +1,195 @@
+import heapq
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from ..core.diagonal_movement import DiagonalMovement
+from ..core.grid import Grid
+from ..core.heuristic import manhattan, octile
+from ..core.node import GridNode
+from ..core.util import backtrace
+from .finder import MAX_RUNS, TIME_LIMIT, Finder
+
+# default amount of nodes kept per depth layer
+BEAM_WIDTH = 1000
+
+
+class BeamSearchFinder(Finder):
+    """
+    Memory-bounded beam search.
+
+    The search advances layer by layer (all nodes of one depth are expanded
+    together) and only keeps the ``beam_width`` most promising successors
+    (lowest f = g + h) for the next layer. The open list never holds more than
+    ``beam_width`` nodes, so memory is capped at the price of optimality and
+    completeness.
+
+    If a search fails the beam can be widened by ``widen_factor`` and the
+    search is repeated until ``max_beam_width`` is reached.
+    """
+
+    def __init__(
+        self,
+        heuristic: Optional[Callable] = None,
+        weight: int = 1,
+        diagonal_movement: int = DiagonalMovement.never,
+        time_limit: float = TIME_LIMIT,
+        max_runs: Union[int, float] = MAX_RUNS,
+        beam_width: int = BEAM_WIDTH,
+        widen_factor: int = 2,
+        max_beam_width: Optional[int] = None,
+    ):
+        """
+        Find a path using beam search
+
+        Parameters
+        ----------
+        heuristic : Callable
+            heuristic used to calculate distance of 2 points
+        weight : int
+            weight for the edges
+        diagonal_movement : int
+            if diagonal movement is allowed
+            (see enum in diagonal_movement)
+        time_limit : float
+            max. runtime in seconds
+        max_runs : int
+            max. amount of tries until we abort the search
+            (optional, only if we enter huge grids and have time constrains)
+            <=0 means there are no constrains and the code might run on any
+            large map.
+        beam_width : int
+            max. amount of nodes kept per depth layer on the first try
+        widen_factor : int
+            factor to widen the beam with after a failed search
+        max_beam_width : int, optional
+            hard cap for the beam width, by default the beam is not widened
+        """
+        super().__init__(
+            heuristic=heuristic,
+            weight=weight,
+            diagonal_movement=diagonal_movement,
+            time_limit=time_limit,
+            max_runs=max_runs,
+        )
+
+        if beam_width < 1:
+            raise ValueError("beam_width has to be at least 1")
+        if widen_factor < 2:
+            raise ValueError("widen_factor has to be at least 2")
+
+        self.beam_width = beam_width
+        self.widen_factor = widen_factor
+        self.max_beam_width = beam_width if max_beam_width is None else max(beam_width, max_beam_width)
+
+        if not heuristic:
+            if diagonal_movement == DiagonalMovement.never:
+                self.heuristic = manhattan
+            else:
+                # When diagonal movement is allowed the manhattan heuristic is
+                # not admissible it should be octile instead
+                self.heuristic = octile
+
+    def search(
+        self, start: GridNode, end: GridNode, grid: Grid, beam_width: int, touched: Dict[Tuple, GridNode]
+    ) -> List:
+        """
+        Run a single beam search with a fixed beam width
+
+        Parameters
+        ----------
+        start : GridNode
+            start node
+        end : GridNode
+            end node
+        grid : Grid
+            grid that stores all possible steps/tiles as 3D-list
+        beam_width : int
+            max. amount of nodes kept per depth layer
+        touched : Dict[Tuple, GridNode]
+            all nodes the search changed get added (once, by identifier),
+            so they can be reset
+
+        Returns
+        -------
+        List
+            path or empty list if the beam ran dry
+        """
+        start.g = 0
+        start.f = 0
+        start.opened = True
+        start.closed = True
+        touched[start.identifier] = start
+        layer = [start]
+
+        while layer:
+            candidates: Dict[Tuple, GridNode] = {}
+            for node in layer:
+                self.runs += 1
+                self.keep_running()
+
+                if node == end:
+                    return backtrace(end)
+
+                for neighbor in self.find_neighbors(grid, node):
+                    if neighbor.closed:
+                        continue
+
+                    ng = node.g + grid.calc_cost(node, neighbor, self.weighted)
+                    if not neighbor.opened or ng < neighbor.g:
+                        touched[neighbor.identifier] = neighbor
+                        neighbor.g = ng
+                        neighbor.h = neighbor.h or self.apply_heuristic(neighbor, end)
+                        neighbor.f = neighbor.g + neighbor.h
+                        neighbor.parent = node
+                        neighbor.opened = True
+                        candidates[neighbor.identifier] = neighbor
+
+            if len(candidates) > beam_width:
+                layer = heapq.nsmallest(beam_width, candidates.values(), key=lambda n: n.f)
+                # pruned nodes may be reached again later by another layer
+                kept = set(map(id, layer))
+                for node in candidates.values():
+                    if id(node) not in kept:
+                        node.opened = 0
+            else:
+                layer = list(candidates.values())
+            # nodes are closed as soon as they are selected into the beam, so a
+            # node of this layer is neither queued again nor expanded twice
+            for node in layer:
+                node.closed = True
+
+        return []
+
+    def find_path(self, start: GridNode, end: GridNode, grid: Grid) -> Tuple[List, int]:
+        """
+        Find a path from start to end node on grid using beam search,
+        widen the beam after every failed try
+
+        Parameters
+        ----------
+        start : GridNode
+            start node
+        end : GridNode
+            end node
+        grid : Grid
+            grid that stores all possible steps/tiles as 3D-list
+
+        Returns
+        -------
+        Tuple[List, int]
+            path, number of iterations
+        """
+        self.start_time = time.time()  # execution time limitation
+        self.runs = 0  # count number of iterations
+
+        beam_width = self.beam_width
+        while True:
+            touched: Dict[Tuple, GridNode] = {}
+            path = self.search(start, end, grid, beam_width, touched)
+            if path or beam_width >= self.max_beam_width:
+                return path, self.runs
+
+            # reset only the nodes of the failed try instead of the whole grid
+            for node in touched.values():
+                node.cleanup()
+            beam_width = min(self.max_beam_width, beam_width * self.widen_factor)
@@ -0,0 +1,244 @@
+import time
+import weakref
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from ..core.diagonal_movement import DiagonalMovement
+from ..core.grid import Grid
+from ..core.node import GridNode
+from ..core.util import backtrace
+from ..core.world import World
+from .finder import MAX_RUNS, TIME_LIMIT, Finder
+
+# default factor to turn step lengths (1, sqrt(2), sqrt(3)) into integers
+COST_SCALE = 100
+
+
+class DialFinder(Finder):
+    """
+    Dijkstra with a circular bucket queue (Dial's algorithm).
+
+    All edge costs are scaled by ``cost_scale`` and rounded to integers, so
+    instead of a binary heap we can keep one bucket per distance value.
+    Because no edge is more expensive than ``C`` (the largest scaled cost),
+    all queued distances lie in ``[d, d + C]`` and ``C + 1`` buckets used as
+    a ring are enough. Push and pop are O(1), the whole search is O(E + D)
+    with D the largest scaled distance.
+
+    The scaled distance of a node is stored in ``node.f``, ``node.g`` holds
+    the (rounded) distance in the original units.
+    """
+
+    def __init__(
+        self,
+        weight: int = 1,
+        diagonal_movement: int = DiagonalMovement.never,
+        time_limit: float = TIME_LIMIT,
+        max_runs: Union[int, float] = MAX_RUNS,
+        cost_scale: int = COST_SCALE,
+        max_weight: Optional[int] = None,
+    ):
+        """
+        Find shortest path using Dial's bucket-queue variant of Dijkstra
+
+        Parameters
+        ----------
+        weight : int
+            weight for the edges
+        diagonal_movement : int
+            if diagonal movement is allowed
+            (see enum in diagonal_movement)
+        time_limit : float
+            max. runtime in seconds
+        max_runs : int
+            max. amount of tries until we abort the search
+            (optional, only if we enter huge grids and have time constrains)
+            <=0 means there are no constrains and the code might run on any
+            large map.
+        cost_scale : int
+            factor applied to the edge costs before rounding them to integers,
+            higher values are more precise but need more buckets
+        max_weight : int, optional
+            largest node weight in the grid, used to size the bucket ring.
+            If not given it is looked up once per grid and cached, pass it
+            (or use a new finder) if the weights of a grid change later on.
+        """
+        super().__init__(
+            weight=weight,
+            diagonal_movement=diagonal_movement,
+            time_limit=time_limit,
+            max_runs=max_runs,
+        )
+        self.cost_scale = cost_scale
+        self.max_weight = max_weight
+        # largest weight per grid, looked up on the first search of each grid
+        self._grid_weights = weakref.WeakKeyDictionary()
+
+    def _max_weight(self, grid: Union[Grid, World]) -> int:
+        """
+        Get the largest weight of all walkable nodes (cached per grid)
+
+        Parameters
+        ----------
+        grid : Union[Grid, World]
+            grid or world to search
+
+        Returns
+        -------
+        int
+            largest node weight (at least 1)
+        """
+        if self.max_weight is not None:
+            return max(1, int(self.max_weight))
+        if not self.weighted:
+            # the step costs ignore the node weights
+            return 1
+
+        cached = self._grid_weights.get(grid)
+        if cached is not None:
+            return cached
+        grids = grid.grids.values() if isinstance(grid, World) else [grid]
+        max_weight = 1
+        for g in grids:
+            for x_nodes in g.nodes:
+                for y_nodes in x_nodes:
+                    for node in y_nodes:
+                        if node.walkable and node.weight > max_weight:
+                            max_weight = node.weight
+        max_weight = int(np.ceil(max_weight))
+        self._grid_weights[grid] = max_weight
+        return max_weight
+
+    def _scaled_cost(self, grid: Union[Grid, World], node_a: GridNode, node_b: GridNode) -> int:
+        """
+        Integer cost to move from node_a to node_b
+
+        Parameters
+        ----------
+        grid : Union[Grid, World]
+            grid that stores all possible steps/tiles as 3D-list
+        node_a : GridNode
+            current node
+        node_b : GridNode
+            neighbor node
+
+        Returns
+        -------
+        int
+            scaled and rounded cost, at least 1
+        """
+        return max(1, int(round(grid.calc_cost(node_a, node_b, self.weighted) * self.cost_scale)))
+
+    def itersearch(self, start: GridNode, grid: Union[Grid, World], end: Optional[GridNode] = None):
+        """
+        Generator that settles the nodes in order of their distance to start.
+
+        Parameters
+        ----------
+        start : GridNode
+            start node
+        grid : Union[Grid, World]
+            grid that stores all possible steps/tiles as 3D-list
+        end : GridNode, optional
+            stop after this node was settled
+        """
+        self.start_time = time.time()  # execution time limitation
+        self.runs = 0  # count number of iterations
+
+        # a step is at most sqrt(3) long (more if grids are connected) and
+        # gets multiplied by the node weight
+        ring_size = int(np.ceil(2 * self.cost_scale * self._max_weight(grid))) + 1
+        buckets: List[List[GridNode]] = [[] for _ in range(ring_size)]
+
+        start.g = 0
+        start.f = 0
+        start.opened = True
+        buckets[0].append(start)
+        queued = 1
+        current = 0
+
+        while queued > 0:
+            bucket = buckets[current % ring_size]
+            if not bucket:
+                current += 1
+                continue
+
+            node = bucket.pop()
+            queued -= 1
+            # skip outdated entries, the node was queued again with a
+            # smaller distance
+            if node.closed or node.f != current:
+                continue
+
+            self.runs += 1
+            self.keep_running()
+
+            node.closed = True
+            yield node
+
+            if node is end:
+                return
+
+            for neighbor in self.find_neighbors(grid, node):
+                if neighbor.closed:
+                    continue
+                cost = self._scaled_cost(grid, node, neighbor)
+                if cost >= ring_size:
+                    raise ValueError(
+                        f"edge cost {cost} does not fit into {ring_size} buckets, please increase max_weight"
+                    )
+                nd = current + cost
+                if not neighbor.opened or nd < neighbor.f:
+                    neighbor.f = nd
+                    neighbor.g = nd / self.cost_scale
+                    neighbor.parent = node
+                    neighbor.opened = True
+                    buckets[nd % ring_size].append(neighbor)
+                    queued += 1
+
+    def find_path(self, start: GridNode, end: GridNode, grid: Union[Grid, World]) -> Tuple[List, int]:
+        """
+        Find a path from start to end node on grid using Dial's algorithm
+
+        Parameters
+        ----------
+        start : GridNode
+            start node
+        end : GridNode
+            end node
+        grid : Union[Grid, World]
+            grid that stores all possible steps/tiles as 3D-list
+
+        Returns
+        -------
+        Tuple[List, int]
+            path, number of iterations
+        """
+        for node in self.itersearch(start, grid, end):
+            if node is end:
+                return backtrace(end), self.runs
+
+        # failed to find path
+        return [], self.runs
+
+    def distance_field(self, start: GridNode, grid: Grid) -> np.ndarray:
+        """
+        Distance from start to every reachable node of the grid
+
+        Parameters
+        ----------
+        start : GridNode
+            node to measure the distances from (e.g. a depot)
+        grid : Grid
+            grid that stores all possible steps/tiles as 3D-list
+
+        Returns
+        -------
+        np.ndarray
+            array of shape (width, height, depth), unreachable nodes are inf
+        """
+        field = np.full((grid.width, grid.height, grid.depth), np.inf)
+        for node in self.itersearch(start, grid):
+            field[node.x, node.y, node.z] = node.g
+        return field
@@ -0,0 +1,412 @@
+import heapq
+import math
+import time
+from typing import Callable, Hashable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from ..core.diagonal_movement import DiagonalMovement
+from ..core.grid import Grid, MatrixType
+from ..core.heuristic import manhattan, octile
+from ..core.pyramid import MIN_LEVEL_SIZE, blocked_mask, dilate, get_pyramid
+from .a_star import AStarFinder
+from .finder import MAX_RUNS, TIME_LIMIT, ExecutionRunsException, ExecutionTimeException
+
+Coords = Tuple[int, int, int]
+
+
+class MultiResolutionFinder:
+    """
+    Coarse-to-fine search over a max-pooled occupancy pyramid.
+
+    The query is solved on the coarsest level on which start and end are
+    free and connected. Every finer level is only searched inside a dilated
+    corridor around the path of the level above. If a corridor turns out to
+    be too narrow it gets widened and finally the whole level is searched,
+    so the finder stays complete.
+
+    Unlike the other finders it works directly on the matrix. The searches on
+    the pyramid levels run on boolean masks (like RecedingHorizonFinder), no
+    Grid is built for them; only when no coarse level connects start and end
+    the matrix is searched with finder_class on a Grid.
+    """
+
+    def __init__(
+        self,
+        heuristic: Optional[Callable] = None,
+        diagonal_movement: int = DiagonalMovement.never,
+        time_limit: float = TIME_LIMIT,
+        max_runs: Union[int, float] = MAX_RUNS,
+        corridor: int = 2,
+        corridor_retries: int = 2,
+        min_size: int = MIN_LEVEL_SIZE,
+        finder_class: Callable = AStarFinder,
+    ):
+        """
+        Find a path using a coarse-to-fine search
+
+        Parameters
+        ----------
+        heuristic : Callable
+            heuristic used to calculate distance of 2 points
+        diagonal_movement : int
+            if diagonal movement is allowed
+            (see enum in diagonal_movement)
+        time_limit : float
+            max. runtime in seconds (per single search)
+        max_runs : int
+            max. amount of tries until we abort the search (per single search)
+        corridor : int
+            amount of cells the coarse path gets dilated by on the finer level
+        corridor_retries : int
+            how often the corridor is doubled before the whole level is searched
+        min_size : int
+            min. size of the coarsest level of the pyramid
+        finder_class : Callable
+            finder used on the full matrix when no coarse level connects
+            start and end
+        """
+        self.heuristic = heuristic
+        self.diagonal_movement = diagonal_movement
+        self.time_limit = time_limit
+        self.max_runs = max_runs
+        self.corridor = corridor
+        self.corridor_retries = corridor_retries
+        self.min_size = min_size
+        self.finder_class = finder_class
+
+        self.runs: int = 0
+        # level the path was found on first (for statistics)
+        self.coarse_level: int = 0
+
+    def _search(self, matrix: np.ndarray, start: Coords, end: Coords, inverse: bool) -> List[Coords]:
+        """
+        Run a single search on a (small) matrix
+
+        Parameters
+        ----------
+        matrix : np.ndarray
+            3D array of values that determine what nodes are walkable
+        start : Coords
+            start position
+        end : Coords
+            end position
+        inverse : bool
+            If true, all values that are not 0 will be considered walkable
+
+        Returns
+        -------
+        List[Coords]
+            path as list of positions
+        """
+        grid = Grid(matrix=matrix, inverse=inverse)
+        finder = self.finder_class(
+            heuristic=self.heuristic,
+            diagonal_movement=self.diagonal_movement,
+            time_limit=self.time_limit,
+            max_runs=self.max_runs,
+        )
+        path, runs = finder.find_path(grid.node(*start), grid.node(*end), grid)
+        self.runs += runs
+        return [(node.x, node.y, node.z) for node in path]
+
+    def keep_running(self):
+        """
+        Check, if the current mask search runs into time or iteration constrains.
+
+        Raises
+        ------
+        ExecutionTimeException
+            if we run into a time constrain
+        ExecutionRunsException
+            if we run into a iteration constrain
+        """
+        if self._search_runs >= self.max_runs:
+            raise ExecutionRunsException(
+                f"{self.__class__.__name__} run into barrier of {self.max_runs} iterations without "
+                "finding the destination"
+            )
+
+        if time.time() - self.start_time >= self.time_limit:
+            raise ExecutionTimeException(
+                f"{self.__class__.__name__} took longer than {self.time_limit} seconds, aborting!"
+            )
+
+    def _steps(self, shape: Tuple[int, int, int]) -> List[Tuple]:
+        """
+        Neighbor steps of the diagonal movement mode, with the same rules as
+        Grid.neighbors
+
+        Parameters
+        ----------
+        shape : Tuple[int, int, int]
+            shape of the searched mask
+
+        Returns
+        -------
+        List[Tuple]
+            (dx, dy, dz, flat offset, length, flat offsets of the cells the
+            step passes, min. amount of those cells that must be walkable)
+        """
+        stride_x, stride_y = shape[1] * shape[2], shape[2]
+        steps = []
+        for dx, dy, dz in np.ndindex(3, 3, 3):
+            dx, dy, dz = dx - 1, dy - 1, dz - 1
+            axes = abs(dx) + abs(dy) + abs(dz)
+            if axes == 0 or (axes > 1 and self.diagonal_movement == DiagonalMovement.never):
+                continue
+            passed = []
+            if axes > 1:
+                # cells of the unit box between the node and the neighbor
+                for cx, cy, cz in np.ndindex(abs(dx) + 1, abs(dy) + 1, abs(dz) + 1):
+                    if 0 < cx + cy + cz < axes:
+                        passed.append(cx * dx * stride_x + cy * dy * stride_y + cz * dz)
+            if self.diagonal_movement == DiagonalMovement.only_when_no_obstacle:
+                need = len(passed)
+            elif self.diagonal_movement == DiagonalMovement.if_at_most_one_obstacle:
+                need = len(passed) - 1
+            else:
+                need = 0
+            if not need:
+                passed = []
+            offset = dx * stride_x + dy * stride_y + dz
+            steps.append((dx, dy, dz, offset, math.sqrt(axes), passed, need))
+        return steps
+
+    def _search_mask(
+        self,
+        walkable: np.ndarray,
+        start: Coords,
+        end: Coords,
+        weights: Optional[np.ndarray] = None,
+    ) -> List[Coords]:
+        """
+        A* directly on a boolean mask, nodes are flat indices into the mask
+
+        Parameters
+        ----------
+        walkable : np.ndarray
+            3D boolean array, True for cells that may be visited
+        start : Coords
+            start position
+        end : Coords
+            end position
+        weights : np.ndarray, optional
+            flat node weights (like GridNode.weight), the cost of a step is
+            multiplied by the weight of the neighbor
+
+        Returns
+        -------
+        List[Coords]
+            path as list of positions
+        """
+        self.start_time = time.time()
+        self._search_runs = 0
+        size_x, size_y, size_z = walkable.shape
+        stride_x = size_y * size_z
+        free = walkable.tobytes()
+        steps = self._steps(walkable.shape)
+        heuristic = self.heuristic
+        if not heuristic:
+            heuristic = manhattan if self.diagonal_movement == DiagonalMovement.never else octile
+
+        ex, ey, ez = end
+        start_index = start[0] * stride_x + start[1] * size_z + start[2]
+        end_index = ex * stride_x + ey * size_z + ez
+        g = {start_index: 0.0}
+        parents = {start_index: -1}
+        closed = set()
+        open_list = [(heuristic(abs(ex - start[0]), abs(ey - start[1]), abs(ez - start[2])), 0.0, start_index)]
+
+        try:
+            while open_list:
+                _, node_g, node = heapq.heappop(open_list)
+                if node in closed:
+                    continue
+                closed.add(node)
+                self._search_runs += 1
+                self.keep_running()
+
+                if node == end_index:
+                    path = []
+                    while node >= 0:
+                        path.append((node // stride_x, (node // size_z) % size_y, node % size_z))
+                        node = parents[node]
+                    return path[::-1]
+
+                x, y, z = node // stride_x, (node // size_z) % size_y, node % size_z
+                for dx, dy, dz, offset, cost, passed, need in steps:
+                    nx, ny, nz = x + dx, y + dy, z + dz
+                    if not (0 <= nx < size_x and 0 <= ny < size_y and 0 <= nz < size_z):
+                        continue
+                    neighbor = node + offset
+                    if not free[neighbor] or neighbor in closed:
+                        continue
+                    if need and sum(free[node + c] for c in passed) < need:
+                        continue
+                    ng = node_g + (cost if weights is None else cost * weights[neighbor])
+                    if ng < g.get(neighbor, math.inf):
+                        g[neighbor] = ng
+                        parents[neighbor] = node
+                        h = heuristic(abs(ex - nx), abs(ey - ny), abs(ez - nz))
+                        heapq.heappush(open_list, (ng + h, ng, neighbor))
+            return []
+        finally:
+            self.runs += self._search_runs
+
+    def _search_corridor(
+        self,
+        free: np.ndarray,
+        corridor: Optional[np.ndarray],
+        start: Coords,
+        end: Coords,
+        inverse: bool,
+    ) -> List[Coords]:
+        """
+        Search inside the bounding box of a corridor, cells outside of the
+        corridor are blocked. Runs on the mask, no Grid is built.
+
+        Parameters
+        ----------
+        free : np.ndarray
+            walkable values of the whole level
+        corridor : np.ndarray, optional
+            boolean mask of the cells that may be visited, None for the whole level
+        start : Coords
+            start position
+        end : Coords
+            end position
+        inverse : bool
+            If true, all values that are not 0 will be considered walkable
+
+        Returns
+        -------
+        List[Coords]
+            path as list of positions on the level
+        """
+        if corridor is None:
+            lower = [0, 0, 0]
+            window = tuple(slice(None) for _ in range(3))
+            values = np.asarray(free)
+            walkable = ~blocked_mask(values, inverse)
+        else:
+            corridor[start] = corridor[end] = True
+            lower = [int(c.min()) for c in np.nonzero(corridor)]
+            upper = [int(c.max()) + 1 for c in np.nonzero(corridor)]
+            window = tuple(slice(lo, hi) for lo, hi in zip(lower, upper))
+            values = np.asarray(free[window])
+            walkable = corridor[window] & ~blocked_mask(values, inverse)
+
+        # values bigger than 1 are weights (see Grid), boolean levels have none
+        weights = None
+        if not inverse and values.dtype != bool and values.size and values.max() > 1:
+            weights = values.astype(float).ravel()
+
+        path = self._search_mask(
+            walkable,
+            tuple(s - lo for s, lo in zip(start, lower)),
+            tuple(e - lo for e, lo in zip(end, lower)),
+            weights,
+        )
+        return [(x + lower[0], y + lower[1], z + lower[2]) for x, y, z in path]
+
+    def find_path(
+        self,
+        start: Coords,
+        end: Coords,
+        matrix: MatrixType,
+        map_key: Optional[Hashable] = None,
+        inverse: bool = False,
+    ) -> Tuple[List[Coords], int]:
+        """
+        Find a path from start to end position on the matrix
+
+        Parameters
+        ----------
+        start : Coords
+            start position (x, y, z)
+        end : Coords
+            end position (x, y, z)
+        matrix : MatrixType
+            3D array of values (numbers or objects specifying weight)
+            that determine how nodes are connected and if they are walkable.
+        map_key : Hashable, optional
+            identifies the map, used to cache the pyramid (together with a
+            digest of the obstacles)
+        inverse : bool, optional
+            If true, all values in the matrix that are not 0 will be considered
+            walkable. Otherwise all values that are 0 will be considered walkable.
+
+        Returns
+        -------
+        Tuple[List[Coords], int]
+            path, number of iterations (of all single searches)
+        """
+        self.runs = 0
+        matrix = np.asarray(matrix)
+        start = tuple(int(c) for c in start)
+        end = tuple(int(c) for c in end)
+        pyramid = get_pyramid(matrix, map_key, inverse, self.min_size)
+
+        # solve on the coarsest level that connects start and end
+        path: List[Coords] = []
+        level = 0
+        for level in range(len(pyramid) - 1, 0, -1):
+            blocked = pyramid[level]
+            s = tuple(c >> level for c in start)
+            e = tuple(c >> level for c in end)
+            if blocked[s] or blocked[e]:
+                continue
+            path = self._search_corridor(~blocked, None, s, e, False)
+            if path:
+                break
+        else:
+            level = 0
+
+        self.coarse_level = level
+        if not path:
+            return self._search(matrix, start, end, inverse), self.runs
+
+        # refine level by level inside the corridor around the coarse path;
+        # start and end are free on every finer level, since a coarse cell is
+        # only free if all of its children are
+        for finer in range(level - 1, -1, -1):
+            if finer == 0:
+                free, level_inverse = matrix, inverse
+            else:
+                free, level_inverse = ~pyramid[finer], False
+
+            s = tuple(c >> finer for c in start)
+            e = tuple(c >> finer for c in end)
+            scale = 1 << (level - finer)
+            shape = pyramid[finer].shape
+
+            # all children of the coarse path cells
+            cells = np.array(path, dtype=np.int64) * scale
+            offsets = np.stack(np.meshgrid(*[np.arange(scale)] * 3, indexing="ij"), axis=-1).reshape(-1, 3)
+            cells = (cells[:, None, :] + offsets[None, :, :]).reshape(-1, 3)
+            cells = cells[np.all(cells < shape, axis=1)]
+            seed = np.zeros(shape, dtype=bool)
+            seed[cells[:, 0], cells[:, 1], cells[:, 2]] = True
+
+            refined: List[Coords] = []
+            radius = self.corridor
+            for _ in range(self.corridor_retries + 1):
+                refined = self._search_corridor(free, dilate(seed, radius), s, e, level_inverse)
+                if refined:
+                    break
+                radius *= 2
+            if not refined:
+                refined = self._search_corridor(free, None, s, e, level_inverse)
+            if not refined:
+                return [], self.runs
+
+            path, level = refined, finer
+
+        return path, self.runs
+
+    def __repr__(self):
+        """
+        Return a human readable representation
+        """
+        return f"<{self.__class__.__name__}" f"diagonal_movement={self.diagonal_movement} >"
@@ -0,0 +1,263 @@
+import heapq
+import math
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union
+
+import numpy as np
+
+from ..core.diagonal_movement import DiagonalMovement
+from ..core.grid import MatrixType
+from ..core.heuristic import manhattan, octile
+from ..core.pyramid import blocked_mask
+from .finder import MAX_RUNS, TIME_LIMIT, ExecutionRunsException, ExecutionTimeException
+
+Coords = Tuple[int, int, int]
+
+# default half size of the search window in x and y (in cells)
+HORIZON = 32
+
+
+class RecedingHorizonFinder:
+    """
+    A* restricted to a window around the search front that slides toward
+    the goal.
+
+    The search tree (g-values and parents) is kept when the window moves.
+    Nodes whose neighbors were cut off by the window border are parked and
+    pushed again once a window reveals those neighbors, so every window only
+    pays for the space it newly reveals instead of starting from scratch.
+    All priorities are computed against the real goal, so they stay valid
+    when the window moves. The window is moved to the first node popped on
+    its border, i.e. the border node with the lowest estimated total cost.
+
+    The window spans the whole matrix in z. Like MultiResolutionFinder it
+    works directly on the matrix and only reads the current window, so the
+    matrix can be a memory-mapped array (e.g. GlobalVoxelMap.volume).
+    """
+
+    def __init__(
+        self,
+        heuristic: Optional[Callable] = None,
+        diagonal_movement: int = DiagonalMovement.never,
+        horizon: int = HORIZON,
+        time_limit: float = TIME_LIMIT,
+        max_runs: Union[int, float] = MAX_RUNS,
+    ):
+        """
+        Find a path using a receding-horizon A*
+
+        Parameters
+        ----------
+        heuristic : Callable
+            heuristic used to calculate distance of 2 points
+        diagonal_movement : int
+            if diagonal movement is allowed
+            (see enum in diagonal_movement). With only_when_no_obstacle all
+            cells a diagonal step touches must be free, the other diagonal
+            modes allow every diagonal step to a free cell.
+        horizon : int
+            half size of the window in x and y
+        time_limit : float
+            max. runtime in seconds
+        max_runs : int
+            max. amount of expanded nodes until we abort the search
+        """
+        self.diagonal_movement = diagonal_movement
+        self.horizon = max(1, int(horizon))
+        self.time_limit = time_limit
+        self.max_runs = max_runs
+        if heuristic:
+            self.heuristic = heuristic
+        elif diagonal_movement == DiagonalMovement.never:
+            self.heuristic = manhattan
+        else:
+            self.heuristic = octile
+
+        if diagonal_movement == DiagonalMovement.never:
+            steps = [(dx, dy, dz) for dx, dy, dz in np.ndindex(3, 3, 3) if abs(dx - 1) + abs(dy - 1) + abs(dz - 1) == 1]
+        else:
+            steps = [step for step in np.ndindex(3, 3, 3) if step != (1, 1, 1)]
+        self._steps = [(dx - 1, dy - 1, dz - 1, math.sqrt((dx - 1) ** 2 + (dy - 1) ** 2 + (dz - 1) ** 2)) for dx, dy, dz in steps]
+
+        self.runs: int = 0
+        # number of windows the last search used (for statistics)
+        self.windows: int = 0
+
+    def keep_running(self):
+        """
+        Check, if we run into time or iteration constrains.
+
+        Raises
+        ------
+        ExecutionTimeException
+            if we run into a time constrain
+        ExecutionRunsException
+            if we run into a iteration constrain
+        """
+        if self.runs >= self.max_runs:
+            raise ExecutionRunsException(
+                f"{self.__class__.__name__} run into barrier of {self.max_runs} iterations without "
+                "finding the destination"
+            )
+
+        if time.time() - self.start_time >= self.time_limit:
+            raise ExecutionTimeException(
+                f"{self.__class__.__name__} took longer than {self.time_limit} seconds, aborting!"
+            )
+
+    def _load_window(self, matrix: np.ndarray, center: Coords, inverse: bool):
+        """
+        Read the window around a position
+
+        Parameters
+        ----------
+        matrix : np.ndarray
+            3D array of values that determine what nodes are walkable
+        center : Coords
+            position the window is centered on
+        inverse : bool
+            If true, all values that are not 0 will be considered walkable
+        """
+        self._x0 = max(center[0] - self.horizon, 0)
+        self._x1 = min(center[0] + self.horizon + 1, matrix.shape[0])
+        self._y0 = max(center[1] - self.horizon, 0)
+        self._y1 = min(center[1] + self.horizon + 1, matrix.shape[1])
+        window = matrix[self._x0 : self._x1, self._y0 : self._y1, :]
+        self._free = (~blocked_mask(window, inverse)).tobytes()
+        self._stride_x = (self._y1 - self._y0) * matrix.shape[2]
+        self.windows += 1
+
+    def _walkable(self, x: int, y: int, z: int) -> bool:
+        """
+        Check if a position inside the current window is walkable
+        """
+        return self._free[(x - self._x0) * self._stride_x + (y - self._y0) * self._depth + z] != 0
+
+    def find_path(
+        self,
+        start: Coords,
+        end: Coords,
+        matrix: MatrixType,
+        inverse: bool = False,
+    ) -> Tuple[List[Coords], int]:
+        """
+        Find a path from start to end position on the matrix
+
+        Parameters
+        ----------
+        start : Coords
+            start position (x, y, z)
+        end : Coords
+            end position (x, y, z)
+        matrix : MatrixType
+            3D array of values that determine what nodes are walkable
+        inverse : bool, optional
+            If true, all values in the matrix that are not 0 will be considered
+            walkable. Otherwise all values that are 0 will be considered walkable.
+
+        Returns
+        -------
+        Tuple[List[Coords], int]
+            path, number of expanded nodes
+        """
+        self.start_time = time.time()
+        self.runs = 0
+        self.windows = 0
+        matrix = np.asarray(matrix)
+        start = tuple(int(c) for c in start)
+        end = tuple(int(c) for c in end)
+        self._end = end
+        size_x, size_y, self._depth = matrix.shape
+        ex, ey, ez = end
+        heuristic = self.heuristic
+        check_corners = self.diagonal_movement == DiagonalMovement.only_when_no_obstacle
+
+        g: Dict[Coords, float] = {start: 0.0}
+        parents: Dict[Coords, Optional[Coords]] = {start: None}
+        # expanded nodes with neighbors outside of the window they were expanded in
+        parked: Set[Coords] = set()
+        open_list = [(heuristic(abs(ex - start[0]), abs(ey - start[1]), abs(ez - start[2])), 0.0, start)]
+        self._load_window(matrix, start, inverse)
+
+        while True:
+            if not open_list:
+                if not parked:
+                    return [], self.runs
+                # the reachable space inside the window is exhausted, continue
+                # at the most promising node that waits for a window
+                node = min(parked, key=lambda n: g[n] + heuristic(abs(ex - n[0]), abs(ey - n[1]), abs(ez - n[2])))
+                self._slide(matrix, node, inverse, g, parked, open_list)
+                continue
+
+            _, node_g, node = heapq.heappop(open_list)
+            if node_g > g[node]:
+                continue
+            x, y, z = node
+            if not (self._x0 <= x < self._x1 and self._y0 <= y < self._y1):
+                parked.add(node)
+                continue
+
+            self.runs += 1
+            self.keep_running()
+
+            if node == end:
+                path = []
+                while node is not None:
+                    path.append(node)
+                    node = parents[node]
+                return path[::-1], self.runs
+
+            cut = False
+            for dx, dy, dz, cost in self._steps:
+                nx, ny, nz = x + dx, y + dy, z + dz
+                if not (0 <= nx < size_x and 0 <= ny < size_y and 0 <= nz < self._depth):
+                    continue
+                if not (self._x0 <= nx < self._x1 and self._y0 <= ny < self._y1):
+                    cut = True
+                    continue
+                if not self._walkable(nx, ny, nz):
+                    continue
+                if check_corners and cost > 1 and not self._corners_free(x, y, z, dx, dy, dz):
+                    continue
+                ng = node_g + cost
+                neighbor = (nx, ny, nz)
+                if ng < g.get(neighbor, math.inf):
+                    g[neighbor] = ng
+                    parents[neighbor] = node
+                    h = heuristic(abs(ex - nx), abs(ey - ny), abs(ez - nz))
+                    heapq.heappush(open_list, (ng + h, ng, neighbor))
+
+            if cut:
+                # the search reached the window border: move the window here
+                parked.add(node)
+                self._slide(matrix, node, inverse, g, parked, open_list)
+
+    def _corners_free(self, x: int, y: int, z: int, dx: int, dy: int, dz: int) -> bool:
+        """
+        Check that all cells a diagonal step touches are free
+        """
+        for cx, cy, cz in np.ndindex(abs(dx) + 1, abs(dy) + 1, abs(dz) + 1):
+            if not self._walkable(x + cx * dx, y + cy * dy, z + cz * dz):
+                return False
+        return True
+
+    def _slide(
+        self,
+        matrix: np.ndarray,
+        center: Coords,
+        inverse: bool,
+        g: Dict[Coords, float],
+        parked: Set[Coords],
+        open_list: List,
+    ):
+        """
+        Move the window and push the parked nodes it reveals again,
+        with the g-values they already have
+        """
+        self._load_window(matrix, center, inverse)
+        ex, ey, ez = self._end
+        for node in [n for n in parked if self._x0 <= n[0] < self._x1 and self._y0 <= n[1] < self._y1]:
+            parked.discard(node)
+            node_g = g[node]
+            h = self.heuristic(abs(ex - node[0]), abs(ey - node[1]), abs(ez - node[2]))
+            heapq.heappush(open_list, (node_g + h, node_g, node))
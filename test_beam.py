@@ -0,0 +1,79 @@
+import time
+
+import numpy as np
+from pathfinding3d.core.diagonal_movement import DiagonalMovement
+from pathfinding3d.core.grid import Grid
+from pathfinding3d.finder.a_star import AStarFinder
+from pathfinding3d.finder.beam import BeamSearchFinder
+
+
+def make_matrix():
+    rng = np.random.default_rng(1)
+    matrix = np.ones((20, 20, 6), dtype=np.int8)
+    matrix[rng.random(matrix.shape) < 0.25] = 0
+    matrix[0, 0, 0] = matrix[19, 19, 5] = 1
+    return matrix
+
+
+def test_wide_beam_matches_a_star():
+    # a beam wider than any layer keeps every node: with unit steps it is a breadth-first search
+    matrix = make_matrix()
+    start, end = (0, 0, 0), (19, 19, 5)
+    grid = Grid(matrix=matrix)
+    beam_path, _ = BeamSearchFinder(beam_width=matrix.size).find_path(grid.node(*start), grid.node(*end), grid)
+    grid = Grid(matrix=matrix)
+    a_star_path, _ = AStarFinder().find_path(grid.node(*start), grid.node(*end), grid)
+    print('beam:', len(beam_path), 'a*:', len(a_star_path))
+    assert a_star_path and len(beam_path) == len(a_star_path)
+
+
+def test_narrow_beam_widens():
+    # a dead-end tube pointing at the goal traps a beam of 1, widening has to find a valid path
+    matrix = np.ones((15, 15, 1), dtype=np.int8)
+    matrix[3:11, 6, 0] = matrix[3:11, 8, 0] = 0
+    matrix[10, 6:9, 0] = 0
+    start, end = (1, 7, 0), (13, 7, 0)
+
+    grid = Grid(matrix=matrix)
+    path, _ = BeamSearchFinder(beam_width=1).find_path(grid.node(*start), grid.node(*end), grid)
+    print('beam of 1:', len(path))
+    assert not path
+
+    grid = Grid(matrix=matrix)
+    path, _ = BeamSearchFinder(beam_width=1, max_beam_width=64).find_path(grid.node(*start), grid.node(*end), grid)
+    coords = np.array([(n.x, n.y, n.z) for n in path])
+    print('widened beam:', len(path))
+    assert len(path) and tuple(coords[0]) == start and tuple(coords[-1]) == end
+    assert np.abs(np.diff(coords, axis=0)).max() == 1
+    assert all(matrix[tuple(c)] for c in coords)
+
+
+class CountingBeam(BeamSearchFinder):
+    def find_neighbors(self, grid, node, diagonal_movement=None):
+        self.expanded.append(node.identifier)
+        return super().find_neighbors(grid, node, diagonal_movement)
+
+
+def test_beam_expands_each_node_once():
+    # cheap straight steps make a detour through a sibling of the same layer shorter than the diagonal:
+    # nodes of the current layer must not be queued again, expanded twice or collected twice for the reset
+    matrix = np.full((6, 6, 1), 3, dtype=np.int8)
+    matrix[:, 0, 0] = matrix[0, :, 0] = 1
+    start, end = (0, 0, 0), (5, 5, 0)
+    for beam_width, max_beam_width in ((matrix.size, None), (1, 1)):
+        grid = Grid(matrix=matrix)
+        finder = CountingBeam(beam_width=beam_width, max_beam_width=max_beam_width,
+                              diagonal_movement=DiagonalMovement.always)
+        finder.expanded = []
+        touched = {}
+        finder.start_time, finder.runs = time.time(), 0
+        path = finder.search(grid.node(*start), grid.node(*end), grid, beam_width, touched)
+        print('beam', beam_width, 'expanded:', len(finder.expanded), 'unique:', len(set(finder.expanded)))
+        assert path and len(finder.expanded) == len(set(finder.expanded))
+        assert all(key == node.identifier for key, node in touched.items())
+
+
+if __name__ == "__main__":
+    test_wide_beam_matches_a_star()
+    test_narrow_beam_widens()
+    test_beam_expands_each_node_once()
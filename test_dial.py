@@ -0,0 +1,62 @@
+import math
+
+import numpy as np
+from pathfinding3d.core.diagonal_movement import DiagonalMovement
+from pathfinding3d.core.grid import Grid
+from pathfinding3d.finder.dial import DialFinder
+from pathfinding3d.finder.dijkstra import DijkstraFinder
+
+
+def path_cost(matrix, path):
+    # same cost as Grid.calc_cost with weights: step length * weight of the entered node
+    return sum(math.dist(a, b) * matrix[b] for a, b in zip(path, path[1:]))
+
+
+def test_dial_matches_dijkstra():
+    # random weighted 3D map, 0 = obstacle, 1..3 = weight
+    rng = np.random.default_rng(0)
+    matrix = rng.integers(1, 4, (20, 20, 8))
+    matrix[rng.random(matrix.shape) < 0.25] = 0
+    start, end = (0, 0, 0), (19, 19, 7)
+    matrix[start] = matrix[end] = 1
+
+    for movement in (DiagonalMovement.never, DiagonalMovement.always, DiagonalMovement.only_when_no_obstacle):
+        grid = Grid(matrix=matrix)
+        dial_path, _ = DialFinder(diagonal_movement=movement).find_path(grid.node(*start), grid.node(*end), grid)
+        grid = Grid(matrix=matrix)
+        dijkstra_path, _ = DijkstraFinder(diagonal_movement=movement).find_path(grid.node(*start), grid.node(*end), grid)
+
+        dial_cost = path_cost(matrix, [(n.x, n.y, n.z) for n in dial_path])
+        dijkstra_cost = path_cost(matrix, [(n.x, n.y, n.z) for n in dijkstra_path])
+        print(movement, 'dial:', round(dial_cost, 3), 'dijkstra:', round(dijkstra_cost, 3))
+        # Dial rounds the step costs to 1/COST_SCALE, ties may be broken differently
+        assert dial_path and dijkstra_path
+        assert abs(dial_cost - dijkstra_cost) <= 0.01 * len(dijkstra_path)
+
+
+def test_dial_max_weight_cached():
+    # the largest weight is looked up once per grid, not on every search
+    matrix = np.ones((6, 6, 3), dtype=int)
+    matrix[2, 2, 1] = 3
+    grid = Grid(matrix=matrix)
+    finder = DialFinder(diagonal_movement=DiagonalMovement.always)
+    for end in ((5, 5, 2), (0, 5, 0)):
+        path, _ = finder.find_path(grid.node(0, 0, 0), grid.node(*end), grid)
+        assert path and path[-1].identifier == end
+        grid.cleanup()
+    assert finder._grid_weights[grid] == 3
+
+    # cached value is used as is, a new grid is looked up again
+    grid.node(4, 4, 1).weight = 7
+    assert finder._max_weight(grid) == 3
+    assert finder._max_weight(Grid(matrix=matrix)) == 3
+    assert len(finder._grid_weights) == 1
+    assert DialFinder(max_weight=7)._max_weight(grid) == 7
+    unweighted = DialFinder()
+    unweighted.weighted = False
+    assert unweighted._max_weight(grid) == 1
+
+
+if __name__ == "__main__":
+    test_dial_matches_dijkstra()
+    test_dial_max_weight_cached()
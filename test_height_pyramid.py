@@ -0,0 +1,42 @@
+import os
+import tempfile
+
+import numpy as np
+from pathfinding25d.pyramid import build_height_pyramid, ensure_height_pyramid, load_height_pyramid, save_height_pyramid
+
+
+def round_trip(height_map):
+    path = os.path.join(tempfile.mkdtemp(), "grid_pyramid.npy")
+    levels = build_height_pyramid(height_map)
+    save_height_pyramid(path, levels)
+    loaded = load_height_pyramid(path)
+    assert len(loaded) == len(levels) > 1
+    for level, back in zip(levels, loaded):
+        assert back.dtype == height_map.dtype
+        assert np.array_equal(level, back)
+
+
+def test_small_dtypes():
+    # the header (level count and shapes) must not be stored in the height dtype
+    rng = np.random.default_rng(0)
+    round_trip(rng.integers(0, 255, (301, 300)).astype(np.uint8))
+    round_trip(rng.integers(-20, 200, (32, 32800)).astype(np.int16))
+    round_trip(rng.random((40, 70)).astype(np.float32))
+
+
+def test_old_format_is_rebuilt():
+    base = tempfile.mkdtemp()
+    grid_path = os.path.join(base, "grid.npy")
+    height_map = np.arange(64 * 48).reshape(64, 48) % 50
+    np.save(grid_path, height_map)
+    # a file with the header stored in the height dtype, as written before
+    levels = build_height_pyramid(height_map)
+    header = [len(levels)] + [n for level in levels for n in level.shape]
+    np.save(os.path.join(base, "grid_pyramid.npy"), np.concatenate([header] + [level.ravel() for level in levels]))
+    loaded = ensure_height_pyramid(grid_path)
+    assert all(np.array_equal(a, b) for a, b in zip(levels, loaded))
+
+
+if __name__ == "__main__":
+    test_small_dtypes()
+    test_old_format_is_rebuilt()
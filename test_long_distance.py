@@ -0,0 +1,55 @@
+import numpy as np
+from main.main import LowAltitude
+
+# a 120 x 40 x 50 world: ground at z <= 2, a wall at x = 30..33 up to z = 12
+WORLD = np.ones((120, 40, 50), dtype=np.int8)
+WORLD[:, :, :3] = 0
+WORLD[30:34, :, :13] = 0
+BOUNDARY = [60, 20, 35]
+
+
+class WindowedPlanner(LowAltitude):
+    """LowAltitude on a synthetic map: windows around x < 60 only reach z = 20, like tile windows
+    whose data ends below the cruise altitude of a boundary point"""
+
+    def __init__(self, workers):
+        self.level = 15
+        self.matrix_cache = None
+        self.world = None
+        self.workers = workers
+        self.headless = True
+        self.renderer = None
+        self.startpoint = (5, 20, 10)
+        self.endpoint = (115, 20, 10)
+
+    def segment_boundaries(self, length=70):
+        return [list(self.startpoint), BOUNDARY, list(self.endpoint)]
+
+    def load_map(self, sp, ep):
+        x0 = max(min(sp[0], ep[0]) - 10, 0)
+        x1 = min(max(sp[0], ep[0]) + 10, WORLD.shape[0] - 1)
+        z_max = 20 if max(sp[0], ep[0]) <= 60 and min(sp[0], ep[0]) < 60 else 49
+        return WORLD[x0:x1 + 1, :, :z_max + 1].copy(), (x0, 0, 0)
+
+
+def check_path(path):
+    assert path, "planning failed"
+    assert tuple(path[0])[:2] == (5, 20) and tuple(path[-1])[:2] == (115, 20)
+    assert tuple(BOUNDARY) in [tuple(p) for p in path]
+    for a, b in zip(path, path[1:]):
+        assert max(abs(u - v) for u, v in zip(a, b)) == 1, f"gap {a} -> {b}"
+    assert all(WORLD[tuple(p)] for p in path)
+
+
+def test_boundary_above_window_top_sequential():
+    # the boundary at z = 35 lies above the first segment's window (z_max = 20)
+    check_path(WindowedPlanner(workers=0)._plan_long_distance())
+
+
+def test_boundary_above_window_top_parallel():
+    check_path(WindowedPlanner(workers=2)._plan_long_distance())
+
+
+if __name__ == "__main__":
+    test_boundary_above_window_top_sequential()
+    test_boundary_above_window_top_parallel()
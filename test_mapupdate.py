@@ -0,0 +1,87 @@
+import glob
+import importlib
+import os
+import tempfile
+
+import numpy as np
+from moudles.mapupdate import MapUpdater
+from moudles.tilestore import VOXEL_SUFFIX, resolve_tile_files
+from pathfinding25d.envelope import dilate_heights, ensure_envelope
+from pathfinding25d.pyramid import build_height_pyramid, ensure_height_pyramid, pyramid_path
+
+grid_builder = importlib.import_module('mapinit.2_5map')
+
+
+def tile_inputs(base):
+    # the files Mat would read: fresh binary tiles, otherwise text
+    texts = sorted(glob.glob(os.path.join(base, "Tile_*.txt")))
+    voxels = sorted(glob.glob(os.path.join(base, f"Tile_*{VOXEL_SUFFIX}")))
+    return resolve_tile_files(texts, voxels)
+
+
+def test_grid_axis_order():
+    # grid.npy is stored as grid[y, x] with shape (y_max + 1, x_max + 1), no transpose afterwards
+    base = tempfile.mkdtemp()
+    np.savetxt(os.path.join(base, "points.txt"), [[7, 2, 15], [0, 4, 9]], fmt='%d')
+    grid_builder.create_25d_grid(os.path.join(base, "points.txt"), base, "grid.npy", x_max=9, y_max=4, z_min=-1,
+                                 workers=1)
+    grid = np.load(os.path.join(base, "grid.npy"))
+    assert grid.shape == (5, 10)
+    assert grid[2, 7] == 15 and grid[4, 0] == 9
+    assert (grid == -1).sum() == grid.size - 2
+
+
+def test_refresh_equals_rebuild():
+    # incremental refresh of grid.npy / envelope must equal a full rebuild with mapinit/2_5map.py
+    rng = np.random.default_rng(0)
+    base = tempfile.mkdtemp()
+    for tx, ty in [(5, 6), (6, 6), (5, 7)]:
+        x0, y0 = (tx - 5) * 70, (ty - 6) * 70
+        points = np.column_stack([rng.integers(x0, x0 + 70, 2000), rng.integers(y0, y0 + 70, 2000),
+                                  rng.integers(0, 30, 2000)])
+        np.savetxt(os.path.join(base, f"Tile_+{tx:03d}_+{ty:03d}_L19_a.txt"), points, fmt='%d')
+
+    # non-square grid so a transposed patch cannot pass
+    grid_builder.create_25d_grid(tile_inputs(base), base, "grid.npy", x_max=199, y_max=149, workers=1)
+    grid_path = os.path.join(base, "grid.npy")
+    ensure_envelope(grid_path, 1)
+    ensure_height_pyramid(grid_path, min_size=8)
+    ensure_height_pyramid(ensure_envelope(grid_path, 1), min_size=8)
+    pyramid_files = [pyramid_path(grid_path), pyramid_path(ensure_envelope(grid_path, 1))]
+    inodes = [os.stat(path).st_ino for path in pyramid_files]
+
+    updater = MapUpdater(base, grid_path, world_path=None, envelope_radii=(1,))
+    assert set(updater.artifacts) == {'grid', 'grid_pyramid', 'envelope_r1', 'envelope_r1_pyramid'}
+    print('added:', updater.add_obstacles([[10, 100, 40], [75, 20, 35], [150, 140, 50]]))
+    print('cleared:', updater.clear_region([0, 0, 0], [30, 30, 29]))
+    print('dirty:', updater.dirty('grid'))
+    print('refreshed:', updater.refresh())
+
+    grid_builder.create_25d_grid(tile_inputs(base), base, "rebuilt.npy", x_max=199, y_max=149, workers=1)
+    rebuilt = np.load(os.path.join(base, "rebuilt.npy"))
+    grid = np.load(grid_path)
+    envelope = np.load(ensure_envelope(grid_path, 1))
+    print('grid shape:', grid.shape)
+    print('refresh equals rebuild?', np.array_equal(grid, rebuilt))
+    print('envelope equals rebuild?', np.array_equal(envelope, dilate_heights(rebuilt, 1)))
+    assert grid.shape == (150, 200)
+    assert np.array_equal(grid, rebuilt)
+    assert np.array_equal(envelope, dilate_heights(rebuilt, 1))
+    assert updater.dirty('grid') == []
+
+    # the pyramids were patched in place (same file), match a rebuild and are not rebuilt again
+    for path, source, expected in zip(pyramid_files, [grid_path, ensure_envelope(grid_path, 1)],
+                                      [rebuilt, dilate_heights(rebuilt, 1)]):
+        levels = ensure_height_pyramid(source, min_size=8)
+        assert len(levels) > 2
+        assert all(np.array_equal(a, b) for a, b in zip(levels, build_height_pyramid(expected, min_size=8)))
+    assert [os.stat(path).st_ino for path in pyramid_files] == inodes
+
+    # updates outside of grid.npy are reported
+    assert updater.out_of_bounds([10, 10, 0], [20, 20, 5]) == []
+    assert updater.out_of_bounds([150, 140, 0], [260, 140, 5]) == ['grid']
+
+
+if __name__ == "__main__":
+    test_grid_axis_order()
+    test_refresh_equals_rebuild()
@@ -0,0 +1,101 @@
+import importlib
+import itertools
+import os
+import tempfile
+
+import numpy as np
+from moudles.meshvox import triangle_box_overlap, voxelize_triangles
+from moudles.tilestore import VOXEL_SUFFIX, load_voxel_tile, resolve_tile_files
+
+obj2vox = importlib.import_module('mapinit.obj2vox')
+
+
+def sampled_voxels(triangle, tol, steps=150):
+    # brute force: voxels within tol (per axis) of a dense barycentric sampling of the triangle
+    v0, v1, v2 = np.asarray(triangle, dtype=float)
+    u, v = np.meshgrid(np.linspace(0, 1, steps + 1), np.linspace(0, 1, steps + 1))
+    keep = u + v <= 1 + 1e-12
+    points = v0 + u[keep, None] * (v1 - v0) + v[keep, None] * (v2 - v0)
+    lo = np.ceil(points - 0.5 - tol).astype(int)
+    hi = np.floor(points + 0.5 + tol).astype(int)
+    cells = set()
+    for a, b in zip(lo, hi):
+        cells.update(itertools.product(*[range(x, y + 1) for x, y in zip(a, b)]))
+    return cells
+
+
+def voxels(triangle):
+    origin, occupancy = voxelize_triangles(np.array([triangle], dtype=float))
+    return {tuple(int(c) for c in cell) for cell in np.argwhere(occupancy) + origin}
+
+
+def check(triangle, steps=150):
+    # every sampled voxel is found, and nothing farther than the sampling resolution from the triangle
+    triangle = np.asarray(triangle, dtype=float)
+    edge = max(np.linalg.norm(triangle[i] - triangle[j]) for i, j in ((0, 1), (1, 2), (2, 0)))
+    found = voxels(triangle)
+    assert sampled_voxels(triangle, 1e-9, steps) <= found
+    assert found <= sampled_voxels(triangle, edge / steps + 1e-6, steps)
+    return found
+
+
+def test_axis_aligned():
+    # in the middle of a voxel layer only that layer is hit, on a boundary both layers are
+    inside = check([[0.2, 0.3, 2.0], [6.7, 0.1, 2.0], [0.4, 5.2, 2.0]])
+    assert {z for _, _, z in inside} == {2}
+    boundary = check([[0.2, 0.3, 2.5], [6.7, 0.1, 2.5], [0.4, 5.2, 2.5]])
+    assert {z for _, _, z in boundary} == {2, 3}
+    check([[1.0, 0.0, 0.0], [1.0, 4.0, 0.0], [1.0, 0.0, 4.0]])
+
+
+def test_edge_grazing():
+    # an edge lying on the voxel face x = 0.5 touches the voxels on both sides (conservative)
+    found = check([[0.5, -2.0, 0.0], [0.5, 3.0, 0.0], [-3.0, 0.0, 0.0]])
+    assert any(x == 1 for x, _, _ in found)
+    # a vertex touching a voxel corner
+    check([[0.5, 0.5, 0.5], [3.0, 2.0, 1.0], [2.0, 3.0, 2.0]])
+    assert not triangle_box_overlap(np.array([[[0.6, 0.6, 0.6], [3.0, 2.0, 1.0], [2.0, 3.0, 2.0]]]),
+                                    np.zeros((1, 3)))[0]
+
+
+def test_degenerate():
+    # collinear vertices voxelize like a segment, equal vertices like a point
+    segment = check([[0.0, 0.0, 0.0], [2.0, 3.0, 1.0], [4.0, 6.0, 2.0]], steps=400)
+    assert (0, 0, 0) in segment and (4, 6, 2) in segment
+    assert voxels([[1.2, 2.7, 3.1]] * 3) == {(1, 3, 3)}
+
+
+def test_random_triangles():
+    rng = np.random.default_rng(3)
+    for _ in range(30):
+        check(rng.random((3, 3)) * 8 - 2)
+    # batching must not change the result
+    triangles = rng.random((40, 3, 3)) * 12
+    origin, full = voxelize_triangles(triangles)
+    origin_small, small = voxelize_triangles(triangles, max_pairs=97)
+    assert np.array_equal(origin, origin_small) and np.array_equal(full, small)
+
+
+def test_obj2vox_retires_old_text():
+    base = tempfile.mkdtemp()
+    obj = os.path.join(base, "Tile_+020_+007_L19_a.obj")
+    with open(obj, 'w') as f:
+        f.write("v 0 0 0\nv 4 0 0\nv 0 4 0\nv 0 0 4\nf 1 2 3\nf 1 2 4\n")
+    text = os.path.join(base, "Tile_+020_+007_L19_a.txt")
+    np.savetxt(text, [[9, 9, 9]], fmt='%d')
+
+    status, _ = obj2vox.convert_obj(obj, base)
+    voxel_file = os.path.join(base, "Tile_+020_+007_L19_a" + VOXEL_SUFFIX)
+    assert status == 'converted'
+    assert not os.path.exists(text) and os.path.exists(text + '.stale')
+    assert resolve_tile_files([], [voxel_file]) == [voxel_file]
+    origin, occupancy = load_voxel_tile(voxel_file)
+    assert np.array_equal(origin, [786, 743, 0]) and occupancy.any()
+
+
+if __name__ == "__main__":
+    test_axis_aligned()
+    test_edge_grazing()
+    test_degenerate()
+    test_random_triangles()
+    test_obj2vox_retires_old_text()
@@ -0,0 +1,78 @@
+import math
+
+import numpy as np
+from pathfinding3d.core.diagonal_movement import DiagonalMovement
+from pathfinding3d.core.grid import Grid
+from pathfinding3d.core.pyramid import blocked_mask, get_pyramid
+from pathfinding3d.finder.a_star import AStarFinder
+from pathfinding3d.finder.multires import MultiResolutionFinder
+
+
+def path_cost(path):
+    return sum(math.dist(a, b) for a, b in zip(path, path[1:]))
+
+
+def make_matrix(seed=5):
+    rng = np.random.default_rng(seed)
+    matrix = np.ones((64, 48, 16), dtype=np.int8)
+    matrix[:, :, 0] = 0
+    for _ in range(40):
+        x, y = rng.integers(0, 58), rng.integers(0, 42)
+        matrix[x:x + 6, y:y + 6, :rng.integers(4, 16)] = 0
+    # free corners around start and end, so they are free on the coarse levels too
+    matrix[:8, :8, 1:] = matrix[56:, 40:, 1:] = 1
+    return matrix
+
+
+def check_path(path, matrix, start, end, movement):
+    assert path[0] == start and path[-1] == end
+    assert all(matrix[p] for p in path)
+    limit = 1 if movement == DiagonalMovement.never else 3
+    assert all(sum(abs(u - v) for u, v in zip(a, b)) <= limit and max(abs(u - v) for u, v in zip(a, b)) == 1
+               for a, b in zip(path, path[1:]))
+
+
+def test_multires_matches_a_star():
+    # the coarse-to-fine path is valid and close to the optimal A* cost
+    matrix = make_matrix()
+    start, end = (1, 1, 5), (62, 46, 6)
+    for movement in (DiagonalMovement.never, DiagonalMovement.always):
+        grid = Grid(matrix=matrix)
+        a_star_path, _ = AStarFinder(diagonal_movement=movement).find_path(grid.node(*start), grid.node(*end), grid)
+        finder = MultiResolutionFinder(diagonal_movement=movement)
+        path, _ = finder.find_path(start, end, matrix)
+
+        expected = path_cost([(n.x, n.y, n.z) for n in a_star_path])
+        print(movement, 'multires:', round(path_cost(path), 3), 'a*:', round(expected, 3),
+              'coarse level:', finder.coarse_level)
+        check_path(path, matrix, start, end, movement)
+        assert finder.coarse_level > 0
+        assert expected - 1e-6 <= path_cost(path) <= expected * 1.1
+
+
+def test_no_path():
+    matrix = make_matrix()
+    matrix[30:32, :, :] = 0
+    path, _ = MultiResolutionFinder(diagonal_movement=DiagonalMovement.always).find_path((1, 1, 5), (62, 46, 6),
+                                                                                         matrix)
+    assert path == []
+
+
+def test_cache_key_sees_map_changes():
+    # the same map_key with different obstacles must not reuse the cached pyramid
+    matrix = make_matrix()
+    start, end = (1, 1, 5), (62, 46, 6)
+    finder = MultiResolutionFinder(diagonal_movement=DiagonalMovement.always)
+    path, _ = finder.find_path(start, end, matrix, map_key=(0, 0, 0, matrix.shape))
+    changed = matrix.copy()
+    for x, y, z in path[5:-5]:
+        changed[x, y, z] = 0
+    path, _ = finder.find_path(start, end, changed, map_key=(0, 0, 0, matrix.shape))
+    check_path(path, changed, start, end, DiagonalMovement.always)
+    assert np.array_equal(get_pyramid(changed, (0, 0, 0, matrix.shape))[0], blocked_mask(changed))
+
+
+if __name__ == "__main__":
+    test_multires_matches_a_star()
+    test_no_path()
+    test_cache_key_sees_map_changes()
@@ -0,0 +1,38 @@
+import numpy as np
+from pathfinding25d.finder import AStar3D
+
+
+def make_height_map():
+    rng = np.random.default_rng(2)
+    height_map = np.zeros((40, 50), dtype=int)
+    for _ in range(25):
+        y, x = rng.integers(0, 36), rng.integers(0, 46)
+        height_map[y:y + 4, x:x + 4] = rng.integers(5, 30)
+    height_map[:2, :2] = height_map[-2:, -2:] = 0
+    return height_map
+
+
+def test_packed_matches_tuple():
+    # the packed engine must return exactly the same path as the original tuple engine
+    height_map = make_height_map()
+    start, end = (0, 0, 8), (49, 39, 12)
+    for kwargs in ({}, {'drone_radius': 1}, {'ceiling': np.full(height_map.shape, 25)}):
+        paths = [AStar3D(height_map, min_altitude=3, max_altitude=40, engine=engine, **kwargs).find_path(start, end)
+                 for engine in ("tuple", "packed")]
+        print(sorted(kwargs), 'tuple:', len(paths[0]), 'packed:', len(paths[1]))
+        assert paths[0] and paths[0] == paths[1]
+
+
+def test_packed_no_path():
+    # both engines agree when the goal is unreachable (walled in by a column above max_altitude)
+    height_map = make_height_map()
+    height_map[30:, 40:] = 100
+    height_map[-1, -1] = 0
+    start, end = (0, 0, 8), (49, 39, 12)
+    for engine in ("tuple", "packed"):
+        assert AStar3D(height_map, min_altitude=3, max_altitude=40, engine=engine).find_path(start, end) == []
+
+
+if __name__ == "__main__":
+    test_packed_matches_tuple()
+    test_packed_no_path()
@@ -0,0 +1,44 @@
+import math
+
+import numpy as np
+from pathfinding3d.core.diagonal_movement import DiagonalMovement
+from pathfinding3d.core.grid import Grid
+from pathfinding3d.finder.a_star import AStarFinder
+from pathfinding3d.finder.receding import RecedingHorizonFinder
+
+
+def path_cost(path):
+    return sum(math.dist(a, b) for a, b in zip(path, path[1:]))
+
+
+def make_matrix():
+    rng = np.random.default_rng(4)
+    matrix = np.ones((60, 40, 10), dtype=np.int8)
+    matrix[:, :, 0] = 0
+    for _ in range(30):
+        x, y = rng.integers(0, 55), rng.integers(0, 35)
+        matrix[x:x + 5, y:y + 5, :rng.integers(3, 10)] = 0
+    matrix[1, 1, 2] = matrix[58, 38, 3] = 1
+    return matrix
+
+
+def test_receding_matches_a_star():
+    # a small horizon forces many windows, the cost must still be optimal
+    matrix = make_matrix()
+    start, end = (1, 1, 2), (58, 38, 3)
+    for movement in (DiagonalMovement.never, DiagonalMovement.always):
+        grid = Grid(matrix=matrix)
+        a_star_path, _ = AStarFinder(diagonal_movement=movement).find_path(grid.node(*start), grid.node(*end), grid)
+        finder = RecedingHorizonFinder(diagonal_movement=movement, horizon=6)
+        path, _ = finder.find_path(start, end, matrix)
+
+        expected = path_cost([(n.x, n.y, n.z) for n in a_star_path])
+        print(movement, 'receding:', round(path_cost(path), 3), 'a*:', round(expected, 3), 'windows:', finder.windows)
+        assert finder.windows > 1
+        assert path[0] == start and path[-1] == end
+        assert all(matrix[p] for p in path)
+        assert abs(path_cost(path) - expected) < 1e-6
+
+
+if __name__ == "__main__":
+    test_receding_matches_a_star()
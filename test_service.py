@@ -0,0 +1,113 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from main.service import LocalClient, PlanningService
+
+
+def fake_plan(startpoint, endpoint, options):
+    # stands in for run_plan: the start altitude is the search time in seconds
+    time.sleep(startpoint[2])
+    return [list(startpoint), list(endpoint)]
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def make_service(workers=1, max_queue=4, deadline=5, executor=None):
+    service = PlanningService(workers=workers, max_queue=max_queue, deadline=deadline, plan_func=fake_plan,
+                              executor=executor or ThreadPoolExecutor(workers))
+    await service.start()
+    return service
+
+
+def test_ok():
+    async def scenario():
+        service = await make_service()
+        response = await LocalClient(service, 'uav1').plan([0, 0, 0], [1, 1, 1])
+        await service.stop()
+        return response
+
+    response = run(scenario())
+    assert response['status'] == 'ok'
+    assert response['path'] == [[0, 0, 0], [1, 1, 1]]
+
+
+def test_busy_keeps_previous_job():
+    async def scenario():
+        service = await make_service(max_queue=1)
+        # the runner takes the first job, the second fills the queue, the third is rejected
+        first = asyncio.create_task(LocalClient(service, 'a').plan([0, 0, 0.3], [1, 1, 1]))
+        await asyncio.sleep(0.05)
+        second = asyncio.create_task(LocalClient(service, 'b').plan([0, 0, 0], [2, 2, 2]))
+        await asyncio.sleep(0.05)
+        busy = await LocalClient(service, 'b').plan([0, 0, 0], [3, 3, 3])
+        responses = busy, await first, await second
+        await service.stop()
+        return responses
+
+    busy, first, second = run(scenario())
+    assert busy['status'] == 'busy'
+    # a rejected request must not cancel the client's queued one
+    assert first['status'] == 'ok'
+    assert second['status'] == 'ok' and second['path'][1] == [2, 2, 2]
+
+
+def test_timeout():
+    async def scenario():
+        service = await make_service(deadline=5)
+        # an explicit deadline of 0 is not replaced by the default
+        zero = await LocalClient(service, 'b').plan([0, 0, 0], [1, 1, 1], deadline=0)
+        started = time.perf_counter()
+        slow = await LocalClient(service, 'a').plan([0, 0, 0.5], [1, 1, 1], deadline=0.1)
+        elapsed = time.perf_counter() - started
+        # the runner is free again once the expired search has finished
+        fast = await LocalClient(service, 'c').plan([0, 0, 0], [1, 1, 1], deadline=5)
+        await service.stop()
+        return slow, elapsed, zero, fast
+
+    slow, elapsed, zero, fast = run(scenario())
+    assert slow['status'] == 'timeout' and elapsed < 0.4
+    assert zero['status'] == 'timeout'
+    assert fast['status'] == 'ok'
+
+
+def test_same_client_cancels_previous():
+    async def scenario():
+        service = await make_service()
+        client = LocalClient(service, 'uav1')
+        first = asyncio.create_task(client.plan([0, 0, 0.2], [1, 1, 1]))
+        await asyncio.sleep(0.05)
+        second = await client.plan([0, 0, 0], [2, 2, 2])
+        responses = await first, second, await client.cancel()
+        await service.stop()
+        return responses
+
+    first, second, cancel = run(scenario())
+    assert first['status'] == 'cancelled'
+    assert second['status'] == 'ok'
+    assert cancel['cancelled'] is False
+
+
+def test_submit_failure_keeps_runner():
+    async def scenario():
+        executor = ThreadPoolExecutor(1)
+        service = await make_service(executor=executor)
+        executor.shutdown()
+        failed = await LocalClient(service, 'a').plan([0, 0, 0], [1, 1, 1])
+        alive = all(not runner.done() for runner in service._runners)
+        await service.stop()
+        return failed, alive
+
+    failed, alive = run(scenario())
+    assert failed['status'] == 'error'
+    assert alive
+
+
+if __name__ == "__main__":
+    test_ok()
+    test_busy_keeps_previous_job()
+    test_timeout()
+    test_same_client_cancels_previous()
+    test_submit_failure_keeps_runner()
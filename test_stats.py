@@ -0,0 +1,60 @@
+import numpy as np
+from pathfinding25d import AStar3D, CruisePlanner, SearchStats
+
+
+def make_height_map():
+    rng = np.random.default_rng(5)
+    height_map = np.zeros((30, 40), dtype=int)
+    for _ in range(15):
+        y, x = rng.integers(0, 26), rng.integers(0, 36)
+        height_map[y:y + 4, x:x + 4] = rng.integers(5, 30)
+    height_map[:2, :2] = height_map[-2:, -2:] = 0
+    return height_map
+
+
+def test_progress_interval_zero_disables_callback():
+    # progress_interval=0 (or None) means no progress callback instead of ZeroDivisionError
+    height_map = make_height_map()
+    start, end = (0, 0, 8), (39, 29, 12)
+    calls = []
+    for interval in (0, None):
+        for engine in ("tuple", "packed"):
+            finder = AStar3D(height_map, min_altitude=3, max_altitude=40, engine=engine,
+                             progress_callback=calls.append, progress_interval=interval)
+            assert finder.find_path(start, end)
+            assert finder.find_path_any_angle(start, end)
+            assert finder.find_path_bidirectional(start, end)
+        assert CruisePlanner(height_map, clearance=3, progress_callback=calls.append,
+                             progress_interval=interval).find_path(start, end)
+    assert calls == []
+
+    try:
+        AStar3D(height_map, progress_interval=-1)
+    except ValueError:
+        pass
+    else:
+        assert False, "negative progress_interval must raise"
+
+
+def test_cruise_search_stats():
+    # CruisePlanner reports through SearchStats like AStar3D
+    height_map = make_height_map()
+    start, end = (0, 0, 8), (39, 29, 12)
+    calls = []
+    planner = CruisePlanner(height_map, clearance=3, progress_callback=calls.append, progress_interval=10)
+    stats = SearchStats()
+    assert planner.find_path(start, end, stats=stats)
+    print(stats)
+    assert planner.last_stats is stats and stats.found
+    assert stats.expansions > 0 and planner.nodes_explored == stats.pushes > 0
+    assert len(calls) == stats.expansions // 10 and all(s is stats for s in calls)
+
+    # a fresh SearchStats per search, nothing carried over (cruise altitude above max_altitude)
+    assert planner.find_path(start, (39, 29, 300)) == []
+    assert planner.last_stats is not stats and not planner.last_stats.found
+    assert planner.nodes_explored == 0
+
+
+if __name__ == "__main__":
+    test_progress_interval_zero_disables_callback()
+    test_cruise_search_stats()
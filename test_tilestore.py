@@ -0,0 +1,119 @@
+import glob
+import os
+import tempfile
+
+import numpy as np
+from moudles.matrix import Mat
+from moudles.tilecache import TileCache
+from moudles.tilestore import (convert_tile, is_fresh, load_text_voxels, load_tile_points, load_voxel_tile,
+                               resolve_tile_files, retire_text, save_occupancy_tile, voxel_path)
+
+
+def make_points():
+    rng = np.random.default_rng(5)
+    return rng.integers(-5, 40, (3000, 3)) + rng.random((3000, 3)) * 0.4
+
+
+def test_text_voxel_round_trip():
+    # text tile -> binary tile -> points must give the same voxels as reading the text
+    base = tempfile.mkdtemp()
+    text = os.path.join(base, "Tile_+020_+007_L19_a.txt")
+    points = make_points()
+    np.savetxt(text, points, fmt='%.3f')
+    expected = np.unique(np.round(points).astype(np.int32), axis=0)
+
+    voxels = load_text_voxels(text, chunk_rows=500)
+    assert voxels.dtype == np.int32 and np.array_equal(voxels, expected)
+
+    assert convert_tile(text)
+    assert not convert_tile(text)  # already up to date
+    binary = voxel_path(text)
+    assert is_fresh(binary, text)
+    assert resolve_tile_files([text], [binary]) == [binary]
+    assert np.array_equal(load_tile_points(binary), expected)
+
+    # changing the text makes the binary stale, Mat falls back to the text
+    with open(text, 'a') as f:
+        f.write("100 100 100\n")
+    assert not is_fresh(binary, text)
+    assert resolve_tile_files([text], [binary]) == [text]
+    print('round trip ok:', len(expected), 'voxels')
+
+
+def test_text_extra_columns():
+    # only the first three columns are coordinates, fewer than three is an error
+    base = tempfile.mkdtemp()
+    points = make_points()
+    extra = os.path.join(base, "extra.txt")
+    np.savetxt(extra, np.column_stack([points, np.arange(len(points)), np.ones(len(points))]), fmt='%.3f')
+    expected = np.unique(np.round(points).astype(np.int32), axis=0)
+    assert np.array_equal(load_text_voxels(extra, chunk_rows=700), expected)
+
+    short = os.path.join(base, "short.txt")
+    np.savetxt(short, points[:, :2], fmt='%.3f')
+    try:
+        load_text_voxels(short)
+    except ValueError as e:
+        print('rejected:', e)
+    else:
+        raise AssertionError("a tile with two columns must be rejected")
+
+
+def test_occupancy_round_trip():
+    rng = np.random.default_rng(6)
+    occupancy = rng.random((7, 5, 9)) < 0.3
+    origin = np.array([10, -3, 2])
+    path = os.path.join(tempfile.mkdtemp(), "Tile_+005_+006_L19_b.vox.npz")
+    save_occupancy_tile(path, origin, occupancy)
+    loaded_origin, loaded = load_voxel_tile(path)
+    assert np.array_equal(loaded_origin, origin) and np.array_equal(loaded, occupancy)
+    # binary tiles without a text source are always used
+    assert resolve_tile_files([], [path]) == [path]
+
+
+def test_retire_stale_text():
+    # a text tile that was not rewritten with its binary must no longer be found or used as its source
+    base = tempfile.mkdtemp()
+    text = os.path.join(base, "Tile_+020_+007_L19_a.txt")
+    np.savetxt(text, make_points(), fmt='%.3f')
+    stale = retire_text(text)
+    assert not os.path.exists(text) and os.path.exists(stale)
+    binary = voxel_path(text)
+    save_occupancy_tile(binary, [0, 0, 0], np.ones((2, 2, 2), dtype=bool))
+    assert resolve_tile_files(glob.glob(os.path.join(base, "Tile_*_L19_*.txt")), [binary]) == [binary]
+    assert retire_text(text) is None
+
+    np.savetxt(text, make_points(), fmt='%.3f')
+    assert retire_text(text, remove=True) is None and not os.path.exists(text)
+
+
+def test_mat_matches_reference():
+    # Mat writes every tile straight into the matrix; the result must match the voxels of all files
+    base = tempfile.mkdtemp()
+    rng = np.random.default_rng(7)
+    voxels = []
+    for name, x0 in [("Tile_+005_+006_L19_a.txt", 0), ("Tile_+005_+006_L19_b.txt", 20), ("Tile_+006_+006_L19_c.txt", 70)]:
+        points = np.column_stack([rng.integers(x0, x0 + 50, 800), rng.integers(3, 60, 800), rng.integers(-4, 30, 800)])
+        np.savetxt(os.path.join(base, name), points, fmt='%d')
+        voxels.append(points)
+    convert_tile(os.path.join(base, "Tile_+006_+006_L19_c.txt"))  # one tile is read from its binary
+    voxels = np.unique(np.concatenate(voxels), axis=0)
+    lower = voxels.min(axis=0)
+    expected = np.ones(tuple(np.maximum(voxels.max(axis=0), [0, 0, 40]) - lower + 1), dtype=np.int8)
+    expected[tuple((voxels - lower).T)] = 0
+
+    for cache in (None, TileCache()):
+        for _ in range(2):  # the second round is served from the cache
+            mat = Mat([['+005', '+006'], ['+006', '+006']], 40, base_path=base, cache=cache)
+            assert mat.load_and_process()
+            assert (mat.x_min, mat.y_min, mat.z_min) == tuple(lower)
+            assert np.array_equal(mat.matrix, expected)
+    assert cache.hits == 2
+
+
+if __name__ == "__main__":
+    test_text_voxel_round_trip()
+    test_text_extra_columns()
+    test_occupancy_round_trip()
+    test_retire_stale_text()
+    test_mat_matches_reference()